@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""AssemblyAI Webhook endpoint — продолжает обработку аудио после распознавания."""
+import sys
+import os
+import json
+from http.server import BaseHTTPRequestHandler
+
+# --- VERCEL PATH FIX ---
+current_dir = os.getcwd()
+api_dir = os.path.join(current_dir, 'api')
+if api_dir not in sys.path:
+    sys.path.append(api_dir)
+
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        """Обрабатывает уведомление AssemblyAI: {"transcript_id": "...", "status": "completed" | "error"}."""
+        try:
+            from utils.config import ASSEMBLYAI_WEBHOOK_SECRET
+            from services.ai import WEBHOOK_AUTH_HEADER
+            
+            if ASSEMBLYAI_WEBHOOK_SECRET and self.headers.get(WEBHOOK_AUTH_HEADER) != ASSEMBLYAI_WEBHOOK_SECRET:
+                self._respond(401, {"status": "unauthorized"})
+                return
+            
+            content_length = int(self.headers.get('Content-Length', 0))
+            body = self.rfile.read(content_length)
+            data = json.loads(body)
+            
+            transcript_id = data.get('transcript_id', '')
+            status = data.get('status', '')
+            print(f"ASSEMBLYAI WEBHOOK: {transcript_id} -> {status}")
+            
+            if transcript_id and status in ('completed', 'error'):
+                self._handle_completion(transcript_id, status)
+            
+            self._respond(200, {"status": "ok"})
+            
+        except Exception as e:
+            import traceback
+            print(f"ASSEMBLYAI WEBHOOK ERROR: {traceback.format_exc()}")
+            self._respond(200, {"status": "error", "detail": str(e)})
+    
+    def _handle_completion(self, transcript_id: str, status: str):
+        """Находит контекст чата по ID задачи и продолжает конвейер."""
+        from services.ai import fetch_transcription
+        from services.notion import get_pending_transcription
+        from services.pipeline import continue_after_transcription, record_queue_latency
+        
+        context = get_pending_transcription(transcript_id)
+        if not context:
+            print(f"Нет сохранённого контекста для {transcript_id} — уже обработан?")
+            return
+        
+        transcript_data = fetch_transcription(transcript_id) if status == 'completed' else None
+        record_queue_latency(context, transcript_data)
+        continue_after_transcription(context, transcript_data)
+    
+    def _respond(self, code, data):
+        self.send_response(code)
+        self.send_header('Content-Type', 'application/json')
+        self.end_headers()
+        self.wfile.write(json.dumps(data).encode())
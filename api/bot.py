@@ -16,117 +16,58 @@ if api_dir not in sys.path:
 
 # --- Imports (Global Scope) ---
 try:
-    import requests
     # --- Utils ---
     from utils.config import (
         validate_env_vars,
-        TELEGRAM_TOKEN,
         ALLOWED_TELEGRAM_ID,
-        DEFAULT_TIMEOUT
+        FAST_ACK,
+        ALBUM_BATCH_WINDOW,
+        WARMUP_CONNECTIONS
     )
+    from utils.concurrency import run_parallel, parallel_map
+    from utils.http import start_connection_warmup
     # --- Services ---
     from services.telegram import (
-        download_telegram_file,
         get_telegram_file_url,
         send_telegram_message,
-        send_initial_status_message,
-        edit_telegram_message,
         send_message_with_buttons,
-        answer_callback_query
+        answer_callback_query,
+        begin_webhook_reply,
+        end_webhook_reply
     )
     from services.notion import (
-        get_latest_notes,
-        get_notion_page_content,
-        create_notion_page,
-        delete_notion_page,
-        add_to_notion_page,
-        add_image_to_page,
-        get_and_delete_last_log,
-        log_last_action,
-        set_user_state,
+        add_images_to_page,
         get_user_state,
         get_last_created_page_id,
         get_page_title,
-        get_page_preview,
-        replace_page_content,
-        rename_page,
-        get_user_settings,
-        set_user_settings,
-        get_hidden_tasks,
-        set_hidden_tasks,
-        add_hidden_task,
         get_active_mode,
         set_active_mode,
-        get_transcript_clean,
-        set_transcript_clean,
-        get_transcript_single_mode,
-        set_transcript_single_mode,
-        save_temp_transcript,
-        get_temp_transcript,
-        get_transcript_buffer,
-        append_to_transcript_buffer,
-        clear_transcript_buffer
+        get_transcript_single_mode
     )
-    from services.calendar import (
-        create_google_calendar_event,
-        delete_gcal_event
+    from services.telegram_client import get_telegram_client
+    from services.idempotency import claim_delivery, complete_delivery, release_delivery
+    from services.job_queue import (
+        enqueue_job,
+        enqueue_grouped_job,
+        register_job_handler,
+        start_job_workers
     )
-    from services.clickup import get_my_tasks, format_tasks_message
-    from services.briefing import build_morning_briefing, build_evening_briefing
-    from services.ai import (
-        transcribe_with_assemblyai,
-        process_with_ai,
-        summarize_for_search,
-        polish_content,
-        clean_transcript,
-        summarize_transcript
-    )
-    from services.pinecone_svc import (
-        upsert_to_pinecone,
-        query_pinecone
+    from services.pipeline import (
+        start_transcription,
+        start_stream_transcription,
+        process_note_text
     )
-
-    def format_with_timecodes(words: list) -> str:
-        """Группирует слова из AssemblyAI в абзацы по предложениям и добавляет таймкоды."""
-        if not words:
-            return ""
-        
-        formatted = []
-        current_chunk = []
-        chunk_start = words[0]['start']
-        
-        for word in words:
-            if chunk_start is None:
-                chunk_start = word.get('start', 0)
-                
-            current_chunk.append(word['text'])
-            
-            # Start new line if sentence ends
-            if word['text'].endswith(('.', '?', '!')):
-                text = " ".join(current_chunk)
-                
-                safe_start = chunk_start if chunk_start is not None else 0
-                minutes = safe_start // 60000
-                seconds = (safe_start % 60000) // 1000
-                
-                timecode = f"[{minutes:02d}:{seconds:02d}]"
-                formatted.append(f"{timecode} {text}")
-                current_chunk = []
-                chunk_start = None
-                
-        if current_chunk:
-            text = " ".join(current_chunk)
-            safe_start = chunk_start if chunk_start is not None else 0
-            minutes = safe_start // 60000
-            seconds = (safe_start % 60000) // 1000
-            timecode = f"[{minutes:02d}:{seconds:02d}]"
-            formatted.append(f"{timecode} {text}")
-            
-        return "\n\n".join(formatted)
+    # --- Handlers (модули обработчиков грузятся при первом вызове маршрута) ---
+    from handlers import UpdateContext
+    from handlers.routes import callback_router, message_router, state_router, KEYBOARD_BUTTONS
 
     # Validate environment variables at startup
     validate_env_vars()
 
+    if WARMUP_CONNECTIONS:
+        # TLS-рукопожатия с API идут параллельно, пока разбирается первый update
+        start_connection_warmup([(get_telegram_client().session, "https://api.telegram.org/")])
+
 except Exception as e:
     # Критическая ошибка старта - выводим в лог Vercel
     print(f"[CRITICAL STARTUP ERROR] {e}", file=sys.stderr)
@@ -135,1161 +76,259 @@ except Exception as e:
 
 
 
-class handler(BaseHTTPRequestHandler):
-    def do_POST(self):
-        chat_id = None
-        try:
-            content_length = int(self.headers['Content-Length'])
-            body = self.rfile.read(content_length)
-            update = json.loads(body.decode('utf-8'))
-
-            message = update.get('message')
-            callback_query = update.get('callback_query')
+def process_update(update: dict, raise_errors: bool = False, album: list = None):
+    """Обрабатывает один update Telegram: нажатие кнопки или сообщение.
+    
+    Args:
+        raise_errors: Пробросить ошибку после уведомления пользователя (для очереди задач — повтор/dead-letter)
+        album: Все сообщения альбома (media_group_id), собранные очередью задач, — одна заметка
+    """
+    chat_id = None
+    try:
+        message = update.get('message')
+        callback_query = update.get('callback_query')
 
-            # --- ОБРАБОТКА НАЖАТИЯ КНОПОК ---
-            if callback_query:
-                callback_data = callback_query['data']
-                chat_id = callback_query['message']['chat']['id']
-                user_id = str(callback_query['from']['id'])
-                callback_query_id = callback_query['id']
-                answer_callback_query(callback_query_id)
+        # --- ОБРАБОТКА НАЖАТИЯ КНОПОК ---
+        if callback_query:
+            chat_id = callback_query['message']['chat']['id']
+            user_id = str(callback_query['from']['id'])
+            answer_callback_query(callback_query['id'])
+            ctx = UpdateContext(chat_id, user_id, callback_query=callback_query)
+            callback_router.dispatch(callback_query['data'], ctx)
+            return
 
-                if callback_data == 'undo_last_action':
-                    last_action = get_and_delete_last_log()
-                    if last_action:
-                        if last_action.get('notion_page_id'): 
-                            delete_notion_page(last_action['notion_page_id'])
-                        if last_action.get('gcal_event_id') and last_action.get('gcal_calendar_id'): 
-                            delete_gcal_event(last_action['gcal_calendar_id'], last_action['gcal_event_id'])
-                        send_telegram_message(chat_id, "✅ Последнее действие отменено.")
-                    else:
-                        send_telegram_message(chat_id, "🤔 Не найдено действий для отмены.")
-                
-                elif callback_data.startswith('delete_notion_'):
-                    page_id_to_delete = callback_data.split('_', 2)[2]
-                    message_id = callback_query['message']['message_id']
-                    try:
-                        # Получаем название перед удалением
-                        page_title = get_page_title(page_id_to_delete)
-                        delete_notion_page(page_id_to_delete)
-                        # Редактируем сообщение вместо отправки нового
-                        buttons = [
-                            [
-                                {"text": "♻️ Восстановить", "callback_data": f"restore_{page_id_to_delete}"},
-                                {"text": "🔙 К списку", "callback_data": "back_to_notes_list"}
-                            ]
-                        ]
-                        edit_telegram_message(
-                            chat_id, 
-                            message_id, 
-                            f"🗑️ ~{page_title}~ удалена",
-                            inline_buttons=buttons
-                        )
-                    except Exception as e:
-                        edit_telegram_message(chat_id, message_id, f"❌ Ошибка: {e}")
-                
-                elif callback_data.startswith('restore_'):
-                    page_id_to_restore = callback_data.replace('restore_', '')
-                    message_id = callback_query['message']['message_id']
-                    try:
-                        from services.notion import restore_notion_page
-                        restore_notion_page(page_id_to_restore)
-                        page_title = get_page_title(page_id_to_restore)
-                        preview = get_page_preview(page_id_to_restore, max_chars=60)
-                        # Восстанавливаем оригинальные кнопки
-                        buttons = [[
-                            {"text": "👁️", "callback_data": f"view_page_{page_id_to_restore}"},
-                            {"text": "➕", "callback_data": f"add_to_notion_{page_id_to_restore}"},
-                            {"text": "✏️", "callback_data": f"rename_page_{page_id_to_restore}"},
-                            {"text": "🗑️", "callback_data": f"delete_notion_{page_id_to_restore}"}
-                        ]]
-                        note_text = f"📋 *{page_title}*\n_{preview['preview']}_"
-                        edit_telegram_message(chat_id, message_id, note_text, inline_buttons=buttons)
-                    except Exception as e:
-                        edit_telegram_message(chat_id, message_id, f"❌ Ошибка восстановления: {e}")
+        # --- ОБРАБОТКА СООБЩЕНИЙ ---
+        if not message:
+            return
 
-                elif callback_data.startswith('add_to_notion_'):
-                    page_id = callback_data.split('_', 3)[3]
-                    set_user_state(str(chat_id), 'awaiting_add_text', page_id)
-                    send_telegram_message(chat_id, "▶️ Введите текст, который нужно *добавить* в конец заметки:")
-                
-                elif callback_data == 'back_to_notes_list':
-                    # Возврат к списку заметок
-                    message_id = callback_query['message']['message_id']
-                    # Получаем свежий список заметок
-                    latest_notes = get_latest_notes(5)
-                    
-                    if not latest_notes:
-                         edit_telegram_message(chat_id, message_id, "😔 Заметок пока нет.")
-                    else:
-                        message_text = "📋 *Ваши последние заметки:*\n\n"
-                        navigation_buttons = []
-                        for i, note in enumerate(latest_notes):
-                            page_id = note['id']
-                            title_parts = note.get('properties', {}).get('Name', {}).get('title', [])
-                            full_title = title_parts[0]['plain_text'] if title_parts else "Без названия"
-                            button_title = (full_title[:20] + '..') if len(full_title) > 20 else full_title
-                            
-                            message_text += f"*{i+1}. {full_title}*\n"
-                            navigation_buttons.append([{"text": f"{i+1}. {button_title}", "callback_data": f"note_menu_{page_id}"}])
-                        
-                        edit_telegram_message(chat_id, message_id, message_text, inline_buttons=navigation_buttons)
+        user_id = str(message['from']['id'])
+        chat_id = message['chat']['id']
 
-                elif callback_data.startswith('note_menu_'):
-                    # Открытие меню конкретной заметки
-                    page_id = callback_data.replace('note_menu_', '')
-                    message_id = callback_query['message']['message_id']
-                    try:
-                        title = get_page_title(page_id)
-                        preview = get_page_preview(page_id, max_chars=100)
-                        
-                        buttons = [
-                            [
-                                {"text": "👁️ Просмотр", "callback_data": f"view_page_{page_id}"},
-                                {"text": "✏️ Переименовать", "callback_data": f"rename_page_{page_id}"},
-                            ],
-                            [
-                                {"text": "➕ Добавить текст", "callback_data": f"add_to_notion_{page_id}"},
-                                {"text": "🗑️ Удалить", "callback_data": f"delete_notion_{page_id}"}
-                            ],
-                            [
-                                {"text": "🔙 Назад к списку", "callback_data": "back_to_notes_list"}
-                            ]
-                        ]
-                        
-                        msg = f"📋 *{title}*\n\n_{preview['preview']}_"
-                        edit_telegram_message(chat_id, message_id, msg, inline_buttons=buttons)
-                    except Exception as e:
-                        edit_telegram_message(chat_id, message_id, f"❌ Ошибка загрузки заметки: {e}")
-
-                elif callback_data.startswith('rename_page_'):
-                    page_id = callback_data.replace('rename_page_', '')
-                    set_user_state(str(chat_id), 'awaiting_rename', page_id)
-                    send_telegram_message(chat_id, "✏️ Введите новое название заметки:")
-                
-                elif callback_data.startswith('view_page_'):
-                    page_id = callback_data.replace('view_page_', '')
-                    message_id = callback_query['message']['message_id']
-                    try:
-                        title = get_page_title(page_id)
-                        content = get_notion_page_content(page_id)
-                        # Ограничиваем длину для Telegram
-                        if len(content) > 3000:
-                            content = content[:3000] + "\n\n... _(текст обрезан)_"
-                        
-                        buttons = [[{"text": "🔙 Назад", "callback_data": f"note_menu_{page_id}"}]]
-                        
-                        edit_telegram_message(chat_id, message_id, f"📋 *{title}*\n\n{content}", inline_buttons=buttons)
-                    except Exception as e:
-                        send_telegram_message(chat_id, f"❌ Ошибка при загрузке: {e}")
-                
-                elif callback_data.startswith('edit_simple_'):
-                    # Просто добавить текст без полировки
-                    page_id = callback_data.replace('edit_simple_', '')
-                    user_state = get_user_state(str(chat_id))
-                    if user_state and user_state.get('pending_edit_text'):
-                        text_to_add = user_state['pending_edit_text']
-                        try:
-                            add_to_notion_page(page_id, text_to_add)
-                            title = get_page_title(page_id)
-                            send_telegram_message(chat_id, f"✅ Добавлено в *{title}*", show_keyboard=True)
-                        except Exception as e:
-                            send_telegram_message(chat_id, f"❌ Ошибка: {e}")
-                        set_user_state(str(chat_id), None, None)  # Очищаем state
-                    else:
-                        send_telegram_message(chat_id, "❌ Текст для добавления не найден.")
-                
-                elif callback_data.startswith('edit_polish_'):
-                    # Добавить + полировка через AI
-                    page_id = callback_data.replace('edit_polish_', '')
-                    user_state = get_user_state(str(chat_id))
-                    if user_state and user_state.get('pending_edit_text'):
-                        new_text = user_state['pending_edit_text']
-                        try:
-                            send_telegram_message(chat_id, "✨ Полирую текст...")
-                            old_content = get_notion_page_content(page_id)
-                            polished = polish_content(old_content, new_text)
-                            replace_page_content(page_id, polished)
-                            title = get_page_title(page_id)
-                            send_telegram_message(chat_id, f"✅ *{title}* обновлена и отполирована!", show_keyboard=True)
-                        except Exception as e:
-                            send_telegram_message(chat_id, f"❌ Ошибка полировки: {e}")
-                        set_user_state(str(chat_id), None, None)
-                    else:
-                        send_telegram_message(chat_id, "❌ Текст для добавления не найден.")
-                
-                elif callback_data.startswith('set_reminder_'):
-                    # Обработка установки времени напоминания
-                    minutes = int(callback_data.replace('set_reminder_', ''))
-                    set_user_settings(str(chat_id), minutes)
-                    
-                    if minutes == 0:
-                        send_telegram_message(chat_id, "🔕 Уведомления в Telegram *отключены*.", show_keyboard=True)
-                    else:
-                        send_telegram_message(chat_id, f"✅ Уведомления будут приходить за *{minutes} мин* до события.", show_keyboard=True)
-                
-                elif callback_data == 'clickup_refresh':
-                    # Обновляем список задач ClickUp
-                    hidden_ids = get_hidden_tasks(user_id)
-                    tasks = get_my_tasks()
-                    msg = format_tasks_message(tasks, hidden_ids=hidden_ids)
-                    buttons = [[{"text": "🔄 Обновить", "callback_data": "clickup_refresh"}]]
-                    if hidden_ids:
-                        buttons.append([{"text": f"👁 Показать скрытые ({len(hidden_ids)})", "callback_data": "unhide_all"}])
-                    if tasks:
-                        buttons.append([{"text": "🌐 Открыть ClickUp", "url": "https://app.clickup.com"}])
-                    edit_telegram_message(chat_id, callback_query['message']['message_id'], msg, inline_buttons=buttons)
-                
-                elif callback_data.startswith('hide_task_'):
-                    task_id = callback_data.replace('hide_task_', '')
-                    add_hidden_task(user_id, task_id)
-                    answer_callback_query(callback_query['id'], "👁 Задача скрыта")
-                    # Обновляем меню /hide
-                    hidden_ids = get_hidden_tasks(user_id)
-                    tasks = get_my_tasks()
-                    visible = [t for t in tasks if t.get('id', '') not in hidden_ids]
-                    
-                    buttons = []
-                    for t in visible[:10]:
-                        short_name = t['name'][:30] + ('...' if len(t['name']) > 30 else '')
-                        tags = f"[{', '.join(t.get('tags', []))}] " if t.get('tags') else ""
-                        buttons.append([{"text": f"👁 {tags}{short_name}", "callback_data": f"hide_task_{t['id']}"}])
-                    if hidden_ids:
-                        buttons.append([{"text": f"✅ Показать все скрытые ({len(hidden_ids)})", "callback_data": "unhide_all"}])
-                    
-                    msg = f"👁 *Скрыть задачи*\n\nНажми на задачу чтобы скрыть.\nСкрыто сейчас: *{len(hidden_ids)}*"
-                    edit_telegram_message(chat_id, callback_query['message']['message_id'], msg, inline_buttons=buttons)
-                
-                elif callback_data == 'unhide_all':
-                    set_hidden_tasks(user_id, [])
-                    answer_callback_query(callback_query['id'], "✅ Все задачи показаны")
-                    tasks = get_my_tasks()
-                    msg = format_tasks_message(tasks)
-                    buttons = [[{"text": "🔄 Обновить", "callback_data": "clickup_refresh"}]]
-                    if tasks:
-                        buttons.append([{"text": "🌐 Открыть ClickUp", "url": "https://app.clickup.com"}])
-                    edit_telegram_message(chat_id, callback_query['message']['message_id'], msg, inline_buttons=buttons)
-                
-                elif callback_data == 'exit_transcript':
-                    set_active_mode(user_id, None)
-                    send_telegram_message(chat_id, "✅ Режим транскрипта выключен.", show_keyboard=True)
-                
+        allowed_id = ALLOWED_TELEGRAM_ID.strip() if ALLOWED_TELEGRAM_ID else ""
+        if user_id != allowed_id:
+            return
+        
+        # ПРОВЕРКА СОСТОЯНИЯ: не ждем ли мы текст для добавления/переименования/поиска?
+        user_state = get_user_state(user_id)
+        ctx = UpdateContext(chat_id, user_id, message=message, user_state=user_state)
+        if user_state and state_router.dispatch(user_state.get('state') or '', ctx):
+            return
+        
+        text = ctx.text
+        
+        # АВТОВЫХОД из режима транскрипта при нажатии ДРУГОЙ кнопки клавиатуры
+        if text in KEYBOARD_BUTTONS:
+            active_mode = get_active_mode(user_id)
+            if active_mode == 'transcript':
+                set_active_mode(user_id, None)
+        
+        # КОМАНДЫ И КНОПКИ КЛАВИАТУРЫ
+        if text and message_router.dispatch(text, ctx):
+            return
+            
+        # --- ЛОГИКА СОЗДАНИЯ НОВОЙ ЗАМЕТКИ (если это не команда) ---
+        
+        text_to_process = None
+        is_text_message = False
+        photo_urls = []
+        
+        # --- ОПРЕДЕЛЕНИЕ ТИПА СООБЩЕНИЯ (АУДИО/ВИДЕО) ---
+        is_audio_message = False
+        audio_media = None
+        
+        for media_key in ('voice', 'audio', 'video_note', 'video'):
+            if media_key in message:
+                audio_media = message[media_key]
+                break
+        else:
+            if 'document' in message:
+                mime_type = message['document'].get('mime_type', '')
+                if mime_type.startswith('audio/') or mime_type.startswith('video/'):
+                    audio_media = message['document']
+        
+        if audio_media:
+            is_audio_message = True
+            audio_file_id = audio_media['file_id']
 
-                elif callback_data in ('set_transcript_clean', 'set_transcript_raw', 'set_transcript_single_mode', 'set_transcript_multi_mode'):
-                    if callback_data == 'set_transcript_clean':
-                        set_transcript_clean(user_id, True)
-                    elif callback_data == 'set_transcript_raw':
-                        set_transcript_clean(user_id, False)
-                    elif callback_data == 'set_transcript_single_mode':
-                        set_transcript_single_mode(user_id, True)
-                    elif callback_data == 'set_transcript_multi_mode':
-                        set_transcript_single_mode(user_id, False)
-                        
-                    answer_callback_query(callback_query_id, "Настройки обновлены")
-                    # Обновляем меню настроек
-                    settings = get_user_settings(user_id)
-                    current_minutes = settings.get('reminder_minutes', 15)
-                    is_clean = get_transcript_clean(user_id)
-                    is_single = get_transcript_single_mode(user_id)
-                    
-                    buttons = [
-                        [
-                            {"text": "5 мин" + (" ✓" if current_minutes == 5 else ""), "callback_data": "set_reminder_5"},
-                            {"text": "15 мин" + (" ✓" if current_minutes == 15 else ""), "callback_data": "set_reminder_15"},
-                            {"text": "30 мин" + (" ✓" if current_minutes == 30 else ""), "callback_data": "set_reminder_30"}
-                        ],
-                        [
-                            {"text": "1 час" + (" ✓" if current_minutes == 60 else ""), "callback_data": "set_reminder_60"},
-                            {"text": "Выкл" + (" ✓" if current_minutes == 0 else ""), "callback_data": "set_reminder_0"}
-                        ],
-                        [
-                            {"text": "💬 Одиночный" + (" ✓" if is_single else ""), "callback_data": "set_transcript_single_mode"},
-                            {"text": "💬💬 Поток" + (" ✓" if not is_single else ""), "callback_data": "set_transcript_multi_mode"}
-                        ],
-                        [
-                            {"text": "📜 Дословный" + (" ✓" if not is_clean else ""), "callback_data": "set_transcript_raw"},
-                            {"text": "✨ Чистый" + (" ✓" if is_clean else ""), "callback_data": "set_transcript_clean"}
-                        ]
-                    ]
-                    
-                    clean_desc = "✨ Чистый — без слов-заполнителей" if is_clean else "📜 Дословный — точная цитата"
-                    mode_desc = "⚡️ Одиночный (с таймкодами)" if is_single else "🔄 Поток (склеивает несколько аудио)"
-                    msg = f"⚙️ *Настройки*\n\n📱 *Уведомления*\nЗа сколько минут до события?\n_Текущее: {current_minutes} мин_\n\n🎙 *Транскрипт*\nМетод обработки: _{mode_desc}_\nПодрежим расшифровки: _{clean_desc}_"
-                    edit_telegram_message(chat_id, callback_query['message']['message_id'], msg, inline_buttons=buttons)
-                
-                elif callback_data.startswith('save_transcript_'):
-                    log_id = callback_data.replace('save_transcript_', '')
-                    message_id = callback_query['message']['message_id']
-                    transcript_text = get_temp_transcript(log_id)
-                    
-                    if transcript_text:
-                        # Сохраняем как новую заметку
-                        ai_data = process_with_ai(transcript_text)
-                        title = ai_data.get('main_title', 'Транскрипт')
-                        category = ai_data.get('category', 'Мысль')
-                        tags = ai_data.get('tags', [])
-                        
-                        try:
-                            # Убираем разметки markdown если есть
-                            import re
-                            clean_text = re.sub(r'[*_`]', '', transcript_text)
-                            new_page_id = create_notion_page(title, clean_text, category, tags)
-                            
-                            buttons = [[
-                                {"text": "👁️ Просмотр", "callback_data": f"view_page_{new_page_id}"},
-                                {"text": "🗑️ Удалить", "callback_data": f"delete_notion_{new_page_id}"}
-                            ]]
-                            edit_telegram_message(chat_id, message_id, f"✅ Транскрипт сохранен как заметка: *{title}*", inline_buttons=buttons)
-                        except Exception as e:
-                            print(f"Ошибка сохранения транскрипта: {e}")
-                            edit_telegram_message(chat_id, message_id, f"❌ Ошибка сохранения заметки.")
-                    else:
-                        edit_telegram_message(chat_id, message_id, "❌ Транскрипт устарел или уже сохранен.")
-                        
-                elif callback_data.startswith('summarize_transcript_'):
-                    log_id = callback_data.replace('summarize_transcript_', '')
-                    message_id = callback_query['message']['message_id']
-                    
-                    transcript_text = get_temp_transcript(log_id) # Текст удаляется после этого
-                    if transcript_text:
-                        edit_telegram_message(chat_id, message_id, "⏳ Генерирую резюме...")
-                        try:
-                            summary = summarize_transcript(transcript_text)
-                            
-                            # Пересохраняем оригинал для возможности сохранить в Notion
-                            new_log_id = save_temp_transcript(user_id, transcript_text)
-                            
-                            msg = f"📊 *Выжимка транскрипта:*\n\n{summary}\n\n_Оригинальный текст сохранен во временный буфер._"
-                            buttons = []
-                            if new_log_id:
-                                buttons.append([{"text": "💾 Сохранить в Notion", "callback_data": f"save_transcript_{new_log_id}"}])
-                            buttons.append([{"text": "🔙 Закрыть", "callback_data": "exit_transcript"}])
-                            
-                            edit_telegram_message(chat_id, message_id, msg, inline_buttons=buttons)
-                            
-                        except Exception as e:
-                            print(f"Ошибка резюме: {e}")
-                            edit_telegram_message(chat_id, message_id, "❌ Ошибка при генерации резюме.")
+        # Перехватываем текст/фото в режиме транскрипта
+        active_mode = get_active_mode(user_id)
+        if active_mode == 'transcript' and not is_audio_message:
+            buttons = [[{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}]]
+            send_message_with_buttons(
+                chat_id,
+                "🎙 Сейчас активен режим транскрипта.\n"
+                "Отправьте *аудио, голосовое или кружочек* или нажмите кнопку ниже для выхода.",
+                buttons
+            )
+            return
+        
+        # Обработка фото
+        if 'photo' in message:
+            # Альбом собирает в одну задачу только очередь: для альбомов нужен FAST_ACK.
+            # В serverless-режиме фото альбома приходят в разные вызовы (и инстансы) без
+            # общего хранилища — каждое фото обрабатывается само по себе
+            photo_messages = [message]
+            if album:
+                photo_messages = sorted(album, key=lambda m: m.get('message_id', 0))
+            
+            try:
+                # Telegram присылает массив размеров, берём наибольший (последний)
+                file_ids = [m['photo'][-1]['file_id'] for m in photo_messages]
+                photo_urls = parallel_map(get_telegram_file_url, file_ids, max_workers=8)
+                # Подпись альбома Telegram кладёт в одно из сообщений
+                caption = next((m.get('caption', '').strip() for m in photo_messages if m.get('caption', '').strip()), '')
+                photos_label = "фото" if len(photo_urls) == 1 else f"{len(photo_urls)} фото"
+                
+                if caption:
+                    # Фото с подписью — создаём новую заметку
+                    send_telegram_message(chat_id, f"📸 Обрабатываю {photos_label} с подписью...")
+                    text_to_process = caption
+                else:
+                    # Фото без подписи — добавляем к последней заметке
+                    last_page_id = get_last_created_page_id()
+                    if last_page_id:
+                        _, page_title = run_parallel(
+                            lambda: add_images_to_page(last_page_id, photo_urls),
+                            lambda: get_page_title(last_page_id)
+                        )
+                        send_telegram_message(chat_id, f"📸 {photos_label.capitalize()} добавлено в *{page_title}*!", show_keyboard=True)
                     else:
-                        edit_telegram_message(chat_id, message_id, "❌ Транскрипт устарел и был удален.")
-                        
-                elif callback_data == 'transcript_finish':
-                    # Завершаем мульти-транскрипт (Фича 1)
-                    message_id = callback_query['message']['message_id']
-                    _, buffer_content = get_transcript_buffer(user_id)
-                    clear_transcript_buffer(user_id)
+                        send_telegram_message(chat_id, "❌ Нет заметок для добавления фото. Отправьте фото с подписью, чтобы создать новую.", show_keyboard=True)
+                    return
                     
-                    if buffer_content:
-                        # Очищаем сепараторы в начале
-                        if buffer_content.startswith("\n\n---\n\n"):
-                             buffer_content = buffer_content[9:]
-                             
-                        # Сохраняем во временный лог для кнопок
-                        log_id = save_temp_transcript(user_id, buffer_content)
-                        buttons = []
-                        if log_id:
-                            buttons.append([
-                                {"text": "💾 В Notion", "callback_data": f"save_transcript_{log_id}"},
-                                {"text": "📊 Резюме", "callback_data": f"summarize_transcript_{log_id}"}
-                            ])
-                            
-                        buttons.append([{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}])
-                        
-                        max_len = 3900
-                        if len(buffer_content) <= max_len:
-                            edit_telegram_message(chat_id, message_id, f"✅ *Мульти-транскрипт завершен:*\n\n{buffer_content}", inline_buttons=buttons)
-                        else:
-                            # Ограничиваем превью
-                            preview = buffer_content[:max_len] + "\n\n... _(Текст обрезан)_"
-                            edit_telegram_message(chat_id, message_id, f"✅ *Мульти-транскрипт завершен (Слишком длинный):*\n\n{preview}", inline_buttons=buttons)
-                    else:
-                        edit_telegram_message(chat_id, message_id, "❌ Нет активного буфера транскриптов.")
-
-                elif callback_data == 'transcript_clear':
-                    # Очищаем мульти-транскрипт (Фича 1)
-                    message_id = callback_query['message']['message_id']
-                    clear_transcript_buffer(user_id)
-                    edit_telegram_message(chat_id, message_id, "🗑️ Буфер мульти-транскрипта очищен.")
-
-                    # Обновлено выше, этот блок больше не нужен, но оставлен для совместимости если где-то еще вызывается (лучше удалить)
-                    pass
-                
-                self.send_response(200)
-                self.end_headers()
+            except Exception as e:
+                send_telegram_message(chat_id, f"❌ Ошибка обработки фото: {e}", show_keyboard=True)
                 return
+        
+        elif is_audio_message:
+            # Проверяем активный режим транскрипта
+            active_mode = get_active_mode(user_id)
+            is_transcript_mode = active_mode == 'transcript'
+            transcription_context = {
+                'chat_id': chat_id,
+                'user_id': user_id,
+                'mode': 'transcript' if is_transcript_mode else 'note',
+                'reply_to_message_id': message.get('message_id'),
+                'file_unique_id': audio_media.get('file_unique_id'),
+                'duration': audio_media.get('duration')
+            }
+            if is_transcript_mode and not get_transcript_single_mode(user_id):
+                # «Поток»: пересланные пачкой аудио распознаются вместе, статус — один на пачку
+                start_stream_transcription(audio_file_id, message.get('message_id'), transcription_context)
+            else:
+                send_telegram_message(chat_id, "⏳ Распознаю аудио..." if is_transcript_mode else "⏳ Распознаю речь...")
+                # Дальше — конвейер: транскрипт (без AI и Notion) или заметка через AI
+                start_transcription(audio_file_id, transcription_context)
+            return
+        elif 'text' in message:
+            is_text_message = True
+            text_to_process = message['text']
 
-            # --- ОБРАБОТКА СООБЩЕНИЙ ---
-            if not message:
-                self.send_response(200)
-                self.end_headers()
-                return
+        if text_to_process:
+            process_note_text(chat_id, text_to_process, is_text_message=is_text_message, photo_urls=photo_urls)
+    except Exception as e:
+        if chat_id:
+            send_telegram_message(chat_id, f"🤯 *Произошла глобальная ошибка!*\nПожалуйста, проверьте логи Vercel.\n`{e}`")
+        print(f"Произошла глобальная ошибка: {e}")
+        if raise_errors:
+            raise
 
-            user_id = str(message['from']['id'])
-            chat_id = message['chat']['id']
 
-            allowed_id = ALLOWED_TELEGRAM_ID.strip() if ALLOWED_TELEGRAM_ID else ""
-            if user_id != allowed_id:
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            # ПРОВЕРКА СОСТОЯНИЯ: не ждем ли мы текст для добавления/переименования/поиска?
-            user_state = get_user_state(user_id)
-            if user_state:
-                state_type = user_state.get('state')
-                
-                if state_type == 'awaiting_add_text':
-                    page_id_to_edit = user_state['page_id']
-                    text_to_add = message.get('text', '')
-                    if text_to_add:
-                        add_to_notion_page(page_id_to_edit, text_to_add)
-                        send_telegram_message(chat_id, "✅ Текст успешно добавлен в заметку!", show_keyboard=True)
-                    else:
-                        send_telegram_message(chat_id, "Отмена. Получено пустое сообщение.")
-                    set_user_state(user_id, None, None)  # Очищаем state
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                elif state_type == 'awaiting_rename':
-                    page_id = user_state['page_id']
-                    new_title = message.get('text', '').strip()
-                    if new_title:
-                        try:
-                            rename_page(page_id, new_title)
-                            send_telegram_message(chat_id, f"✅ Заметка переименована в *{new_title}*", show_keyboard=True)
-                        except Exception as e:
-                            send_telegram_message(chat_id, f"❌ Ошибка переименования: {e}")
-                    else:
-                        send_telegram_message(chat_id, "Отмена. Название не может быть пустым.")
-                    set_user_state(user_id, None, None)
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                elif state_type == 'awaiting_search':
-                    query = message.get('text', '').strip()
-                    if query:
-                        # Переиспользуем логику поиска
-                        send_telegram_message(chat_id, f"🧠 Ищу по смыслу: *{query}*...")
-                        found_ids = query_pinecone(query, top_k=3)
-                        
-                        if not found_ids:
-                            send_telegram_message(chat_id, "😔 Ничего не найдено.", show_keyboard=True)
-                        else:
-                            context = ""
-                            for page_id in found_ids:
-                                try:
-                                    page_content = get_notion_page_content(page_id)
-                                    page_title = page_content.split('\n', 1)[0] if page_content else "Без названия"
-                                    context += f"--- Текст из заметки '{page_title}' ---\n{page_content}\n\n"
-                                except Exception as e:
-                                    print(f"Не удалось получить контент для страницы {page_id}: {e}")
-                            
-                            if context:
-                                answer = summarize_for_search(context, query)
-                                send_telegram_message(chat_id, f"💡 *Вот что я нашел:*\n\n{answer}", show_keyboard=True)
-                            else:
-                                send_telegram_message(chat_id, "🤔 Нашел заметки, но не смог прочитать.", show_keyboard=True)
-                    else:
-                        send_telegram_message(chat_id, "Отмена. Пустой запрос.")
-                    set_user_state(user_id, None, None)
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-            
-            text = message.get('text', '')
-            
-            # АВТОВЫХОД из режима транскрипта при нажатии ДРУГОЙ кнопки клавиатуры
-            keyboard_buttons = {"📝 Заметки", "🔍 Поиск", "📋 ClickUp", "⚙️ Настройки"}
-            if text in keyboard_buttons:
-                active_mode = get_active_mode(user_id)
-                if active_mode == 'transcript':
-                    set_active_mode(user_id, None)
-            
-            # ОБРАБОТКА КНОПОК КЛАВИАТУРЫ
-            if text == "📝 Заметки":
-                text = "/notes"  # Перенаправляем на существующую логику
-            elif text == "🔍 Поиск":
-                set_user_state(user_id, 'awaiting_search', None)
-                send_telegram_message(chat_id, "🔍 Введите поисковый запрос:")
-                self.send_response(200)
-                self.end_headers()
-                return
-            elif text == "📋 ClickUp":
-                # Показываем задачи из ClickUp
-                hidden_ids = get_hidden_tasks(user_id)
-                print(f"CLICKUP BUTTON: user_id={user_id}, hidden_ids={hidden_ids}")
-                tasks = get_my_tasks()
-                print(f"CLICKUP BUTTON: total tasks={len(tasks)}, task_ids={[t.get('id') for t in tasks[:5]]}")
-                msg = format_tasks_message(tasks, hidden_ids=hidden_ids)
-                
-                # Компактные кнопки
-                buttons = [[{"text": "🔄 Обновить", "callback_data": "clickup_refresh"}]]
-                if hidden_ids:
-                    buttons.append([{"text": f"👁 Показать скрытые ({len(hidden_ids)})", "callback_data": "unhide_all"}])
-                buttons.append([{"text": "🌐 Открыть ClickUp", "url": "https://app.clickup.com"}])
-                
-                send_message_with_buttons(chat_id, msg, buttons)
-                self.send_response(200)
-                self.end_headers()
-                return
-            elif text == "🎙 Транскрипт":
-                # Включаем режим транскрипта
-                set_active_mode(user_id, 'transcript')
-                is_clean = get_transcript_clean(user_id)
-                mode_label = "✨ Чистый" if is_clean else "📜 Дословный"
-                buttons = [[{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}]]
-                send_message_with_buttons(
-                    chat_id,
-                    f"🎙 *Режим транскрипта активен*\n\n"
-                    f"Пересылайте голосовые — получите чистый текст.\n\n"
-                    f"Текущий подрежим: {mode_label}\n"
-                    f"_Изменить подрежим можно в ⚙️ Настройки_",
-                    buttons
-                )
-                self.send_response(200)
-                self.end_headers()
-                return
-            elif text == "⚙️ Настройки":
-                # Показываем меню настроек (расширенное)
-                # При входе в настройки — выходим из транскрипт-режима не нужно,
-                # настройки работают параллельно
-                settings = get_user_settings(user_id)
-                current_minutes = settings.get('reminder_minutes', 15)
-                is_clean = get_transcript_clean(user_id)
-                is_single = get_transcript_single_mode(user_id)
-                
-                buttons = [
-                    [
-                        {"text": "5 мин" + (" ✓" if current_minutes == 5 else ""), "callback_data": "set_reminder_5"},
-                        {"text": "15 мин" + (" ✓" if current_minutes == 15 else ""), "callback_data": "set_reminder_15"},
-                        {"text": "30 мин" + (" ✓" if current_minutes == 30 else ""), "callback_data": "set_reminder_30"}
-                    ],
-                    [
-                        {"text": "1 час" + (" ✓" if current_minutes == 60 else ""), "callback_data": "set_reminder_60"},
-                        {"text": "Выкл" + (" ✓" if current_minutes == 0 else ""), "callback_data": "set_reminder_0"}
-                    ],
-                    [
-                        {"text": "💬 Одиночный" + (" ✓" if is_single else ""), "callback_data": "set_transcript_single_mode"},
-                        {"text": "💬💬 Поток" + (" ✓" if not is_single else ""), "callback_data": "set_transcript_multi_mode"}
-                    ],
-                    [
-                        {"text": "📜 Дословный" + (" ✓" if not is_clean else ""), "callback_data": "set_transcript_raw"},
-                        {"text": "✨ Чистый" + (" ✓" if is_clean else ""), "callback_data": "set_transcript_clean"}
-                    ]
-                ]
-                
-                clean_desc = "✨ Чистый — без слов-заполнителей" if is_clean else "📜 Дословный — точная цитата"
-                mode_desc = "⚡️ Одиночный (с таймкодами)" if is_single else "🔄 Поток (склеивает несколько аудио)"
-                msg = f"⚙️ *Настройки*\n\n📱 *Уведомления*\nЗа сколько минут до события?\n_Текущее: {current_minutes} мин_\n\n🎙 *Транскрипт*\nМетод обработки: _{mode_desc}_\nПодрежим расшифровки: _{clean_desc}_"
-                send_message_with_buttons(chat_id, msg, buttons)
-                self.send_response(200)
-                self.end_headers()
-                return
+def _update_chat_id(update: dict):
+    """ID чата update или None, если update нам не интересен."""
+    message = update.get('message')
+    if message:
+        allowed_id = ALLOWED_TELEGRAM_ID.strip() if ALLOWED_TELEGRAM_ID else ""
+        if str(message.get('from', {}).get('id')) != allowed_id:
+            return None
+        return message['chat']['id']
+    callback_query = update.get('callback_query')
+    if callback_query and callback_query.get('message'):
+        return callback_query['message']['chat']['id']
+    return None
 
-            if text == '/index_all':
-                send_telegram_message(chat_id, "Начинаю полную индексацию всех заметок. Это может занять время...")
-                all_notes = get_latest_notes(100)
-                for note in all_notes:
-                    page_id = note['id']
-                    page_content = get_notion_page_content(page_id)
-                    upsert_to_pinecone(page_id, page_content)
-                send_telegram_message(chat_id, f"✅ Готово! Проиндексировано {len(all_notes)} заметок.", show_keyboard=True)
-                self.send_response(200)
-                self.end_headers()
-                return
-    
-            # ПРОВЕРКА КОМАНД
-            if text == '/start':
-                send_telegram_message(
-                    chat_id, 
-                    "👋 *Привет!* Я твой бот для заметок.\n\n"
-                    "📝 Просто напиши или запиши голосовое — я создам заметку в Notion.\n\n"
-                    "Используй кнопки ниже для навигации:",
-                    show_keyboard=True
-                )
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            elif text == '/briefing':
-                send_telegram_message(chat_id, "⏳ Собираю утренний брифинг...")
-                try:
-                    briefing_msg = build_morning_briefing()
-                    send_telegram_message(chat_id, briefing_msg, use_html=True, show_keyboard=True)
-                except Exception as e:
-                    send_telegram_message(chat_id, f"❌ Ошибка брифинга: {e}", show_keyboard=True)
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            elif text == '/evening':
-                send_telegram_message(chat_id, "⏳ Собираю вечерний отчёт...")
-                try:
-                    evening_msg = build_evening_briefing()
-                    send_telegram_message(chat_id, evening_msg, use_html=True, show_keyboard=True)
-                except Exception as e:
-                    send_telegram_message(chat_id, f"❌ Ошибка: {e}", show_keyboard=True)
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            elif text == '/hide':
-                # Показываем задачи для скрытия
-                hidden_ids = get_hidden_tasks(user_id)
-                tasks = get_my_tasks()
-                visible = [t for t in tasks if t.get('id', '') not in (hidden_ids or [])]
-                
-                if not visible:
-                    send_telegram_message(chat_id, "📋 Нет видимых задач для скрытия.", show_keyboard=True)
-                else:
-                    buttons = []
-                    for t in visible[:10]:
-                        short_name = t['name'][:30] + ('...' if len(t['name']) > 30 else '')
-                        tags = f"[{', '.join(t.get('tags', []))}] " if t.get('tags') else ""
-                        buttons.append([{"text": f"👁 {tags}{short_name}", "callback_data": f"hide_task_{t['id']}"}])
-                    
-                    if hidden_ids:
-                        buttons.append([{"text": f"✅ Показать все скрытые ({len(hidden_ids)})", "callback_data": "unhide_all"}])
-                    
-                    msg = f"👁 *Скрыть задачи*\n\nНажми на задачу чтобы скрыть.\nСкрыто сейчас: *{len(hidden_ids)}*"
-                    send_message_with_buttons(chat_id, msg, buttons)
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            elif text == '/xp':
-                from services.briefing import get_rpg_level
-                from services.notion import get_user_xp
-                xp_data = get_user_xp(user_id)
-                xp = xp_data.get('xp', 0)
-                title, next_t = get_rpg_level(xp)
-                msg = f"<b>⚔️ Твой профиль, Шеф</b>\n\n{title}\n<b>{xp} XP</b>"
-                if next_t:
-                    msg += f"\nДо след. уровня: {next_t - xp} XP"
-                send_telegram_message(chat_id, msg, use_html=True, show_keyboard=True)
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            elif text == '/register_webhook':
-                import requests as req
-                from utils.config import CLICKUP_API_TOKEN, CLICKUP_TEAM_ID
-                # Определяем URL webhook
-                vercel_url = os.environ.get('VERCEL_URL', '')
-                if not vercel_url:
-                    send_telegram_message(chat_id, "❌ VERCEL_URL не установлен", show_keyboard=True)
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                webhook_url = f"https://{vercel_url}/api/clickup-webhook"
-                headers = {"Authorization": CLICKUP_API_TOKEN, "Content-Type": "application/json"}
-                payload = {
-                    "endpoint": webhook_url,
-                    "events": ["taskStatusUpdated"]
-                }
-                
-                try:
-                    resp = req.post(
-                        f"https://api.clickup.com/api/v2/team/{CLICKUP_TEAM_ID}/webhook",
-                        headers=headers,
-                        json=payload,
-                        timeout=10
-                    )
-                    if resp.status_code == 200:
-                        wh_id = resp.json().get('id', '?')
-                        send_telegram_message(chat_id, f"✅ Webhook зарегистрирован!\nID: `{wh_id}`\nURL: {webhook_url}", show_keyboard=True)
-                    else:
-                        send_telegram_message(chat_id, f"❌ Ошибка: {resp.status_code}\n{resp.text[:200]}", show_keyboard=True)
-                except Exception as e:
-                    send_telegram_message(chat_id, f"❌ Ошибка: {e}", show_keyboard=True)
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            elif text == '/notes' or text == '📝 Заметки':
-                send_telegram_message(chat_id, "🔎 Загружаю последние заметки...")
-                latest_notes = get_latest_notes(5)
-                if not latest_notes:
-                    send_telegram_message(chat_id, "😔 Заметок пока нет.", show_keyboard=True)
-                else:
-                    # Формируем одно сообщение со списком
-                    message_text = "📋 *Ваши последние заметки:*\n\n"
-                    navigation_buttons = []
-                    
-                    for i, note in enumerate(latest_notes):
-                        page_id = note['id']
-                        title_parts = note.get('properties', {}).get('Name', {}).get('title', [])
-                        
-                        # Безопасное получение заголовка
-                        if title_parts:
-                            full_title = title_parts[0]['plain_text']
-                        else:
-                            full_title = "Без названия"
-                            
-                        # Обрезаем длинные заголовки для меню
-                        button_title = (full_title[:20] + '..') if len(full_title) > 20 else full_title
-                        
-                        # Формируем строку списка (1. Заголовок)
-                        message_text += f"*{i+1}. {full_title}*\n"
-                        
-                        # Добавляем кнопку навигации
-                        # Используем callback note_menu_{page_id} для открытия меню действий
-                        navigation_buttons.append([{"text": f"{i+1}. {button_title}", "callback_data": f"note_menu_{page_id}"}])
-                    
-                    send_message_with_buttons(chat_id, message_text, navigation_buttons)
-                
-                self.send_response(200)
-                self.end_headers()
-                return
 
-            elif text.startswith('/search '):
-                query = text.split(' ', 1)[1]
-                if not query:
-                    send_telegram_message(chat_id, "Пожалуйста, укажите, что нужно найти после команды /search.")
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                send_telegram_message(chat_id, f"🧠 Ищу по смыслу: *{query}*...")
-                
-                # 1. Ищем ID релевантных страниц в Pinecone
-                found_ids = query_pinecone(query, top_k=3)
-                
-                if not found_ids:
-                    send_telegram_message(chat_id, "😔 Ничего не найдено по вашему запросу.")
-                    self.send_response(200)
-                    self.end_headers()
-                    return
+def _run_update_job(update: dict):
+    process_update(update, raise_errors=True)
 
-                # 2. Собираем контент найденных страниц
-                context = ""
-                for page_id in found_ids:
-                    try:
-                        page_content = get_notion_page_content(page_id)
-                        page_title = page_content.split('\n', 1)[0] if page_content else "Без названия"
-                        context += f"--- Текст из заметки '{page_title}' ---\n{page_content}\n\n"
-                    except Exception as e:
-                        print(f"Не удалось получить контент для страницы {page_id}: {e}")
 
-                if not context:
-                    send_telegram_message(chat_id, "🤔 Нашел подходящие заметки, но не смог прочитать их содержимое.")
-                    self.send_response(200)
-                    self.end_headers()
-                    return
+def _run_album_job(payload: dict):
+    updates = payload['items']
+    process_update(updates[0], raise_errors=True, album=[u['message'] for u in updates])
 
-                # 3. Отправляем контекст и вопрос в ИИ для генерации ответа
-                answer = summarize_for_search(context, query)
-                
-                final_response = f"💡 *Вот что я нашел по вашему запросу:*\n\n{answer}"
-                send_telegram_message(chat_id, final_response)
-                
-                self.send_response(200)
-                self.end_headers()
-                return
-                
-            elif text == '/undo':
-                send_telegram_message(chat_id, "Пожалуйста, используйте кнопку '↩️ Отменить' под сообщением.")
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            elif text.startswith('/edit'):
-                # /edit <текст> — добавить текст в последнюю заметку
-                edit_text = text[5:].strip()  # Убираем '/edit' и пробелы
-                
-                if not edit_text:
-                    # Если текст не указан, показываем последнюю заметку с кнопками
-                    last_page_id = get_last_created_page_id()
-                    if last_page_id:
-                        preview = get_page_preview(last_page_id)
-                        buttons = [
-                            [
-                                {"text": "✏️ Переименовать", "callback_data": f"rename_page_{last_page_id}"},
-                                {"text": "👁️ Просмотр", "callback_data": f"view_page_{last_page_id}"}
-                            ],
-                            [
-                                {"text": "➕ Добавить текст", "callback_data": f"add_to_notion_{last_page_id}"},
-                                {"text": "🗑️ Удалить", "callback_data": f"delete_notion_{last_page_id}"}
-                            ]
-                        ]
-                        msg = f"📝 *Последняя заметка:*\n\n*{preview['title']}*\n_{preview['preview']}_"
-                        send_message_with_buttons(chat_id, msg, buttons)
-                    else:
-                        send_telegram_message(chat_id, "❌ Нет заметок для редактирования.", show_keyboard=True)
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                # Получаем ID последней заметки
-                last_page_id = get_last_created_page_id()
-                
-                if not last_page_id:
-                    send_telegram_message(
-                        chat_id, 
-                        "❌ Не удалось найти последнюю заметку.\n\n"
-                        "Возможно, лог действий пуст или не настроен."
-                    )
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                # Сохраняем текст в user state и показываем кнопки выбора
-                page_title = get_page_title(last_page_id)
-                set_user_state(user_id, 'pending_edit', last_page_id, edit_text)
-                
-                buttons = [[
-                    {"text": "➕ Просто добавить", "callback_data": f"edit_simple_{last_page_id}"},
-                    {"text": "✨ Добавить + Полировка", "callback_data": f"edit_polish_{last_page_id}"}
-                ]]
-                
-                msg = f"📝 Добавить в *{page_title}*:\n\n_{edit_text}_"
-                send_message_with_buttons(chat_id, msg, buttons)
-                
-                self.send_response(200)
-                self.end_headers()
-                return
-                
-            # --- ЛОГИКА СОЗДАНИЯ НОВОЙ ЗАМЕТКИ (если это не команда) ---
-            
-            text_to_process = None
-            is_text_message = False
-            photo_urls = []
-            
-            # --- ОПРЕДЕЛЕНИЕ ТИПА СООБЩЕНИЯ (АУДИО/ВИДЕО) ---
-            is_audio_message = False
-            audio_file_id = None
-            
-            if 'voice' in message:
-                is_audio_message = True
-                audio_file_id = message['voice']['file_id']
-            elif 'audio' in message:
-                is_audio_message = True
-                audio_file_id = message['audio']['file_id']
-            elif 'video_note' in message:
-                is_audio_message = True
-                audio_file_id = message['video_note']['file_id']
-            elif 'video' in message:
-                is_audio_message = True
-                audio_file_id = message['video']['file_id']
-            elif 'document' in message:
-                mime_type = message['document'].get('mime_type', '')
-                if mime_type.startswith('audio/') or mime_type.startswith('video/'):
-                    is_audio_message = True
-                    audio_file_id = message['document']['file_id']
 
-            # Перехватываем текст/фото в режиме транскрипта
-            active_mode = get_active_mode(user_id)
-            if active_mode == 'transcript' and not is_audio_message:
-                buttons = [[{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}]]
-                send_message_with_buttons(
-                    chat_id,
-                    "🎙 Сейчас активен режим транскрипта.\n"
-                    "Отправьте *аудио, голосовое или кружочек* или нажмите кнопку ниже для выхода.",
-                    buttons
-                )
-                self.send_response(200)
-                self.end_headers()
-                return
-            
-            # Обработка фото
-            if 'photo' in message:
-                # Telegram присылает массив размеров, берём наибольший (последний)
-                best_photo = message['photo'][-1]
-                file_id = best_photo['file_id']
-                
-                try:
-                    photo_url = get_telegram_file_url(file_id)
-                    photo_urls.append(photo_url)
-                    caption = message.get('caption', '').strip()
-                    
-                    if caption:
-                        # Фото с подписью — создаём новую заметку
-                        send_telegram_message(chat_id, "📸 Обрабатываю фото с подписью...")
-                        text_to_process = caption
-                    else:
-                        # Фото без подписи — добавляем к последней заметке
-                        last_page_id = get_last_created_page_id()
-                        if last_page_id:
-                            add_image_to_page(last_page_id, photo_url)
-                            page_title = get_page_title(last_page_id)
-                            send_telegram_message(chat_id, f"📸 Фото добавлено в *{page_title}*!", show_keyboard=True)
-                        else:
-                            send_telegram_message(chat_id, "❌ Нет заметок для добавления фото. Отправьте фото с подписью, чтобы создать новую.", show_keyboard=True)
-                        self.send_response(200)
-                        self.end_headers()
-                        return
-                        
-                except Exception as e:
-                    send_telegram_message(chat_id, f"❌ Ошибка обработки фото: {e}", show_keyboard=True)
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-            
-            elif is_audio_message:
-                # Проверяем активный режим транскрипта
-                active_mode = get_active_mode(user_id)
-                if active_mode == 'transcript':
-                    # РЕЖИМ ТРАНСКРИПТА — только расшифровка, без AI и Notion
-                    send_telegram_message(chat_id, "⏳ Распознаю аудио...")
-                    audio_bytes = download_telegram_file(audio_file_id).read()
-                    transcript_data = transcribe_with_assemblyai(audio_bytes)
-                    transcript = transcript_data.get('text') if transcript_data else None
-                    
-                    if not transcript:
-                        send_telegram_message(chat_id, "❌ Не удалось распознать речь. Попробуйте другой файл.")
-                        self.send_response(200)
-                        self.end_headers()
-                        return
-                    
-                    is_single_mode = get_transcript_single_mode(user_id)
-                    is_clean = get_transcript_clean(user_id)
-                    mode_icon = "✨" if is_clean else "📜"
-                    
-                    # SINGLE MODE
-                    if is_single_mode:
-                        words = transcript_data.get('words', [])
-                        if words:
-                            transcript = format_with_timecodes(words)
-                            
-                        # Чистый режим поверх таймкодов
-                        if is_clean:
-                            try:
-                                transcript = clean_transcript(transcript)
-                            except Exception as e:
-                                print(f"Clean transcript error: {e}")
-                                
-                        log_id = save_temp_transcript(user_id, transcript)
-                        buttons = []
-                        if log_id:
-                            buttons.append([
-                                {"text": "💾 В Notion", "callback_data": f"save_transcript_{log_id}"},
-                                {"text": "📊 Резюме", "callback_data": f"summarize_transcript_{log_id}"}
-                            ])
-                        buttons.append([{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}])
-                        
-                        max_len = 3900
-                        if len(transcript) <= max_len:
-                            send_message_with_buttons(chat_id, f"✅ *Одиночный транскрипт ({mode_icon}):*\n\n{transcript}", buttons, reply_to_message_id=message.get('message_id'))
-                        else:
-                            preview = transcript[:max_len] + "\n\n... _(Текст обрезан)_"
-                            send_message_with_buttons(chat_id, f"✅ *Одиночный транскрипт ({mode_icon}):*\n\n{preview}", buttons, reply_to_message_id=message.get('message_id'))
-                            
-                        self.send_response(200)
-                        self.end_headers()
-                        return
-                    
-                    # MULTI MODE
-                    if is_clean:
-                        try:
-                            transcript = clean_transcript(transcript)
-                        except Exception as e:
-                            print(f"Clean transcript error: {e}")
-                            
-                    # Добавляем в буфер
-                    new_buffer = append_to_transcript_buffer(user_id, transcript)
-                    
-                    if new_buffer:
-                        # Считаем количество частей по сепараторам
-                        parts_count = new_buffer.count("\n\n---\n\n")
-                        
-                        preview_text = transcript
-                        if len(transcript) > 500:
-                            preview_text = transcript[:500] + "..."
-                            
-                        msg = (
-                            f"{mode_icon} *Распознана часть {parts_count}:*\n_{preview_text}_\n\n"
-                            f"🗣 Отправьте следующее аудио, чтобы дополнить, или нажмите кнопку ниже."
-                        )
-                        
-                        buttons = [
-                            [
-                                {"text": "✅ Завершить и показать все", "callback_data": "transcript_finish"}
-                            ],
-                            [
-                                {"text": "🗑 Очистить", "callback_data": "transcript_clear"},
-                                {"text": "🔙 Выйти", "callback_data": "exit_transcript"}
-                            ]
-                        ]
-                        send_message_with_buttons(chat_id, msg, buttons)
-                    else:
-                        send_telegram_message(chat_id, "❌ Ошибка буферизации.")
-                    
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                # Обычный режим — заметка через AI
-                send_telegram_message(chat_id, "⏳ Распознаю речь...")
-                audio_bytes = download_telegram_file(audio_file_id).read()
-                transcript_data = transcribe_with_assemblyai(audio_bytes)
-                text_to_process = transcript_data.get('text') if transcript_data else None
-                if not text_to_process: 
-                    send_telegram_message(chat_id, "❌ Не удалось распознать речь.")
-            elif 'text' in message:
-                is_text_message = True
-                text_to_process = message['text']
+register_job_handler('telegram_update', _run_update_job)
+register_job_handler('telegram_album', _run_album_job)
 
-            if text_to_process:
-                status_message_id = None
-                if is_text_message:
-                    progress_bar = "⬜️⬜️⬜️⬜️⬜️⬜️ 0%"
-                    status_message_id = send_initial_status_message(chat_id, f"⏳ Анализирую...\n`{progress_bar}`")
 
-                if status_message_id:
-                    progress_bar = "🟩🟩⬜️⬜️⬜️⬜️ 33%"
-                    edit_telegram_message(chat_id, status_message_id, f"⏳ Анализирую...\n`{progress_bar}`")
-                
-                ai_data = process_with_ai(text_to_process)
-                notion_title = ai_data.get('main_title', 'Новая заметка')
-                notion_category = ai_data.get('category', 'Мысль')
-                formatted_body = ai_data.get('formatted_body', text_to_process)
-                is_reminder_only = ai_data.get('is_reminder_only', False)
-                
-                valid_events = [
-                    event for event in ai_data.get('events', []) 
-                    if event and event.get('title') and event.get('datetime_iso')
-                ]
-                
-                # --- РЕЖИМ ТОЛЬКО НАПОМИНАНИЕ (без Notion) ---
-                if is_reminder_only and valid_events:
-                    if status_message_id:
-                        progress_bar = "🟩🟩🟩🟩🟩🟩 99%"
-                        edit_telegram_message(chat_id, status_message_id, f"⏳ Добавляю в календарь...\n`{progress_bar}`")
-                    
-                    created_events_info = []  # [(title, datetime_iso), ...]
-                    created_events_links = []
-                    for event in valid_events:
-                        try:
-                            gcal_result = create_google_calendar_event(
-                                event['title'], 
-                                formatted_body, 
-                                event['datetime_iso']
-                            )
-                            if gcal_result and gcal_result.get('id'): 
-                                log_last_action(gcal_event_id=gcal_result['id'])
-                                created_events_links.append(gcal_result.get('html_link'))
-                            created_events_info.append((event['title'], event['datetime_iso']))
-                        except Exception as e:
-                            send_telegram_message(chat_id, f"❌ *Ошибка при создании события '{event['title']}':*\n`{e}`")
-                    
-                    if created_events_info:
-                        # Форматируем события с датой и временем
-                        from datetime import datetime
-                        events_text = []
-                        for title, dt_iso in created_events_info:
-                            try:
-                                dt = datetime.fromisoformat(dt_iso)
-                                formatted_dt = dt.strftime('%d.%m.%Y в %H:%M')
-                                events_text.append(f"*{title}*\n   📆 {formatted_dt}")
-                            except:
-                                events_text.append(f"*{title}*")
-                        
-                        final_text = f"📅 *Напоминание создано!*\n\n" + "\n\n".join(events_text)
-                        action_buttons = [[{"text": "↩️ Отменить", "callback_data": "undo_last_action"}]]
-                        
-                        if created_events_links and created_events_links[0]:
-                            action_buttons.append([{"text": "📅 Открыть в календаре", "url": created_events_links[0]}])
-                        
-                        if status_message_id:
-                            edit_telegram_message(chat_id, status_message_id, final_text, inline_buttons=action_buttons)
-                        else:
-                            send_message_with_buttons(chat_id, final_text, action_buttons)
-                    
-                    self.send_response(200)
-                    self.end_headers()
-                    return
-                
-                # --- ОБЫЧНЫЙ РЕЖИМ (Notion + календарь) ---
-                if status_message_id:
-                    progress_bar = "🟩🟩🟩🟩⬜️⬜️ 66%"
-                    edit_telegram_message(chat_id, status_message_id, f"⏳ Сохраняю в Notion...\n`{progress_bar}`")
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            content_length = int(self.headers['Content-Length'])
+            body = self.rfile.read(content_length)
+            update = json.loads(body.decode('utf-8'))
+        except Exception as e:
+            print(f"Не удалось разобрать update: {e}")
+            update = None
 
-                notion_page_id = None
-                try:
-                    notion_page_id = create_notion_page(notion_title, formatted_body, notion_category)
-                    if notion_page_id: 
-                        log_last_action(notion_page_id=notion_page_id)
-                        # Прикрепляем фото к созданной заметке
-                        for photo_url in photo_urls:
-                            try:
-                                add_image_to_page(notion_page_id, photo_url)
-                            except Exception as img_err:
-                                print(f"Ошибка добавления фото: {img_err}")
-                    if not is_text_message:
-                        send_telegram_message(
-                            chat_id, 
-                            f"✅ *Заметка в Notion создана!*\n\n*Название:* {notion_title}\n*Категория:* {notion_category}", 
-                            add_undo_button=True
-                        )
-                except Exception as e:
-                    detailed_error = e.response.text if hasattr(e, 'response') else str(e)
-                    final_text = f"❌ *Ошибка при создании заметки в Notion:*\n<pre>{detailed_error}</pre>"
-                    if status_message_id: 
-                        edit_telegram_message(chat_id, status_message_id, final_text, use_html=True)
-                    else: 
-                        send_telegram_message(chat_id, final_text, use_html=True)
-                    self.send_response(200)
-                    self.end_headers()
-                    return
+        # Повторная доставка того же update (Telegram не дождался ответа) — ничего не делаем
+        delivery_key = f"tg:{update['update_id']}" if update and 'update_id' in update else None
+        if delivery_key and not claim_delivery(delivery_key):
+            print(f"Повторная доставка update {update['update_id']} пропущена")
+            self.send_response(200)
+            self.end_headers()
+            return
 
-                created_events_titles = []
-                created_events_links = []
-                if valid_events:
-                    if status_message_id:
-                        progress_bar = "🟩🟩🟩🟩🟩🟩 99%"
-                        edit_telegram_message(chat_id, status_message_id, f"⏳ Добавляю в календарь...\n`{progress_bar}`")
-                    for event in valid_events:
-                        try:
-                            gcal_result = create_google_calendar_event(
-                                event['title'], 
-                                formatted_body, 
-                                event['datetime_iso']
-                            )
-                            if gcal_result and gcal_result.get('id'): 
-                                log_last_action(gcal_event_id=gcal_result['id'])
-                                created_events_links.append(gcal_result.get('html_link'))
-                            created_events_titles.append(event['title'])
-                        except Exception as e:
-                            send_telegram_message(chat_id, f"❌ *Ошибка при создании события '{event['title']}':*\n`{e}`")
-                
-                final_report_text = f"✅ *Заметка создана!*\n\n📋 *{notion_title}*\n_{formatted_body[:100]}..._" if len(formatted_body) > 100 else f"✅ *Заметка создана!*\n\n📋 *{notion_title}*\n_{formatted_body}_"
-                final_report_text += f"\n\n_Категория: {notion_category}_"
-                
-                if created_events_titles:
-                    final_report_text += "\n\n📅 *Добавлено в календарь:*\n- " + "\n- ".join(created_events_titles)
-                
-                # Создаём inline кнопки для действий
-                action_buttons = [
-                    [
-                        {"text": "✏️ Переименовать", "callback_data": f"rename_page_{notion_page_id}"},
-                        {"text": "👁️ Просмотр", "callback_data": f"view_page_{notion_page_id}"}
-                    ],
-                    [
-                        {"text": "➕ Добавить", "callback_data": f"add_to_notion_{notion_page_id}"},
-                        {"text": "↩️ Отменить", "callback_data": "undo_last_action"}
-                    ]
-                ]
-                
-                # Добавляем кнопку календаря если есть события
-                if created_events_links and created_events_links[0]:
-                    action_buttons.append([
-                        {"text": "📅 Открыть в календаре", "url": created_events_links[0]}
-                    ])
-                
-                if status_message_id:
-                    # Редактируем существующее сообщение с прогресс-баром
-                    edit_telegram_message(chat_id, status_message_id, final_report_text, inline_buttons=action_buttons)
-                else:
-                    # Отправляем новое сообщение с кнопками
-                    send_message_with_buttons(chat_id, final_report_text, action_buttons)
+        if FAST_ACK:
+            # Только проверяем и ставим в очередь — Telegram получает 200 за миллисекунды
+            chat_id = _update_chat_id(update) if update else None
+            try:
+                media_group_id = (update.get('message') or {}).get('media_group_id')
+                if chat_id is not None and media_group_id and 'photo' in update['message']:
+                    # Альбом приходит отдельным update на каждое фото: они копятся в одной
+                    # задаче очереди, пока ALBUM_BATCH_WINDOW не придёт следующее
+                    enqueue_grouped_job('telegram_album', media_group_id, update,
+                                        chat_id=chat_id, window=ALBUM_BATCH_WINDOW)
+                    start_job_workers()
+                elif chat_id is not None:
+                    enqueue_job('telegram_update', update, chat_id=chat_id)
+                    start_job_workers()
+            except Exception:
+                if delivery_key:
+                    release_delivery(delivery_key)
+                raise
+            # Дальше повторы и dead-letter — забота очереди
+            if delivery_key:
+                complete_delivery(delivery_key)
+            self.send_response(200)
+            self.end_headers()
+            return
+
+        # Последний ответ пользователю уходит в теле ответа webhook — без отдельного запроса к Bot API.
+        # Остальные вызовы чата из очереди end_webhook_reply() дожидается: после ответа функцию могут заморозить
+        chat_id = _update_chat_id(update) if update else None
+        begin_webhook_reply()
+        processed = False
+        try:
+            if update:
+                process_update(update, raise_errors=True)
+            processed = True
         except Exception as e:
-            if chat_id:
-                send_telegram_message(chat_id, f"🤯 *Произошла глобальная ошибка!*\nПожалуйста, проверьте логи Vercel.\n`{e}`")
-            print(f"Произошла глобальная ошибка: {e}")
-        
+            # Пользователь уже получил сообщение об ошибке в process_update
+            print(f"Update не обработан: {e}")
+        finally:
+            reply = end_webhook_reply(chat_id)
+            # Отмечаем выполненной только после успеха, иначе повтор должен пройти
+            if delivery_key and processed:
+                complete_delivery(delivery_key)
+            elif delivery_key:
+                release_delivery(delivery_key)
+
         self.send_response(200)
-        self.end_headers()
+        if reply:
+            self.send_header('Content-Type', 'application/json')
+            self.end_headers()
+            self.wfile.write(json.dumps(reply, ensure_ascii=False).encode('utf-8'))
+        else:
+            self.end_headers()
         return
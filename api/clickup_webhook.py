@@ -62,24 +62,50 @@ class handler(BaseHTTPRequestHandler):
             
             # Проверяем: новый статус = закрыт, старый != закрыт
             if after_status in CLOSED_STATUSES and before_status not in CLOSED_STATUSES:
-                self._award_xp(task_id)
+                # ClickUp повторяет доставку при таймауте — XP за одно событие начисляем один раз
+                from services.idempotency import claim_delivery, complete_delivery, release_delivery
+                delivery_key = self._delivery_key(data, item)
+                if delivery_key and not claim_delivery(delivery_key):
+                    print(f"Повторная доставка ClickUp {delivery_key} пропущена")
+                    break
+                awarded = self._award_xp(task_id)
+                if delivery_key and awarded:
+                    complete_delivery(delivery_key)
+                elif delivery_key:
+                    release_delivery(delivery_key)
                 break
     
-    def _award_xp(self, task_id: str):
-        """Начисляет XP за закрытую задачу."""
+    @staticmethod
+    def _delivery_key(data, item):
+        """Ключ события смены статуса или None, если событие нечем опознать.
+        
+        Без id элемента истории берём его время: закрытие после переоткрытия —
+        новое событие, а не повтор.
+        """
+        event_id = item.get('id') or (f"{data.get('task_id', '')}:{item['date']}" if item.get('date') else None)
+        if not event_id:
+            return None
+        return f"clickup:{data.get('webhook_id', '')}:{event_id}"
+    
+    def _award_xp(self, task_id: str) -> bool:
+        """Начисляет XP за закрытую задачу.
+        
+        Returns:
+            False — начислить не удалось, событие можно обработать повторно
+        """
         try:
             from services.clickup import get_my_tasks
             from services.notion import get_user_xp, set_user_xp
             from services.telegram import send_telegram_message
             
             if not ALLOWED_TELEGRAM_ID:
-                return
+                return True
             
             # Получаем инфо о задаче через API для приоритета
             import requests
             clickup_token = os.environ.get('CLICKUP_API_TOKEN', '')
             if not clickup_token:
-                return
+                return True
             
             headers = {"Authorization": clickup_token}
             resp = requests.get(
@@ -90,7 +116,7 @@ class handler(BaseHTTPRequestHandler):
             
             if resp.status_code != 200:
                 print(f"Failed to get task {task_id}: {resp.status_code}")
-                return
+                return False
             
             task_data = resp.json()
             task_name = task_data.get('name', 'Задача')
@@ -138,10 +164,12 @@ class handler(BaseHTTPRequestHandler):
             send_telegram_message(int(ALLOWED_TELEGRAM_ID), msg, use_html=True)
             
             print(f"XP awarded: +{xp_gained} for task '{task_name}' (total: {new_xp})")
+            return True
             
         except Exception as e:
             import traceback
             print(f"XP award error: {traceback.format_exc()}")
+            return False
     
     def _respond(self, code, data):
         self.send_response(code)
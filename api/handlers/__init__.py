@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+"""Обработчики команд, кнопок клавиатуры, inline-кнопок и состояний диалога.
+
+Каждый обработчик — функция handler(ctx: UpdateContext, arg: str), где arg —
+остаток ключа после префикса маршрута. Таблица маршрутов — handlers/routes.py.
+"""
+
+
+class UpdateContext:
+    """Данные update, нужные обработчику маршрута."""
+
+    def __init__(self, chat_id, user_id: str, message: dict = None, callback_query: dict = None, user_state: dict = None):
+        self.chat_id = chat_id
+        self.user_id = user_id
+        self.message = message
+        self.callback_query = callback_query
+        self.user_state = user_state
+        self.text = message.get('text', '') if message else ''
+        self.data = callback_query['data'] if callback_query else ''
+        # Сообщение с нажатой inline-кнопкой — его и редактируем
+        self.message_id = callback_query['message']['message_id'] if callback_query else None
+        self.callback_query_id = callback_query['id'] if callback_query else None
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Задачи ClickUp: список, скрытие задач, регистрация webhook."""
+import os
+
+import requests
+
+from utils.config import CLICKUP_API_TOKEN, CLICKUP_TEAM_ID
+from services.telegram import send_telegram_message, edit_telegram_message, send_message_with_buttons, answer_callback_query
+from services.notion import get_hidden_tasks, set_hidden_tasks, add_hidden_task
+from services.clickup import get_my_tasks, format_tasks_message
+
+
+def _render_hide_menu(hidden_ids: list, visible: list) -> tuple:
+    """Текст и кнопки меню /hide."""
+    buttons = []
+    for t in visible[:10]:
+        short_name = t['name'][:30] + ('...' if len(t['name']) > 30 else '')
+        tags = f"[{', '.join(t.get('tags', []))}] " if t.get('tags') else ""
+        buttons.append([{"text": f"👁 {tags}{short_name}", "callback_data": f"hide_task_{t['id']}"}])
+    if hidden_ids:
+        buttons.append([{"text": f"✅ Показать все скрытые ({len(hidden_ids)})", "callback_data": "unhide_all"}])
+
+    msg = f"👁 *Скрыть задачи*\n\nНажми на задачу чтобы скрыть.\nСкрыто сейчас: *{len(hidden_ids)}*"
+    return msg, buttons
+
+
+def clickup_button(ctx, arg):
+    """«📋 ClickUp» — задачи без скрытых."""
+    hidden_ids = get_hidden_tasks(ctx.user_id)
+    print(f"CLICKUP BUTTON: user_id={ctx.user_id}, hidden_ids={hidden_ids}")
+    tasks = get_my_tasks()
+    print(f"CLICKUP BUTTON: total tasks={len(tasks)}, task_ids={[t.get('id') for t in tasks[:5]]}")
+    msg = format_tasks_message(tasks, hidden_ids=hidden_ids)
+
+    # Компактные кнопки
+    buttons = [[{"text": "🔄 Обновить", "callback_data": "clickup_refresh"}]]
+    if hidden_ids:
+        buttons.append([{"text": f"👁 Показать скрытые ({len(hidden_ids)})", "callback_data": "unhide_all"}])
+    buttons.append([{"text": "🌐 Открыть ClickUp", "url": "https://app.clickup.com"}])
+
+    send_message_with_buttons(ctx.chat_id, msg, buttons)
+
+
+def hide_command(ctx, arg):
+    """/hide — выбрать задачи для скрытия."""
+    hidden_ids = get_hidden_tasks(ctx.user_id)
+    tasks = get_my_tasks()
+    visible = [t for t in tasks if t.get('id', '') not in (hidden_ids or [])]
+
+    if not visible:
+        send_telegram_message(ctx.chat_id, "📋 Нет видимых задач для скрытия.", show_keyboard=True)
+        return
+    msg, buttons = _render_hide_menu(hidden_ids, visible)
+    send_message_with_buttons(ctx.chat_id, msg, buttons)
+
+
+def register_webhook_command(ctx, arg):
+    """/register_webhook — подписать ClickUp на смену статусов задач."""
+    chat_id = ctx.chat_id
+    vercel_url = os.environ.get('VERCEL_URL', '')
+    if not vercel_url:
+        send_telegram_message(chat_id, "❌ VERCEL_URL не установлен", show_keyboard=True)
+        return
+
+    webhook_url = f"https://{vercel_url}/api/clickup-webhook"
+    headers = {"Authorization": CLICKUP_API_TOKEN, "Content-Type": "application/json"}
+    payload = {
+        "endpoint": webhook_url,
+        "events": ["taskStatusUpdated"]
+    }
+
+    try:
+        resp = requests.post(
+            f"https://api.clickup.com/api/v2/team/{CLICKUP_TEAM_ID}/webhook",
+            headers=headers,
+            json=payload,
+            timeout=10
+        )
+        if resp.status_code == 200:
+            wh_id = resp.json().get('id', '?')
+            send_telegram_message(chat_id, f"✅ Webhook зарегистрирован!\nID: `{wh_id}`\nURL: {webhook_url}", show_keyboard=True)
+        else:
+            send_telegram_message(chat_id, f"❌ Ошибка: {resp.status_code}\n{resp.text[:200]}", show_keyboard=True)
+    except Exception as e:
+        send_telegram_message(chat_id, f"❌ Ошибка: {e}", show_keyboard=True)
+
+
+def clickup_refresh(ctx, arg):
+    hidden_ids = get_hidden_tasks(ctx.user_id)
+    tasks = get_my_tasks()
+    msg = format_tasks_message(tasks, hidden_ids=hidden_ids)
+    buttons = [[{"text": "🔄 Обновить", "callback_data": "clickup_refresh"}]]
+    if hidden_ids:
+        buttons.append([{"text": f"👁 Показать скрытые ({len(hidden_ids)})", "callback_data": "unhide_all"}])
+    if tasks:
+        buttons.append([{"text": "🌐 Открыть ClickUp", "url": "https://app.clickup.com"}])
+    edit_telegram_message(ctx.chat_id, ctx.message_id, msg, inline_buttons=buttons)
+
+
+def hide_task(ctx, task_id):
+    add_hidden_task(ctx.user_id, task_id)
+    answer_callback_query(ctx.callback_query_id, "👁 Задача скрыта")
+    # Обновляем меню /hide
+    hidden_ids = get_hidden_tasks(ctx.user_id)
+    tasks = get_my_tasks()
+    visible = [t for t in tasks if t.get('id', '') not in hidden_ids]
+    msg, buttons = _render_hide_menu(hidden_ids, visible)
+    edit_telegram_message(ctx.chat_id, ctx.message_id, msg, inline_buttons=buttons)
+
+
+def unhide_all(ctx, arg):
+    set_hidden_tasks(ctx.user_id, [])
+    answer_callback_query(ctx.callback_query_id, "✅ Все задачи показаны")
+    tasks = get_my_tasks()
+    msg = format_tasks_message(tasks)
+    buttons = [[{"text": "🔄 Обновить", "callback_data": "clickup_refresh"}]]
+    if tasks:
+        buttons.append([{"text": "🌐 Открыть ClickUp", "url": "https://app.clickup.com"}])
+    edit_telegram_message(ctx.chat_id, ctx.message_id, msg, inline_buttons=buttons)
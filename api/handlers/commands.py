@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Служебные команды: приветствие, брифинги, XP, очередь задач, статистика маршрутов."""
+from services.telegram import send_telegram_message
+from services.briefing import build_morning_briefing, build_evening_briefing, get_rpg_level
+from services.notion import get_user_xp
+from services.job_queue import start_job_workers, list_dead_jobs, replay_dead_jobs
+
+
+def start_command(ctx, arg):
+    send_telegram_message(
+        ctx.chat_id,
+        "👋 *Привет!* Я твой бот для заметок.\n\n"
+        "📝 Просто напиши или запиши голосовое — я создам заметку в Notion.\n\n"
+        "Используй кнопки ниже для навигации:",
+        show_keyboard=True
+    )
+
+
+def briefing_command(ctx, arg):
+    send_telegram_message(ctx.chat_id, "⏳ Собираю утренний брифинг...")
+    try:
+        briefing_msg = build_morning_briefing()
+        send_telegram_message(ctx.chat_id, briefing_msg, use_html=True, show_keyboard=True)
+    except Exception as e:
+        send_telegram_message(ctx.chat_id, f"❌ Ошибка брифинга: {e}", show_keyboard=True)
+
+
+def evening_command(ctx, arg):
+    send_telegram_message(ctx.chat_id, "⏳ Собираю вечерний отчёт...")
+    try:
+        evening_msg = build_evening_briefing()
+        send_telegram_message(ctx.chat_id, evening_msg, use_html=True, show_keyboard=True)
+    except Exception as e:
+        send_telegram_message(ctx.chat_id, f"❌ Ошибка: {e}", show_keyboard=True)
+
+
+def xp_command(ctx, arg):
+    xp_data = get_user_xp(ctx.user_id)
+    xp = xp_data.get('xp', 0)
+    title, next_t = get_rpg_level(xp)
+    msg = f"<b>⚔️ Твой профиль, Шеф</b>\n\n{title}\n<b>{xp} XP</b>"
+    if next_t:
+        msg += f"\nДо след. уровня: {next_t - xp} XP"
+    send_telegram_message(ctx.chat_id, msg, use_html=True, show_keyboard=True)
+
+
+def replay_command(ctx, arg):
+    """/replay — список упавших задач, /replay all или /replay <id> — вернуть в очередь."""
+    chat_id = ctx.chat_id
+    arg = arg.strip()
+    if not arg:
+        dead_jobs = list_dead_jobs()
+        if not dead_jobs:
+            send_telegram_message(chat_id, "✅ Упавших задач нет.")
+            return
+        lines = []
+        for job in dead_jobs:
+            # Последняя строка traceback — само исключение; без символов разметки
+            error_lines = job['last_error'].strip().splitlines()
+            error = error_lines[-1][:100] if error_lines else ""
+            error = error.replace('_', ' ').replace('*', ' ').replace('`', "'")
+            lines.append(f"`{job['id']}` — {job['kind']}, попыток: {job['attempts']}\n{error}")
+        send_telegram_message(chat_id, "☠️ *Упавшие задачи:*\n\n" + "\n\n".join(lines) + "\n\n`/replay all` или `/replay <id>` — повторить.")
+    elif arg == 'all' or arg.isdigit():
+        count = replay_dead_jobs(None if arg == 'all' else int(arg))
+        if count:
+            start_job_workers()
+        send_telegram_message(chat_id, f"🔁 Возвращено в очередь: {count}")
+    else:
+        send_telegram_message(chat_id, "Использование: `/replay`, `/replay all` или `/replay <id>`")
+
+
+def routes_command(ctx, arg):
+    """/routes — самые затратные маршруты бота с момента запуска процесса."""
+    from handlers.routes import get_route_stats
+    stats = get_route_stats()[:15]
+    if not stats:
+        send_telegram_message(ctx.chat_id, "📊 Маршруты ещё не вызывались.")
+        return
+    lines = []
+    for s in stats:
+        # Имена маршрутов содержат «_» и «*» — моноширинный блок без разметки
+        errors = f", ошибок {s['errors']}" if s['errors'] else ""
+        lines.append(f"{s['route']}\n  {s['calls']}× ср {s['avg']:.2f}с p95≤{s['p95']:.2f}с макс {s['max']:.2f}с{errors}")
+    send_telegram_message(ctx.chat_id, "📊 *Маршруты (с запуска процесса):*\n```\n" + "\n".join(lines) + "\n```")
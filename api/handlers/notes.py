@@ -0,0 +1,363 @@
+# -*- coding: utf-8 -*-
+"""Заметки: список, меню заметки, просмотр, правка, удаление, поиск."""
+from utils.concurrency import run_parallel
+from services.telegram import send_telegram_message, edit_telegram_message, send_message_with_buttons
+from services.notion import (
+    get_latest_notes,
+    get_notion_page_content,
+    delete_notion_page,
+    restore_notion_page,
+    add_to_notion_page,
+    get_and_delete_last_log,
+    set_user_state,
+    get_user_state,
+    get_last_created_page_id,
+    get_page_title,
+    get_page_preview,
+    replace_page_content,
+    rename_page
+)
+from services.calendar import delete_gcal_event
+from services.ai import summarize_for_search, polish_content
+from services.pinecone_svc import upsert_to_pinecone, query_pinecone
+from services.pipeline import enrich_note
+
+
+def _render_notes_list():
+    """Текст и кнопки списка последних заметок; (None, None), если заметок нет."""
+    latest_notes = get_latest_notes(5)
+    if not latest_notes:
+        return None, None
+
+    message_text = "📋 *Ваши последние заметки:*\n\n"
+    navigation_buttons = []
+    for i, note in enumerate(latest_notes):
+        page_id = note['id']
+        title_parts = note.get('properties', {}).get('Name', {}).get('title', [])
+        full_title = title_parts[0]['plain_text'] if title_parts else "Без названия"
+        # Обрезаем длинные заголовки для меню
+        button_title = (full_title[:20] + '..') if len(full_title) > 20 else full_title
+
+        message_text += f"*{i+1}. {full_title}*\n"
+        # note_menu_{page_id} открывает меню действий с заметкой
+        navigation_buttons.append([{"text": f"{i+1}. {button_title}", "callback_data": f"note_menu_{page_id}"}])
+    return message_text, navigation_buttons
+
+
+def _search_notes(query: str) -> str:
+    """Смысловой поиск: ответ AI по найденным заметкам.
+
+    Returns:
+        Текст ответа, '' — ничего не найдено, None — найдено, но не прочитано
+    """
+    found_ids = query_pinecone(query, top_k=3)
+    if not found_ids:
+        return ''
+
+    context = ""
+    for page_id in found_ids:
+        try:
+            page_content = get_notion_page_content(page_id)
+            page_title = page_content.split('\n', 1)[0] if page_content else "Без названия"
+            context += f"--- Текст из заметки '{page_title}' ---\n{page_content}\n\n"
+        except Exception as e:
+            print(f"Не удалось получить контент для страницы {page_id}: {e}")
+
+    if not context:
+        return None
+    return summarize_for_search(context, query)
+
+
+# --- Команды и кнопки клавиатуры ---
+
+def notes_command(ctx, arg):
+    """/notes и «📝 Заметки»."""
+    send_telegram_message(ctx.chat_id, "🔎 Загружаю последние заметки...")
+    message_text, navigation_buttons = _render_notes_list()
+    if message_text is None:
+        send_telegram_message(ctx.chat_id, "😔 Заметок пока нет.", show_keyboard=True)
+    else:
+        send_message_with_buttons(ctx.chat_id, message_text, navigation_buttons)
+
+
+def search_button(ctx, arg):
+    """«🔍 Поиск» — ждём запрос следующим сообщением."""
+    set_user_state(ctx.user_id, 'awaiting_search', None)
+    send_telegram_message(ctx.chat_id, "🔍 Введите поисковый запрос:")
+
+
+def search_command(ctx, arg):
+    """/search <запрос>."""
+    query = arg
+    if not query:
+        send_telegram_message(ctx.chat_id, "Пожалуйста, укажите, что нужно найти после команды /search.")
+        return
+
+    send_telegram_message(ctx.chat_id, f"🧠 Ищу по смыслу: *{query}*...")
+    answer = _search_notes(query)
+    if answer == '':
+        send_telegram_message(ctx.chat_id, "😔 Ничего не найдено по вашему запросу.")
+    elif answer is None:
+        send_telegram_message(ctx.chat_id, "🤔 Нашел подходящие заметки, но не смог прочитать их содержимое.")
+    else:
+        send_telegram_message(ctx.chat_id, f"💡 *Вот что я нашел по вашему запросу:*\n\n{answer}")
+
+
+def index_all_command(ctx, arg):
+    """/index_all — переиндексировать последние заметки в Pinecone."""
+    send_telegram_message(ctx.chat_id, "Начинаю полную индексацию всех заметок. Это может занять время...")
+    all_notes = get_latest_notes(100)
+    for note in all_notes:
+        page_id = note['id']
+        page_content = get_notion_page_content(page_id)
+        upsert_to_pinecone(page_id, page_content)
+    send_telegram_message(ctx.chat_id, f"✅ Готово! Проиндексировано {len(all_notes)} заметок.", show_keyboard=True)
+
+
+def undo_command(ctx, arg):
+    send_telegram_message(ctx.chat_id, "Пожалуйста, используйте кнопку '↩️ Отменить' под сообщением.")
+
+
+def edit_command(ctx, arg):
+    """/edit <текст> — добавить текст в последнюю заметку; без текста — меню последней заметки."""
+    chat_id = ctx.chat_id
+    edit_text = arg.strip()
+
+    if not edit_text:
+        last_page_id = get_last_created_page_id()
+        if last_page_id:
+            preview = get_page_preview(last_page_id)
+            buttons = [
+                [
+                    {"text": "✏️ Переименовать", "callback_data": f"rename_page_{last_page_id}"},
+                    {"text": "👁️ Просмотр", "callback_data": f"view_page_{last_page_id}"}
+                ],
+                [
+                    {"text": "➕ Добавить текст", "callback_data": f"add_to_notion_{last_page_id}"},
+                    {"text": "🗑️ Удалить", "callback_data": f"delete_notion_{last_page_id}"}
+                ]
+            ]
+            msg = f"📝 *Последняя заметка:*\n\n*{preview['title']}*\n_{preview['preview']}_"
+            send_message_with_buttons(chat_id, msg, buttons)
+        else:
+            send_telegram_message(chat_id, "❌ Нет заметок для редактирования.", show_keyboard=True)
+        return
+
+    last_page_id = get_last_created_page_id()
+    if not last_page_id:
+        send_telegram_message(
+            chat_id,
+            "❌ Не удалось найти последнюю заметку.\n\n"
+            "Возможно, лог действий пуст или не настроен."
+        )
+        return
+
+    # Сохраняем текст в user state и показываем кнопки выбора
+    page_title = get_page_title(last_page_id)
+    set_user_state(ctx.user_id, 'pending_edit', last_page_id, edit_text)
+
+    buttons = [[
+        {"text": "➕ Просто добавить", "callback_data": f"edit_simple_{last_page_id}"},
+        {"text": "✨ Добавить + Полировка", "callback_data": f"edit_polish_{last_page_id}"}
+    ]]
+    msg = f"📝 Добавить в *{page_title}*:\n\n_{edit_text}_"
+    send_message_with_buttons(chat_id, msg, buttons)
+
+
+# --- Состояния диалога (ждём текст от пользователя) ---
+
+def awaiting_add_text(ctx, arg):
+    text_to_add = ctx.text
+    if text_to_add:
+        add_to_notion_page(ctx.user_state['page_id'], text_to_add)
+        send_telegram_message(ctx.chat_id, "✅ Текст успешно добавлен в заметку!", show_keyboard=True)
+    else:
+        send_telegram_message(ctx.chat_id, "Отмена. Получено пустое сообщение.")
+    set_user_state(ctx.user_id, None, None)  # Очищаем state
+
+
+def awaiting_rename(ctx, arg):
+    new_title = ctx.text.strip()
+    if new_title:
+        try:
+            rename_page(ctx.user_state['page_id'], new_title)
+            send_telegram_message(ctx.chat_id, f"✅ Заметка переименована в *{new_title}*", show_keyboard=True)
+        except Exception as e:
+            send_telegram_message(ctx.chat_id, f"❌ Ошибка переименования: {e}")
+    else:
+        send_telegram_message(ctx.chat_id, "Отмена. Название не может быть пустым.")
+    set_user_state(ctx.user_id, None, None)
+
+
+def awaiting_search(ctx, arg):
+    query = ctx.text.strip()
+    if query:
+        send_telegram_message(ctx.chat_id, f"🧠 Ищу по смыслу: *{query}*...")
+        answer = _search_notes(query)
+        if answer == '':
+            send_telegram_message(ctx.chat_id, "😔 Ничего не найдено.", show_keyboard=True)
+        elif answer is None:
+            send_telegram_message(ctx.chat_id, "🤔 Нашел заметки, но не смог прочитать.", show_keyboard=True)
+        else:
+            send_telegram_message(ctx.chat_id, f"💡 *Вот что я нашел:*\n\n{answer}", show_keyboard=True)
+    else:
+        send_telegram_message(ctx.chat_id, "Отмена. Пустой запрос.")
+    set_user_state(ctx.user_id, None, None)
+
+
+# --- Inline-кнопки ---
+
+def undo_last_action(ctx, arg):
+    last_action = get_and_delete_last_log()
+    if last_action:
+        if last_action.get('notion_page_id'):
+            delete_notion_page(last_action['notion_page_id'])
+        if last_action.get('gcal_event_id') and last_action.get('gcal_calendar_id'):
+            delete_gcal_event(last_action['gcal_calendar_id'], last_action['gcal_event_id'])
+        send_telegram_message(ctx.chat_id, "✅ Последнее действие отменено.")
+    else:
+        send_telegram_message(ctx.chat_id, "🤔 Не найдено действий для отмены.")
+
+
+def delete_note(ctx, page_id):
+    try:
+        # Название читаем одновременно с удалением (архивная страница тоже читается)
+        page_title, _ = run_parallel(
+            lambda: get_page_title(page_id),
+            lambda: delete_notion_page(page_id)
+        )
+        # Редактируем сообщение вместо отправки нового
+        buttons = [
+            [
+                {"text": "♻️ Восстановить", "callback_data": f"restore_{page_id}"},
+                {"text": "🔙 К списку", "callback_data": "back_to_notes_list"}
+            ]
+        ]
+        edit_telegram_message(ctx.chat_id, ctx.message_id, f"🗑️ ~{page_title}~ удалена", inline_buttons=buttons)
+    except Exception as e:
+        edit_telegram_message(ctx.chat_id, ctx.message_id, f"❌ Ошибка: {e}")
+
+
+def restore_note(ctx, page_id):
+    try:
+        _, preview = run_parallel(
+            lambda: restore_notion_page(page_id),
+            lambda: get_page_preview(page_id, max_chars=60)
+        )
+        # Восстанавливаем оригинальные кнопки
+        buttons = [[
+            {"text": "👁️", "callback_data": f"view_page_{page_id}"},
+            {"text": "➕", "callback_data": f"add_to_notion_{page_id}"},
+            {"text": "✏️", "callback_data": f"rename_page_{page_id}"},
+            {"text": "🗑️", "callback_data": f"delete_notion_{page_id}"}
+        ]]
+        note_text = f"📋 *{preview['title']}*\n_{preview['preview']}_"
+        edit_telegram_message(ctx.chat_id, ctx.message_id, note_text, inline_buttons=buttons)
+    except Exception as e:
+        edit_telegram_message(ctx.chat_id, ctx.message_id, f"❌ Ошибка восстановления: {e}")
+
+
+def add_text_prompt(ctx, page_id):
+    set_user_state(str(ctx.chat_id), 'awaiting_add_text', page_id)
+    send_telegram_message(ctx.chat_id, "▶️ Введите текст, который нужно *добавить* в конец заметки:")
+
+
+def rename_prompt(ctx, page_id):
+    set_user_state(str(ctx.chat_id), 'awaiting_rename', page_id)
+    send_telegram_message(ctx.chat_id, "✏️ Введите новое название заметки:")
+
+
+def back_to_notes_list(ctx, arg):
+    message_text, navigation_buttons = _render_notes_list()
+    if message_text is None:
+        edit_telegram_message(ctx.chat_id, ctx.message_id, "😔 Заметок пока нет.")
+    else:
+        edit_telegram_message(ctx.chat_id, ctx.message_id, message_text, inline_buttons=navigation_buttons)
+
+
+def note_menu(ctx, page_id):
+    """Меню действий с конкретной заметкой."""
+    try:
+        preview = get_page_preview(page_id, max_chars=100)  # Заголовок и текст читаются параллельно
+        buttons = [
+            [
+                {"text": "👁️ Просмотр", "callback_data": f"view_page_{page_id}"},
+                {"text": "✏️ Переименовать", "callback_data": f"rename_page_{page_id}"},
+            ],
+            [
+                {"text": "➕ Добавить текст", "callback_data": f"add_to_notion_{page_id}"},
+                {"text": "🗑️ Удалить", "callback_data": f"delete_notion_{page_id}"}
+            ],
+            [
+                {"text": "🔙 Назад к списку", "callback_data": "back_to_notes_list"}
+            ]
+        ]
+        msg = f"📋 *{preview['title']}*\n\n_{preview['preview']}_"
+        edit_telegram_message(ctx.chat_id, ctx.message_id, msg, inline_buttons=buttons)
+    except Exception as e:
+        edit_telegram_message(ctx.chat_id, ctx.message_id, f"❌ Ошибка загрузки заметки: {e}")
+
+
+def view_page(ctx, page_id):
+    try:
+        title, content = run_parallel(
+            lambda: get_page_title(page_id),
+            lambda: get_notion_page_content(page_id)
+        )
+        # Ограничиваем длину для Telegram
+        if len(content) > 3000:
+            content = content[:3000] + "\n\n... _(текст обрезан)_"
+
+        buttons = [[{"text": "🔙 Назад", "callback_data": f"note_menu_{page_id}"}]]
+        edit_telegram_message(ctx.chat_id, ctx.message_id, f"📋 *{title}*\n\n{content}", inline_buttons=buttons)
+    except Exception as e:
+        send_telegram_message(ctx.chat_id, f"❌ Ошибка при загрузке: {e}")
+
+
+def edit_simple(ctx, page_id):
+    """Просто добавить текст из /edit без полировки."""
+    chat_id = ctx.chat_id
+    user_state = get_user_state(str(chat_id))
+    if user_state and user_state.get('pending_edit_text'):
+        try:
+            add_to_notion_page(page_id, user_state['pending_edit_text'])
+            title = get_page_title(page_id)
+            send_telegram_message(chat_id, f"✅ Добавлено в *{title}*", show_keyboard=True)
+        except Exception as e:
+            send_telegram_message(chat_id, f"❌ Ошибка: {e}")
+        set_user_state(str(chat_id), None, None)  # Очищаем state
+    else:
+        send_telegram_message(chat_id, "❌ Текст для добавления не найден.")
+
+
+def edit_polish(ctx, page_id):
+    """Добавить текст из /edit и отполировать заметку через AI."""
+    chat_id = ctx.chat_id
+    user_state = get_user_state(str(chat_id))
+    if user_state and user_state.get('pending_edit_text'):
+        try:
+            send_telegram_message(chat_id, "✨ Полирую текст...")
+            old_content = get_notion_page_content(page_id)
+            polished = polish_content(old_content, user_state['pending_edit_text'])
+            replace_page_content(page_id, polished)
+            title = get_page_title(page_id)
+            send_telegram_message(chat_id, f"✅ *{title}* обновлена и отполирована!", show_keyboard=True)
+        except Exception as e:
+            send_telegram_message(chat_id, f"❌ Ошибка полировки: {e}")
+        set_user_state(str(chat_id), None, None)
+    else:
+        send_telegram_message(chat_id, "❌ Текст для добавления не найден.")
+
+
+def enrich_note_callback(ctx, page_id):
+    """«✨ Обработать» — повторная AI-обработка заметки из быстрой записи."""
+    edit_telegram_message(ctx.chat_id, ctx.message_id, "✨ Оформляю заметку...")
+    try:
+        enrich_note(ctx.chat_id, page_id, get_notion_page_content(page_id), status_message_id=ctx.message_id)
+    except Exception as e:
+        print(f"Ошибка AI-обработки заметки {page_id}: {e}")
+        buttons = [[
+            {"text": "✨ Обработать", "callback_data": f"enrich_note_{page_id}"},
+            {"text": "👁️ Просмотр", "callback_data": f"view_page_{page_id}"}
+        ]]
+        edit_telegram_message(ctx.chat_id, ctx.message_id, "📥 AI всё ещё недоступен — заметка сохранена как есть.", inline_buttons=buttons)
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""Таблица маршрутов бота.
+
+Обработчики указаны строкой 'модуль:функция' — модуль импортируется при
+первом вызове маршрута, так что холодный старт не тянет зависимости
+всех команд сразу.
+"""
+from utils.router import Router
+
+# Нажатия inline-кнопок: ключ — callback_data
+callback_router = Router('callback')
+# Команды и кнопки клавиатуры: ключ — текст сообщения
+message_router = Router('message')
+# Ответ на вопрос бота: ключ — state пользователя
+state_router = Router('state')
+
+# Кнопки постоянной клавиатуры (нажатие выключает режим транскрипта)
+KEYBOARD_BUTTONS = {"📝 Заметки", "🔍 Поиск", "📋 ClickUp", "⚙️ Настройки"}
+
+_CALLBACK_ROUTES = {
+    'undo_last_action': 'handlers.notes:undo_last_action',
+    'back_to_notes_list': 'handlers.notes:back_to_notes_list',
+    'clickup_refresh': 'handlers.clickup:clickup_refresh',
+    'unhide_all': 'handlers.clickup:unhide_all',
+    'exit_transcript': 'handlers.transcript:exit_transcript',
+    'transcript_finish': 'handlers.transcript:transcript_finish',
+    'transcript_clear': 'handlers.transcript:transcript_clear',
+    'set_transcript_clean': 'handlers.settings:set_transcript_option',
+    'set_transcript_raw': 'handlers.settings:set_transcript_option',
+    'set_transcript_single_mode': 'handlers.settings:set_transcript_option',
+    'set_transcript_multi_mode': 'handlers.settings:set_transcript_option',
+}
+
+_CALLBACK_PREFIX_ROUTES = {
+    'delete_notion_': 'handlers.notes:delete_note',
+    'restore_': 'handlers.notes:restore_note',
+    'add_to_notion_': 'handlers.notes:add_text_prompt',
+    'note_menu_': 'handlers.notes:note_menu',
+    'rename_page_': 'handlers.notes:rename_prompt',
+    'view_page_': 'handlers.notes:view_page',
+    'edit_simple_': 'handlers.notes:edit_simple',
+    'edit_polish_': 'handlers.notes:edit_polish',
+    'enrich_note_': 'handlers.notes:enrich_note_callback',
+    'set_reminder_': 'handlers.settings:set_reminder',
+    'hide_task_': 'handlers.clickup:hide_task',
+    'save_transcript_': 'handlers.transcript:save_transcript',
+    'summarize_transcript_': 'handlers.transcript:summarize_transcript_callback',
+    'resume_transcript_': 'handlers.transcript:resume_transcript',
+}
+
+_MESSAGE_ROUTES = {
+    '📝 Заметки': 'handlers.notes:notes_command',
+    '🔍 Поиск': 'handlers.notes:search_button',
+    '📋 ClickUp': 'handlers.clickup:clickup_button',
+    '🎙 Транскрипт': 'handlers.transcript:transcript_button',
+    '⚙️ Настройки': 'handlers.settings:settings_button',
+    '/start': 'handlers.commands:start_command',
+    '/briefing': 'handlers.commands:briefing_command',
+    '/evening': 'handlers.commands:evening_command',
+    '/xp': 'handlers.commands:xp_command',
+    '/routes': 'handlers.commands:routes_command',
+    '/notes': 'handlers.notes:notes_command',
+    '/index_all': 'handlers.notes:index_all_command',
+    '/undo': 'handlers.notes:undo_command',
+    '/hide': 'handlers.clickup:hide_command',
+    '/register_webhook': 'handlers.clickup:register_webhook_command',
+}
+
+# Команды с аргументом: обработчик получает текст после префикса
+_MESSAGE_PREFIX_ROUTES = {
+    '/search ': 'handlers.notes:search_command',
+    '/replay': 'handlers.commands:replay_command',
+    '/edit': 'handlers.notes:edit_command',
+}
+
+_STATE_ROUTES = {
+    'awaiting_add_text': 'handlers.notes:awaiting_add_text',
+    'awaiting_rename': 'handlers.notes:awaiting_rename',
+    'awaiting_search': 'handlers.notes:awaiting_search',
+}
+
+for _key, _target in _CALLBACK_ROUTES.items():
+    callback_router.exact(_key, _target)
+for _key, _target in _CALLBACK_PREFIX_ROUTES.items():
+    callback_router.prefix(_key, _target)
+for _key, _target in _MESSAGE_ROUTES.items():
+    message_router.exact(_key, _target)
+for _key, _target in _MESSAGE_PREFIX_ROUTES.items():
+    message_router.prefix(_key, _target)
+for _key, _target in _STATE_ROUTES.items():
+    state_router.exact(_key, _target)
+
+
+def get_route_stats() -> list:
+    """Статистика всех маршрутов бота, самые затратные первыми."""
+    stats = callback_router.get_stats() + message_router.get_stats() + state_router.get_stats()
+    stats.sort(key=lambda s: s['total'], reverse=True)
+    return stats
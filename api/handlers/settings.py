@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Меню настроек: уведомления о событиях и режимы транскрипта."""
+from services.telegram import send_telegram_message, edit_telegram_message, send_message_with_buttons, answer_callback_query
+from services.notion import (
+    get_user_settings,
+    set_user_settings,
+    get_transcript_clean,
+    set_transcript_clean,
+    get_transcript_single_mode,
+    set_transcript_single_mode
+)
+
+# callback_data -> (функция настройки, значение)
+_TRANSCRIPT_OPTIONS = {
+    'set_transcript_clean': (set_transcript_clean, True),
+    'set_transcript_raw': (set_transcript_clean, False),
+    'set_transcript_single_mode': (set_transcript_single_mode, True),
+    'set_transcript_multi_mode': (set_transcript_single_mode, False)
+}
+
+
+def render_settings_menu(user_id: str) -> tuple:
+    """Текст и кнопки меню настроек с отметками текущих значений."""
+    settings = get_user_settings(user_id)
+    current_minutes = settings.get('reminder_minutes', 15)
+    is_clean = get_transcript_clean(user_id)
+    is_single = get_transcript_single_mode(user_id)
+
+    buttons = [
+        [
+            {"text": "5 мин" + (" ✓" if current_minutes == 5 else ""), "callback_data": "set_reminder_5"},
+            {"text": "15 мин" + (" ✓" if current_minutes == 15 else ""), "callback_data": "set_reminder_15"},
+            {"text": "30 мин" + (" ✓" if current_minutes == 30 else ""), "callback_data": "set_reminder_30"}
+        ],
+        [
+            {"text": "1 час" + (" ✓" if current_minutes == 60 else ""), "callback_data": "set_reminder_60"},
+            {"text": "Выкл" + (" ✓" if current_minutes == 0 else ""), "callback_data": "set_reminder_0"}
+        ],
+        [
+            {"text": "💬 Одиночный" + (" ✓" if is_single else ""), "callback_data": "set_transcript_single_mode"},
+            {"text": "💬💬 Поток" + (" ✓" if not is_single else ""), "callback_data": "set_transcript_multi_mode"}
+        ],
+        [
+            {"text": "📜 Дословный" + (" ✓" if not is_clean else ""), "callback_data": "set_transcript_raw"},
+            {"text": "✨ Чистый" + (" ✓" if is_clean else ""), "callback_data": "set_transcript_clean"}
+        ]
+    ]
+
+    clean_desc = "✨ Чистый — без слов-заполнителей" if is_clean else "📜 Дословный — точная цитата"
+    mode_desc = "⚡️ Одиночный (с таймкодами)" if is_single else "🔄 Поток (склеивает несколько аудио)"
+    msg = f"⚙️ *Настройки*\n\n📱 *Уведомления*\nЗа сколько минут до события?\n_Текущее: {current_minutes} мин_\n\n🎙 *Транскрипт*\nМетод обработки: _{mode_desc}_\nПодрежим расшифровки: _{clean_desc}_"
+    return msg, buttons
+
+
+def settings_button(ctx, arg):
+    """«⚙️ Настройки». Режим транскрипта не выключаем — настройки работают параллельно."""
+    msg, buttons = render_settings_menu(ctx.user_id)
+    send_message_with_buttons(ctx.chat_id, msg, buttons)
+
+
+def set_reminder(ctx, minutes):
+    """Время напоминания о событии: set_reminder_<минуты>."""
+    minutes = int(minutes)
+    set_user_settings(str(ctx.chat_id), minutes)
+
+    if minutes == 0:
+        send_telegram_message(ctx.chat_id, "🔕 Уведомления в Telegram *отключены*.", show_keyboard=True)
+    else:
+        send_telegram_message(ctx.chat_id, f"✅ Уведомления будут приходить за *{minutes} мин* до события.", show_keyboard=True)
+
+
+def set_transcript_option(ctx, arg):
+    """Подрежим и метод обработки транскрипта — меню обновляется на месте."""
+    setter, value = _TRANSCRIPT_OPTIONS[ctx.data]
+    setter(ctx.user_id, value)
+
+    answer_callback_query(ctx.callback_query_id, "Настройки обновлены")
+    msg, buttons = render_settings_menu(ctx.user_id)
+    edit_telegram_message(ctx.chat_id, ctx.message_id, msg, inline_buttons=buttons)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Режим транскрипта: вход/выход, сохранение, резюме, мульти-транскрипт."""
+import re
+from datetime import datetime
+
+import pytz
+
+from utils.config import USER_TIMEZONE
+from services.telegram import send_telegram_message, edit_telegram_message, send_message_with_buttons, send_long_message
+from services.notion import (
+    create_notion_page,
+    set_active_mode,
+    get_transcript_clean,
+    save_temp_transcript,
+    get_temp_transcript,
+    get_temp_transcript_meta,
+    get_transcript_buffer,
+    clear_transcript_buffer,
+    get_pending_transcription
+)
+from services.ai import process_with_ai, summarize_transcript, fetch_transcription
+from services.pipeline import continue_after_transcription
+
+
+def transcript_button(ctx, arg):
+    """«🎙 Транскрипт» — включаем режим транскрипта."""
+    set_active_mode(ctx.user_id, 'transcript')
+    is_clean = get_transcript_clean(ctx.user_id)
+    mode_label = "✨ Чистый" if is_clean else "📜 Дословный"
+    buttons = [[{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}]]
+    send_message_with_buttons(
+        ctx.chat_id,
+        f"🎙 *Режим транскрипта активен*\n\n"
+        f"Пересылайте голосовые — получите чистый текст.\n\n"
+        f"Текущий подрежим: {mode_label}\n"
+        f"_Изменить подрежим можно в ⚙️ Настройки_",
+        buttons
+    )
+
+
+def exit_transcript(ctx, arg):
+    set_active_mode(ctx.user_id, None)
+    send_telegram_message(ctx.chat_id, "✅ Режим транскрипта выключен.", show_keyboard=True)
+
+
+def save_transcript(ctx, log_id):
+    chat_id, message_id = ctx.chat_id, ctx.message_id
+    transcript_meta = get_temp_transcript_meta(log_id)
+    transcript_text = get_temp_transcript(log_id)
+
+    if not transcript_text:
+        edit_telegram_message(chat_id, message_id, "❌ Транскрипт устарел или уже сохранен.")
+        return
+
+    # Сохраняем как новую заметку (заголовок/категория могли быть посчитаны заранее)
+    if transcript_meta.get('main_title'):
+        ai_data = transcript_meta
+    else:
+        ai_data = process_with_ai(transcript_text)
+    title = ai_data.get('main_title', 'Транскрипт')
+    category = ai_data.get('category', 'Мысль')
+
+    try:
+        # Убираем разметки markdown если есть
+        clean_text = re.sub(r'[*_`]', '', transcript_text)
+        new_page_id = create_notion_page(title, clean_text, category)
+
+        buttons = [[
+            {"text": "👁️ Просмотр", "callback_data": f"view_page_{new_page_id}"},
+            {"text": "🗑️ Удалить", "callback_data": f"delete_notion_{new_page_id}"}
+        ]]
+        edit_telegram_message(chat_id, message_id, f"✅ Транскрипт сохранен как заметка: *{title}*", inline_buttons=buttons)
+    except Exception as e:
+        print(f"Ошибка сохранения транскрипта: {e}")
+        edit_telegram_message(chat_id, message_id, "❌ Ошибка сохранения заметки.")
+
+
+def summarize_transcript_callback(ctx, log_id):
+    chat_id, message_id = ctx.chat_id, ctx.message_id
+    transcript_meta = get_temp_transcript_meta(log_id)
+    transcript_text = get_temp_transcript(log_id)  # Текст удаляется после этого
+    if not transcript_text:
+        edit_telegram_message(chat_id, message_id, "❌ Транскрипт устарел и был удален.")
+        return
+
+    try:
+        summary = transcript_meta.get('summary')
+        if not summary:
+            edit_telegram_message(chat_id, message_id, "⏳ Генерирую резюме...")
+            summary = summarize_transcript(transcript_text)
+
+        # Пересохраняем оригинал для возможности сохранить в Notion
+        new_log_id = save_temp_transcript(ctx.user_id, transcript_text, meta=transcript_meta)
+
+        msg = f"📊 *Выжимка транскрипта:*\n\n{summary}\n\n_Оригинальный текст сохранен во временный буфер._"
+        buttons = []
+        if new_log_id:
+            buttons.append([{"text": "💾 Сохранить в Notion", "callback_data": f"save_transcript_{new_log_id}"}])
+        buttons.append([{"text": "🔙 Закрыть", "callback_data": "exit_transcript"}])
+
+        edit_telegram_message(chat_id, message_id, msg, inline_buttons=buttons)
+    except Exception as e:
+        print(f"Ошибка резюме: {e}")
+        edit_telegram_message(chat_id, message_id, "❌ Ошибка при генерации резюме.")
+
+
+def resume_transcript(ctx, transcript_id):
+    """Повторная проверка задачи AssemblyAI, которую не дождались при опросе."""
+    transcript_data = fetch_transcription(transcript_id)
+    if transcript_data and transcript_data.get('status') != 'completed':
+        # Callback уже отвечен в bot.py — второй ответ с подсказкой Telegram отклонит,
+        # поэтому сообщаем правкой. Время проверки делает текст новым (иначе «not modified»)
+        checked_at = datetime.now(pytz.timezone(USER_TIMEZONE)).strftime('%H:%M:%S')
+        buttons = [[{"text": "🔄 Проверить ещё раз", "callback_data": f"resume_transcript_{transcript_id}"}]]
+        edit_telegram_message(
+            ctx.chat_id, ctx.message_id,
+            f"⏳ Распознавание ещё идёт (проверено в {checked_at}). Нажмите кнопку чуть позже — результат не потеряется.",
+            inline_buttons=buttons
+        )
+        return
+
+    context = get_pending_transcription(transcript_id)
+    if context:
+        edit_telegram_message(ctx.chat_id, ctx.message_id, "✅ Распознавание завершено.")
+        continue_after_transcription(context, transcript_data)
+    else:
+        edit_telegram_message(ctx.chat_id, ctx.message_id, "❌ Задача распознавания уже обработана или устарела.")
+
+
+def transcript_finish(ctx, arg):
+    """Завершаем мульти-транскрипт: весь буфер одним сообщением (или частями/файлом)."""
+    chat_id, message_id = ctx.chat_id, ctx.message_id
+    _, buffer_content = get_transcript_buffer(ctx.user_id)
+    clear_transcript_buffer(ctx.user_id)
+
+    if not buffer_content:
+        edit_telegram_message(chat_id, message_id, "❌ Нет активного буфера транскриптов.")
+        return
+
+    # Очищаем сепараторы в начале
+    if buffer_content.startswith("\n\n---\n\n"):
+        buffer_content = buffer_content[9:]
+
+    # Сохраняем во временный лог для кнопок
+    log_id = save_temp_transcript(ctx.user_id, buffer_content)
+    buttons = []
+    if log_id:
+        buttons.append([
+            {"text": "💾 В Notion", "callback_data": f"save_transcript_{log_id}"},
+            {"text": "📊 Резюме", "callback_data": f"summarize_transcript_{log_id}"}
+        ])
+    buttons.append([{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}])
+
+    max_len = 3900
+    if len(buffer_content) <= max_len:
+        edit_telegram_message(chat_id, message_id, f"✅ *Мульти-транскрипт завершен:*\n\n{buffer_content}", inline_buttons=buttons)
+    else:
+        # Длинный — частями или .txt-файлом, без обрезки
+        edit_telegram_message(chat_id, message_id, "✅ *Мульти-транскрипт завершен:*")
+        send_long_message(chat_id, buffer_content, inline_buttons=buttons, filename="multi_transcript.txt")
+
+
+def transcript_clear(ctx, arg):
+    clear_transcript_buffer(ctx.user_id)
+    edit_telegram_message(ctx.chat_id, ctx.message_id, "🗑️ Буфер мульти-транскрипта очищен.")
@@ -1,7 +1,22 @@
 # -*- coding: utf-8 -*-
-"""Services package - init for relative imports."""
-from .telegram import *
-from .ai import *
-from .calendar import *
-from .notion import *
-from .pinecone_svc import *
+"""Services package - init for relative imports.
+
+Подмодули не импортируются заранее: `from services.notion import ...` не должен
+тянуть за собой google, pinecone и openai. Имена вида `services.send_telegram_message`
+по-прежнему доступны — модуль с ними импортируется при первом обращении.
+"""
+import importlib
+
+_SUBMODULES = ('telegram', 'ai', 'calendar', 'notion', 'pinecone_svc')
+
+
+def __getattr__(name):
+    if name.startswith('_'):
+        raise AttributeError(name)
+    if name in _SUBMODULES:
+        return importlib.import_module(f'{__name__}.{name}')
+    for submodule in _SUBMODULES:
+        module = importlib.import_module(f'{__name__}.{submodule}')
+        if hasattr(module, name):
+            return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,89 +1,334 @@
 # -*- coding: utf-8 -*-
 """Сервис для работы с AI (OpenAI, AssemblyAI)."""
 import json
+import re
+import threading
 import time
-import requests
 
+from utils.http import http_session
 from utils.config import (
     OPENAI_API_KEY, 
     ASSEMBLYAI_API_KEY, 
     DEFAULT_TIMEOUT, 
     MAX_POLLING_ATTEMPTS,
-    USER_TIMEZONE
+    POLLING_MAX_WAIT,
+    ASSEMBLYAI_WEBHOOK_SECRET,
+    USER_TIMEZONE,
+    TRANSCRIPT_CHUNK_CHARS,
+    AI_MAX_PARALLEL
 )
+from utils.concurrency import parallel_map
+from utils.fillers import strip_fillers, needs_ai_cleanup
+from utils.timeparse import has_temporal_expression
+from services.llm_router import hedged_call
 
 
-def transcribe_with_assemblyai(audio_file_bytes) -> str:
-    """Отправляет аудио в AssemblyAI и получает результат."""
-    headers = {'authorization': ASSEMBLYAI_API_KEY}
+ASSEMBLYAI_BASE_URL = "https://api.assemblyai.com/v2"
+WEBHOOK_AUTH_HEADER = "X-Dany-Webhook-Secret"
+
+
+def _assemblyai_headers():
+    return {'authorization': ASSEMBLYAI_API_KEY}
 
-    # 1. Отправляем файл на сервер AssemblyAI
-    upload_response = requests.post(
-        'https://api.assemblyai.com/v2/upload',
-        headers=headers,
+
+def upload_to_assemblyai(audio_file_bytes) -> str:
+    """Загружает аудио в AssemblyAI и возвращает upload_url.
+    
+    Args:
+        audio_file_bytes: bytes или итератор кусков (тогда тело уходит chunked-передачей)
+    """
+    upload_response = http_session.post(
+        f"{ASSEMBLYAI_BASE_URL}/upload",
+        headers=_assemblyai_headers(),
         data=audio_file_bytes,
         timeout=DEFAULT_TIMEOUT
     )
     upload_response.raise_for_status()
-    audio_url = upload_response.json()['upload_url']
     print("Аудиофайл успешно загружен в AssemblyAI.")
+    return upload_response.json()['upload_url']
+
 
-    # 2. Запускаем задачу транскрибации (с автоопределением языка)
+def submit_transcription(audio_url: str, webhook_url: str = None, speech_model: str = None) -> str:
+    """Создаёт задачу транскрибации и возвращает её ID.
+    
+    Args:
+        audio_url: URL аудио (upload_url или публичный URL)
+        webhook_url: Куда AssemblyAI пришлёт уведомление о готовности (None — будем опрашивать)
+        speech_model: Модель распознавания (None — по умолчанию AssemblyAI)
+    """
+    # С автоопределением языка
     transcript_request = {
         'audio_url': audio_url,
         'language_detection': True
     }
-    transcript_response = requests.post(
-        "https://api.assemblyai.com/v2/transcript",
+    if speech_model:
+        transcript_request['speech_model'] = speech_model
+    if webhook_url:
+        transcript_request['webhook_url'] = webhook_url
+        if ASSEMBLYAI_WEBHOOK_SECRET:
+            transcript_request['webhook_auth_header_name'] = WEBHOOK_AUTH_HEADER
+            transcript_request['webhook_auth_header_value'] = ASSEMBLYAI_WEBHOOK_SECRET
+
+    transcript_response = http_session.post(
+        f"{ASSEMBLYAI_BASE_URL}/transcript",
         json=transcript_request,
-        headers=headers,
+        headers=_assemblyai_headers(),
         timeout=DEFAULT_TIMEOUT
     )
     transcript_response.raise_for_status()
     transcript_id = transcript_response.json()['id']
     print(f"Задача на транскрибацию создана с ID: {transcript_id}")
+    return transcript_id
+
+
+def fetch_transcription(transcript_id: str) -> dict:
+    """Один запрос статуса задачи.
+    
+    Returns:
+        {'status': 'completed', 'text', 'words'} | {'status': 'processing' / 'queued', 'id'} | None при ошибке
+    """
+    polling_response = http_session.get(
+        f"{ASSEMBLYAI_BASE_URL}/transcript/{transcript_id}",
+        headers=_assemblyai_headers(),
+        timeout=DEFAULT_TIMEOUT
+    )
+    polling_response.raise_for_status()
+    data = polling_response.json()
+    status = data['status']
+    if status == 'completed':
+        return {
+            'status': 'completed',
+            'text': data.get('text', ''),
+            'words': data.get('words', [])
+        }
+    if status == 'error':
+        print(f"Ошибка транскрибации в AssemblyAI: {data.get('error')}")
+        return None
+    return {'status': status, 'id': transcript_id}
+
 
-    # 3. Ждем результата с ограничением по времени
+def poll_transcription(transcript_id: str, max_wait: float = POLLING_MAX_WAIT,
+                       initial_delay: float = 1.0, max_delay: float = 6.0) -> dict:
+    """Ждёт результат с растущей паузой (initial_delay → max_delay) в пределах max_wait секунд.
+    
+    Можно вызвать повторно с тем же transcript_id, если прошлый опрос не дождался.
+    
+    Returns:
+        Как fetch_transcription; при исчерпании бюджета — {'status': 'processing', 'id'}
+    """
+    delay = initial_delay
+    started = time.monotonic()
     for attempt in range(MAX_POLLING_ATTEMPTS):
-        polling_response = requests.get(
-            f"https://api.assemblyai.com/v2/transcript/{transcript_id}",
-            headers=headers,
-            timeout=DEFAULT_TIMEOUT
-        )
-        polling_response.raise_for_status()
-        status = polling_response.json()['status']
-        if status == 'completed':
-            print("Транскрибация завершена.")
-            data = polling_response.json()
-            return {
-                'text': data.get('text', ''),
-                'words': data.get('words', [])
-            }
-        elif status == 'error':
-            print("Ошибка транскрибации в AssemblyAI.")
-            return None
-        time.sleep(2)
+        result = fetch_transcription(transcript_id)
+        if result is None or result['status'] == 'completed':
+            if result:
+                print("Транскрибация завершена.")
+            return result
+        if time.monotonic() - started + delay > max_wait:
+            break
+        time.sleep(delay)
+        delay = min(delay * 1.5, max_delay)
     
-    print(f"Превышено время ожидания транскрибации после {MAX_POLLING_ATTEMPTS} попыток")
-    return None
+    print(f"Транскрибация {transcript_id} ещё не готова после {time.monotonic() - started:.0f} сек")
+    return {'status': 'processing', 'id': transcript_id}
 
 
-def summarize_transcript(text: str) -> str:
-    """Генерирует краткую выжимку из длинного транскрипта (Feature 6)."""
+def transcribe_with_assemblyai(audio_file_bytes) -> str:
+    """Отправляет аудио в AssemblyAI и получает результат."""
+    audio_url = upload_to_assemblyai(audio_file_bytes)
+    transcript_id = submit_transcription(audio_url)
+    return poll_transcription(transcript_id)
+
+
+def _pack_parts(parts: list, separator: str, max_chars: int) -> list:
+    """Жадно склеивает части по порядку в куски не длиннее max_chars."""
+    chunks = []
+    current = []
+    current_len = 0
+    for part in parts:
+        if current and current_len + len(separator) + len(part) > max_chars:
+            chunks.append(separator.join(current))
+            current = []
+            current_len = 0
+        current.append(part)
+        current_len += len(part) + (len(separator) if current_len else 0)
+    if current:
+        chunks.append(separator.join(current))
+    return chunks
+
+
+def _split_sentences(text: str) -> list:
+    return [p for p in re.split(r'(?<=[.!?…])\s+', text) if p.strip()]
+
+
+def _split_transcript(text: str, max_chars: int = TRANSCRIPT_CHUNK_CHARS) -> tuple:
+    """Режет длинный транскрипт на куски не длиннее max_chars.
+
+    Границы — абзацы с таймкодами [mm:ss] из format_with_timecodes.
+    Абзац длиннее max_chars (или весь текст без абзацев — поток склеенных аудио)
+    режется по концам предложений.
+
+    Returns:
+        (список кусков, разделитель для обратной склейки)
+    """
+    if len(text) <= max_chars:
+        return [text], "\n\n"
+
+    paragraphs = [p for p in re.split(r'\n\s*\n', text) if p.strip()]
+    if len(paragraphs) == 1:
+        return _pack_parts(_split_sentences(text), " ", max_chars), " "
+
+    parts = []
+    for paragraph in paragraphs:
+        if len(paragraph) > max_chars:
+            parts.extend(_pack_parts(_split_sentences(paragraph), " ", max_chars))
+        else:
+            parts.append(paragraph)
+    return _pack_parts(parts, "\n\n", max_chars), "\n\n"
+
+
+# Статистика вызовов OpenAI по задачам (в рамках процесса): токены, кеш, задержка
+AI_USAGE_STATS = {}
+_usage_lock = threading.Lock()
+
+
+def _record_usage(task: str, usage: dict, latency: float):
+    """Запоминает prompt/cached токены из блока usage и время ответа."""
+    prompt_tokens = usage.get('prompt_tokens', 0) or 0
+    cached_tokens = (usage.get('prompt_tokens_details') or {}).get('cached_tokens', 0) or 0
+    with _usage_lock:
+        stats = AI_USAGE_STATS.setdefault(task, {
+            'calls': 0, 'prompt_tokens': 0, 'cached_tokens': 0, 'cache_hits': 0, 'latency_total': 0.0
+        })
+        stats['calls'] += 1
+        stats['prompt_tokens'] += prompt_tokens
+        stats['cached_tokens'] += cached_tokens
+        stats['cache_hits'] += 1 if cached_tokens else 0
+        stats['latency_total'] += latency
+    print(f"AI {task}: {latency:.2f}s, prompt_tokens={prompt_tokens}, cached_tokens={cached_tokens}")
+
+
+def get_ai_usage_stats() -> dict:
+    """Возвращает статистику по задачам с долей закешированных токенов и средней задержкой."""
+    with _usage_lock:
+        report = {}
+        for task, stats in AI_USAGE_STATS.items():
+            calls = stats['calls'] or 1
+            report[task] = dict(
+                stats,
+                cache_hit_rate=stats['cache_hits'] / calls,
+                cached_token_ratio=stats['cached_tokens'] / (stats['prompt_tokens'] or 1),
+                avg_latency=stats['latency_total'] / calls
+            )
+        return report
+
+
+def _chat_completion(task: str, system_prompt: str, user_content: str, **extra) -> str:
+    """Один вызов chat completions: неизменный system-префикс + переменная часть в user.
+
+    Постоянный префикс позволяет OpenAI переиспользовать кеш промпта между
+    запросами; prompt_cache_key группирует запросы одной задачи на одном кеше.
+    Модель, таймаут, hedging и запасная модель выбираются в llm_router.
+    """
     url = "https://api.openai.com/v1/chat/completions"
     headers = {"Content-Type": "application/json", "Authorization": f"Bearer {OPENAI_API_KEY}"}
-    
-    system_prompt = (
-        "Ты — секретарь. Твоя задача — сделать ВЫЖИМКУ из предоставленного "
-        "транскрипта голосового сообщения. Напиши 3-5 предложений детальнее, передающие суть, "
-        "или подробный bullet-point список (до 5 пунктов), чтобы не упустить важные детали "
-        "и контекст. Не добавляй водные фразы вроде 'В сообщении говорится...' — начинай сразу с сути."
+    messages = [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_content}
+    ]
+
+    def send(model, timeout):
+        data = {"model": model, "messages": messages, "prompt_cache_key": f"dany-{task}", **extra}
+        started = time.monotonic()
+        response = http_session.post(url, headers=headers, json=data, timeout=timeout)
+        response.raise_for_status()
+        ai_response = response.json()
+        _record_usage(task, ai_response.get('usage') or {}, time.monotonic() - started)
+        return ai_response
+
+    ai_response = hedged_call(task, len(system_prompt) + len(user_content), send)
+    # Валидация ответа AI
+    if not ai_response.get('choices') or not ai_response['choices'][0].get('message'):
+        raise ValueError("Невалидный ответ от OpenAI API")
+    return ai_response['choices'][0]['message']['content'].strip()
+
+
+SUMMARY_SYSTEM_PROMPT = (
+    "Ты — секретарь. Твоя задача — сделать ВЫЖИМКУ из предоставленного "
+    "транскрипта голосового сообщения. Напиши 3-5 предложений детальнее, передающие суть, "
+    "или подробный bullet-point список (до 5 пунктов), чтобы не упустить важные детали "
+    "и контекст. Не добавляй водные фразы вроде 'В сообщении говорится...' — начинай сразу с сути."
+)
+
+SUMMARY_MAP_PROMPT = (
+    "Ты — секретарь. Перед тобой ФРАГМЕНТ длинного транскрипта. "
+    "Выпиши bullet-point списком все ключевые факты, решения, договорённости, "
+    "даты и имена из этого фрагмента. Без вступлений и выводов, только суть."
+)
+
+SUMMARY_REDUCE_PROMPT = (
+    "Ты — секретарь. Перед тобой тезисы, выписанные по порядку из частей одного "
+    "длинного транскрипта. Объедини их в ОДНУ выжимку: 3-5 предложений или подробный "
+    "bullet-point список (до 5 пунктов). Убери повторы, сохрани важные детали и контекст. "
+    "Не добавляй водные фразы вроде 'В сообщении говорится...' — начинай сразу с сути."
+)
+
+
+def summarize_transcript(text: str) -> str:
+    """Генерирует краткую выжимку из длинного транскрипта (Feature 6).
+
+    Длинные транскрипты обрабатываются по схеме map-reduce: куски
+    конспектируются параллельно, затем тезисы сводятся в одну выжимку.
+    """
+    chunks, _ = _split_transcript(text)
+    if len(chunks) == 1:
+        return _chat_completion('summary', SUMMARY_SYSTEM_PROMPT, text)
+
+    print(f"Резюме по частям: {len(chunks)} фрагментов")
+    partials = parallel_map(
+        lambda chunk: _chat_completion('summary_map', SUMMARY_MAP_PROMPT, chunk),
+        chunks,
+        max_workers=AI_MAX_PARALLEL
     )
-    
-    data = {"model": "gpt-5.4-nano", "messages": [{"role": "system", "content": system_prompt}, {"role": "user", "content": text}]}
-    response = requests.post(url, headers=headers, json=data, timeout=DEFAULT_TIMEOUT)
-    response.raise_for_status()
-    return response.json()['choices'][0]['message']['content'].strip()
+    notes = "\n\n".join(f"Часть {i}:\n{partial}" for i, partial in enumerate(partials, 1))
+    return _chat_completion('summary_reduce', SUMMARY_REDUCE_PROMPT, notes)
+
+
+_NOTE_PROMPT_HEAD = """Твоя роль: умный редактор заметок. Проанализируй заметку пользователя.
+"""
+
+_NOTE_PROMPT_TIME = """
+КРИТИЧЕСКИ ВАЖНО: Текущее время пользователя и его timezone указаны в первой строке сообщения.
+При расчёте относительного времени ("через N минут", "через час") ОБЯЗАТЕЛЬНО прибавляй N к этому текущему времени.
+Например: если сейчас 17:51 и пользователь говорит "через 16 минут", то datetime_iso должен быть 18:07.
+"""
+
+_NOTE_PROMPT_TASKS = """
+Задачи:
+1. Язык: Сохраняй язык оригинала. Не переводи.
+2. Заголовок и Категория: Создай емкий заголовок и определи категорию из списка: [Идея, Задача, Покупка, Встреча, Мысль, Ссылка, Цитата].
+3. Форматирование: Очень Красиво отформатируй текст, можешь оптимизировать если где-то явное пустословие. Заметки должны быть прекрасными и эстетичными.
+    - Заголовки - жирным, можно с 1 эмодзи. 
+    - Списки - через дефис с эмодзи. 
+    - Комментарии - курсивом.
+    - ВАЖНО: Каждую ссылку (URL) всегда размещай на отдельной строке.
+4. Если есть обращение к ассистенту (также ИИ, бот и тд.) то воспринимай тот отрезок текста как обращение к тебе, как поправка к промпту."""
+
+_NOTE_PROMPT_EVENTS = """
+5. События: Найди ВСЕ события с датой/временем. Учитывай относительные даты ("завтра", "через 30 минут"). Если их нет - верни пустой список "events": [].
+6. is_reminder_only: Если сообщение содержит ТОЛЬКО напоминание/событие без дополнительного контента (примеры: "напомни завтра оплатить счёт", "встреча в 15:00", "через час позвонить маме"), установи true. Если есть дополнительная информация, мысли, идеи — false.
+7. Результат: Верни строго JSON.
+Формат JSON: {"main_title": "...", "category": "...", "formatted_body": "...", "is_reminder_only": true/false, "events": [{"title": "...", "datetime_iso": "YYYY-MM-DDTHH:MM:SS"}]}
+Заметка пользователя — в сообщении между --- и ---."""
+
+_NOTE_PROMPT_NO_EVENTS = """
+5. Результат: Верни строго JSON.
+Формат JSON: {"main_title": "...", "category": "...", "formatted_body": "..."}
+Заметка пользователя — в сообщении между --- и ---."""
+
+# Два неизменных system-промпта: с извлечением событий и без
+NOTE_SYSTEM_PROMPT = _NOTE_PROMPT_HEAD + _NOTE_PROMPT_TIME + _NOTE_PROMPT_TASKS + _NOTE_PROMPT_EVENTS
+NOTE_SYSTEM_PROMPT_NO_EVENTS = _NOTE_PROMPT_HEAD + _NOTE_PROMPT_TASKS + _NOTE_PROMPT_NO_EVENTS
 
 
 def process_with_ai(text: str) -> dict:
@@ -91,63 +336,58 @@ def process_with_ai(text: str) -> dict:
     from datetime import datetime
     import pytz
     
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {OPENAI_API_KEY}"}
-    
-    # Используем timezone пользователя для корректного расчёта относительного времени
-    tz = pytz.timezone(USER_TIMEZONE)
-    current_datetime = datetime.now(tz)
-    current_datetime_str = current_datetime.strftime('%Y-%m-%d %H:%M:%S')
+    # Без признаков даты/времени не просим AI искать события — короче промпт и ответ
+    with_events = has_temporal_expression(text)
     
-    prompt = f"""
-    Твоя роль: умный редактор заметок. Проанализируй заметку пользователя.
-    
-    КРИТИЧЕСКИ ВАЖНО: Текущее время пользователя (timezone {USER_TIMEZONE}): {current_datetime_str}
-    При расчёте относительного времени ("через N минут", "через час") ОБЯЗАТЕЛЬНО прибавляй N к текущему времени {current_datetime_str}.
-    Например: если сейчас 17:51 и пользователь говорит "через 16 минут", то datetime_iso должен быть 18:07.
+    if with_events:
+        # Используем timezone пользователя для корректного расчёта относительного времени
+        tz = pytz.timezone(USER_TIMEZONE)
+        current_datetime_str = datetime.now(tz).strftime('%Y-%m-%d %H:%M:%S')
+        user_content = (
+            f"Текущее время пользователя (timezone {USER_TIMEZONE}): {current_datetime_str}\n"
+            f"Заметка: --- {text} ---"
+        )
+        task, system_prompt = 'note', NOTE_SYSTEM_PROMPT
+    else:
+        user_content = f"Заметка: --- {text} ---"
+        task, system_prompt = 'note_plain', NOTE_SYSTEM_PROMPT_NO_EVENTS
     
-    Задачи:
-    1. Язык: Сохраняй язык оригинала. Не переводи.
-    2. Заголовок и Категория: Создай емкий заголовок и определи категорию из списка: [Идея, Задача, Покупка, Встреча, Мысль, Ссылка, Цитата].
-    3. Форматирование: Очень Красиво отформатируй текст, можешь оптимизировать если где-то явное пустословие. Заметки должны быть прекрасными и эстетичными.
-        - Заголовки - жирным, можно с 1 эмодзи. 
-        - Списки - через дефис с эмодзи. 
-        - Комментарии - курсивом.
-        - ВАЖНО: Каждую ссылку (URL) всегда размещай на отдельной строке.
-    4. Если есть обращение к ассистенту (также ИИ, бот и тд.) то воспринимай тот отрезок текста как обращение к тебе, как поправка к промпту.
-    5. События: Найди ВСЕ события с датой/временем. Учитывай относительные даты ("завтра", "через 30 минут"). Если их нет - верни пустой список "events": [].
-    6. is_reminder_only: Если сообщение содержит ТОЛЬКО напоминание/событие без дополнительного контента (примеры: "напомни завтра оплатить счёт", "встреча в 15:00", "через час позвонить маме"), установи true. Если есть дополнительная информация, мысли, идеи — false.
-    7. Результат: Верни строго JSON.
-    Формат JSON: {{"main_title": "...", "category": "...", "formatted_body": "...", "is_reminder_only": true/false, "events": [{{"title": "...", "datetime_iso": "YYYY-MM-DDTHH:MM:SS"}}]}}
-    Заметка: --- {text} ---
-    """
-    data = {"model": "gpt-5.4-nano", "messages": [{"role": "user", "content": prompt}], "response_format": {"type": "json_object"}}
-    response = requests.post(url, headers=headers, json=data, timeout=DEFAULT_TIMEOUT)
-    response.raise_for_status()
-    ai_response = response.json()
-    # Валидация ответа AI
-    if not ai_response.get('choices') or not ai_response['choices'][0].get('message'):
-        raise ValueError("Невалидный ответ от OpenAI API")
-    return json.loads(ai_response['choices'][0]['message']['content'])
+    content = _chat_completion(task, system_prompt, user_content, response_format={"type": "json_object"})
+    result = json.loads(content)
+    if not with_events:
+        result.setdefault('is_reminder_only', False)
+        result.setdefault('events', [])
+    return result
+
+
+SEARCH_SYSTEM_PROMPT = (
+    "Ты — полезный ассистент, отвечающий на вопросы по тексту. "
+    "Основываясь СТРОГО на предоставленном тексте из заметки, дай краткий и четкий ответ "
+    "на вопрос пользователя. Не выдумывай ничего. Если в тексте нет ответа, сообщи об этом. "
+    "Ответ должен быть красиво оформлен, а нужные блоки текста выделенны цитатой."
+)
 
 
 def summarize_for_search(context: str, question: str) -> str:
-    """Отправляет контекст и вопрос в GPT-4o mini для генерации ответа."""
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {OPENAI_API_KEY}"}
-    prompt = f"""
-    Основываясь СТРОГО на предоставленном ниже тексте из заметки, дай краткий и четкий ответ на вопрос пользователя. Не выдумывай ничего. Если в тексте нет ответа, сообщи об этом. Ответ должен быть красиво оформлен, а нужные блоки текста выделенны цитатой.
-    
-    Текст заметки:
-    ---
-    {context}
-    ---
-    Вопрос пользователя: "{question}"
-    """
-    data = {"model": "gpt-5.4-nano", "messages": [{"role": "system", "content": "Ты — полезный ассистент, отвечающий на вопросы по тексту."}, {"role": "user", "content": prompt}]}
-    response = requests.post(url, headers=headers, json=data, timeout=DEFAULT_TIMEOUT)
-    response.raise_for_status()
-    return response.json()['choices'][0]['message']['content']
+    """Отвечает на вопрос пользователя строго по тексту найденной заметки."""
+    user_content = (
+        f"Текст заметки:\n---\n{context}\n---\n"
+        f"Вопрос пользователя: \"{question}\""
+    )
+    return _chat_completion('search', SEARCH_SYSTEM_PROMPT, user_content)
+
+
+POLISH_SYSTEM_PROMPT = (
+    "Ты — редактор заметок. Полируешь текст, сохраняя смысл.\n"
+    "Объедини два текста (существующий и новый) в один красивый и логичный. "
+    "Выполни ЛЁГКУЮ полировку:\n"
+    "- Исправь опечатки\n"
+    "- Улучши форматирование (списки, заголовки с эмодзи)\n"
+    "- Убери повторы и пустословие\n"
+    "- НЕ меняй смысл и НЕ добавляй новую информацию\n"
+    "- Сохраняй язык оригинала\n\n"
+    "Верни ТОЛЬКО отполированный текст, без комментариев."
+)
 
 
 def polish_content(old_content: str, new_content: str) -> str:
@@ -156,76 +396,104 @@ def polish_content(old_content: str, new_content: str) -> str:
     Лёгкая полировка: исправление опечаток, улучшение форматирования,
     объединение в единый текст без изменения смысла.
     """
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {OPENAI_API_KEY}"}
-    
-    prompt = f"""
-    Объедини два текста в один красивый и логичный. Выполни ЛЁГКУЮ полировку:
-    - Исправь опечатки
-    - Улучши форматирование (списки, заголовки с эмодзи)
-    - Убери повторы и пустословие
-    - НЕ меняй смысл и НЕ добавляй новую информацию
-    - Сохраняй язык оригинала
-    
-    Существующий текст:
-    ---
-    {old_content}
-    ---
-    
-    Новый текст для добавления:
-    ---
-    {new_content}
-    ---
-    
-    Верни ТОЛЬКО отполированный текст, без комментариев.
-    """
-    
-    data = {
-        "model": "gpt-5.4-nano", 
-        "messages": [
-            {"role": "system", "content": "Ты — редактор заметок. Полируешь текст, сохраняя смысл."},
-            {"role": "user", "content": prompt}
-        ]
-    }
-    
-    response = requests.post(url, headers=headers, json=data, timeout=DEFAULT_TIMEOUT)
-    response.raise_for_status()
-    return response.json()['choices'][0]['message']['content']
+    user_content = (
+        f"Существующий текст:\n---\n{old_content}\n---\n\n"
+        f"Новый текст для добавления:\n---\n{new_content}\n---"
+    )
+    return _chat_completion('polish', POLISH_SYSTEM_PROMPT, user_content)
+
+
+CLEAN_SYSTEM_PROMPT = (
+    "Ты — корректор транскрипта. Твоя ЕДИНСТВЕННАЯ задача — удалить слова-заполнители "
+    "из текста. Слова-заполнители: ну, типа, короче, блин, эээ, ммм, ааа, как бы, "
+    "в общем, то есть, собственно, так сказать, значит, вот, слушай, смотри, "
+    "ну вот, ну типа, ну короче, как бы это сказать.\n\n"
+    "СТРОГИЕ ПРАВИЛА:\n"
+    "- НЕ менять порядок слов\n"
+    "- НЕ перефразировать предложения\n"
+    "- НЕ объединять и НЕ разделять предложения\n"
+    "- НЕ исправлять грамматику\n"
+    "- НЕ добавлять пунктуацию которой не было\n"
+    "- НЕ добавлять комментарии\n"
+    "- СТРОГО сохранять любые таймкоды (например [00:15]) в начале абзацев\n\n"
+    "Верни ТОЛЬКО очищенный текст."
+)
 
 
 def clean_transcript(raw_text: str) -> str:
     """Удаляет слова-заполнители из транскрипта, сохраняя смысл и структуру.
     
+    Сначала работает локальный словарный фильтр (utils.fillers). AI вызывается,
+    только если в тексте осталось много неоднозначных слов («вот», «значит»,
+    «типа» без запятых), которые словарём не разрешить.
     Строгий промпт не позволяет AI переформулировать текст —
     только убирает «ну», «типа», «короче», «эээ» и т.п.
+    Длинный текст чистится по кускам параллельно и склеивается в исходном порядке.
     """
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {"Content-Type": "application/json", "Authorization": f"Bearer {OPENAI_API_KEY}"}
-    
-    system_prompt = (
-        "Ты — корректор транскрипта. Твоя ЕДИНСТВЕННАЯ задача — удалить слова-заполнители "
-        "из текста. Слова-заполнители: ну, типа, короче, блин, эээ, ммм, ааа, как бы, "
-        "в общем, то есть, собственно, так сказать, значит, вот, слушай, смотри, "
-        "ну вот, ну типа, ну короче, как бы это сказать.\n\n"
-        "СТРОГИЕ ПРАВИЛА:\n"
-        "- НЕ менять порядок слов\n"
-        "- НЕ перефразировать предложения\n"
-        "- НЕ объединять и НЕ разделять предложения\n"
-        "- НЕ исправлять грамматику\n"
-        "- НЕ добавлять пунктуацию которой не было\n"
-        "- НЕ добавлять комментарии\n"
-        "- СТРОГО сохранять любые таймкоды (например [00:15]) в начале абзацев\n\n"
-        "Верни ТОЛЬКО очищенный текст."
+    local_text, unresolved = strip_fillers(raw_text)
+    if not needs_ai_cleanup(local_text, unresolved):
+        print(f"Транскрипт очищен локально (неоднозначных: {unresolved})")
+        return local_text
+
+    chunks, separator = _split_transcript(local_text)
+    if len(chunks) > 1:
+        print(f"Очистка по частям: {len(chunks)} фрагментов")
+
+    cleaned = parallel_map(
+        lambda chunk: _chat_completion('clean', CLEAN_SYSTEM_PROMPT, chunk),
+        chunks,
+        max_workers=AI_MAX_PARALLEL
     )
-    
-    data = {
-        "model": "gpt-5.4-nano",
-        "messages": [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": raw_text}
-        ]
+    return separator.join(cleaned)
+
+
+_TRANSCRIPT_PROMPT_BASE = (
+    "Ты — секретарь. Перед тобой транскрипт голосового сообщения. Сделай всё за один ответ:\n"
+    "1. summary: ВЫЖИМКА — 3-5 предложений детальнее, передающие суть, или подробный "
+    "bullet-point список (до 5 пунктов), чтобы не упустить важные детали и контекст. "
+    "Не добавляй водные фразы вроде 'В сообщении говорится...' — начинай сразу с сути.\n"
+    "2. main_title: емкий заголовок заметки на языке транскрипта.\n"
+    "3. category: одна категория из списка: [Идея, Задача, Покупка, Встреча, Мысль, Ссылка, Цитата].\n"
+)
+
+TRANSCRIPT_COMBINED_PROMPT = _TRANSCRIPT_PROMPT_BASE + (
+    "4. clean_text: тот же транскрипт, из которого удалены ТОЛЬКО слова-заполнители "
+    "(ну, типа, короче, блин, эээ, ммм, как бы, в общем, то есть, собственно, так сказать, "
+    "значит, вот, слушай, смотри). НЕ меняй порядок слов, НЕ перефразируй, НЕ исправляй "
+    "грамматику, НЕ добавляй пунктуацию, СТРОГО сохраняй таймкоды (например [00:15]).\n\n"
+    "Верни строго JSON: {\"clean_text\": \"...\", \"summary\": \"...\", \"main_title\": \"...\", \"category\": \"...\"}"
+)
+
+TRANSCRIPT_META_PROMPT = _TRANSCRIPT_PROMPT_BASE + (
+    "\nВерни строго JSON: {\"summary\": \"...\", \"main_title\": \"...\", \"category\": \"...\"}"
+)
+
+
+def process_transcript(text: str, clean: bool = False) -> dict:
+    """Один AI-запрос на транскрипт вместо трёх (очистка, резюме, заголовок/категория).
+
+    Если локальный фильтр заполнителей справился сам, AI не переписывает текст —
+    только резюме, заголовок и категория. Транскрипты длиннее
+    TRANSCRIPT_CHUNK_CHARS сюда не передаются: для них работает map-reduce.
+
+    Returns:
+        dict с ключами text, summary, main_title, category
+    """
+    result_text = text
+    need_ai_clean = False
+    if clean:
+        result_text, unresolved = strip_fillers(text)
+        need_ai_clean = needs_ai_cleanup(result_text, unresolved)
+
+    if need_ai_clean:
+        content = _chat_completion('transcript_combined', TRANSCRIPT_COMBINED_PROMPT, result_text, response_format={"type": "json_object"})
+    else:
+        content = _chat_completion('transcript_meta', TRANSCRIPT_META_PROMPT, result_text, response_format={"type": "json_object"})
+    data = json.loads(content)
+
+    return {
+        'text': data.get('clean_text') or result_text,
+        'summary': data.get('summary', ''),
+        'main_title': data.get('main_title', 'Транскрипт'),
+        'category': data.get('category', 'Мысль')
     }
-    
-    response = requests.post(url, headers=headers, json=data, timeout=DEFAULT_TIMEOUT)
-    response.raise_for_status()
-    return response.json()['choices'][0]['message']['content']
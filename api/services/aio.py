@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""Async-запросы к AssemblyAI для долгоживущего процесса (FAST_ACK).
+
+Работают на общем цикле utils.aio с пулом соединений на хост: пока задача
+очереди ждёт транскрибацию, поток воркера свободен, а цикл держит сотни
+таких ожиданий. Формат результатов — как у services.ai. Serverless-режим
+этот модуль не импортирует (и httpx не грузит).
+
+Здесь только ожидание транскрибации — единственный вызов, который держит
+задачу минутами. Telegram, Notion, OpenAI, ClickUp и Pinecone остаются на
+requests (services/*.py): у них своя логика поверх HTTP (очередь и лимиты
+TelegramClient, ответ в теле webhook, hedging в llm_router, SDK Pinecone),
+и их вызовы короткие — им хватает потоков воркеров.
+
+Ошибки HTTP пробрасываются как httpx.HTTPStatusError.
+"""
+import asyncio
+import time
+
+from utils.aio import get_client
+from utils.config import ASSEMBLYAI_API_KEY, MAX_POLLING_ATTEMPTS, POLLING_MAX_WAIT
+from services.ai import ASSEMBLYAI_BASE_URL
+
+
+def _assemblyai_headers():
+    # httpx, в отличие от requests, не пропускает заголовки со значением None
+    return {'authorization': ASSEMBLYAI_API_KEY or ''}
+
+
+async def fetch_transcription(transcript_id: str) -> dict:
+    """Один запрос статуса. Формат результата — как у services.ai.fetch_transcription."""
+    response = await get_client(ASSEMBLYAI_BASE_URL).get(
+        f'/transcript/{transcript_id}', headers=_assemblyai_headers()
+    )
+    response.raise_for_status()
+    data = response.json()
+    status = data['status']
+    if status == 'completed':
+        return {'status': 'completed', 'text': data.get('text', ''), 'words': data.get('words', [])}
+    if status == 'error':
+        print(f"Ошибка транскрибации в AssemblyAI: {data.get('error')}")
+        return None
+    return {'status': status, 'id': transcript_id}
+
+
+async def poll_transcription(transcript_id: str, max_wait: float = POLLING_MAX_WAIT,
+                             initial_delay: float = 1.0, max_delay: float = 6.0) -> dict:
+    """Ждёт результат с растущей паузой, не занимая поток (как services.ai.poll_transcription)."""
+    delay = initial_delay
+    started = time.monotonic()
+    for attempt in range(MAX_POLLING_ATTEMPTS):
+        result = await fetch_transcription(transcript_id)
+        if result is None or result['status'] == 'completed':
+            return result
+        if time.monotonic() - started + delay > max_wait:
+            break
+        await asyncio.sleep(delay)
+        delay = min(delay * 1.5, max_delay)
+    print(f"Транскрибация {transcript_id} ещё не готова после {time.monotonic() - started:.0f} сек")
+    return {'status': 'processing', 'id': transcript_id}
@@ -1,9 +1,9 @@
 # -*- coding: utf-8 -*-
 """Сервис утреннего и вечернего брифинга."""
 import json
-import requests
 from datetime import datetime, timedelta
 
+from utils.http import http_session
 from utils.config import (
     GOOGLE_CREDENTIALS_JSON, GOOGLE_CALENDAR_ID,
     USER_TIMEZONE, OPENAI_API_KEY, DEFAULT_TIMEOUT,
@@ -120,7 +120,7 @@ def get_last_notion_note() -> str:
             'Content-Type': 'application/json',
             'Notion-Version': '2022-06-28'
         }
-        response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         results = response.json().get('results', [])
         if results:
@@ -203,7 +203,7 @@ def generate_personal_insight(tasks: list, events: list) -> str:
             "temperature": 0.9
         }
 
-        response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         insight = response.json()['choices'][0]['message']['content'].strip()
         return _escape_markdown(insight)
@@ -3,11 +3,13 @@
 import json
 from datetime import datetime, timedelta
 
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-
 from utils.config import GOOGLE_CREDENTIALS_JSON, GOOGLE_CALENDAR_ID, USER_TIMEZONE
 from utils.markdown import markdown_to_gcal_html
+from utils.lazy import lazy_import
+
+# googleapiclient импортируется ~0.1 сек — только когда действительно нужен календарь
+service_account = lazy_import('google.oauth2.service_account')
+discovery = lazy_import('googleapiclient.discovery')
 
 
 def create_google_calendar_event(title: str, description: str, start_time_iso: str):
@@ -18,7 +20,7 @@ def create_google_calendar_event(title: str, description: str, start_time_iso: s
     """
     creds_info = json.loads(GOOGLE_CREDENTIALS_JSON)
     creds = service_account.Credentials.from_service_account_info(creds_info)
-    service = build('calendar', 'v3', credentials=creds)
+    service = discovery.build('calendar', 'v3', credentials=creds)
     start_time = datetime.fromisoformat(start_time_iso)
     end_time = start_time + timedelta(hours=1)
     
@@ -43,7 +45,7 @@ def delete_gcal_event(calendar_id: str, event_id: str):
     try:
         creds_info = json.loads(GOOGLE_CREDENTIALS_JSON)
         creds = service_account.Credentials.from_service_account_info(creds_info)
-        service = build('calendar', 'v3', credentials=creds)
+        service = discovery.build('calendar', 'v3', credentials=creds)
         
         service.events().delete(calendarId=calendar_id, eventId=event_id).execute()
         print(f"Событие GCal {event_id} удалено.")
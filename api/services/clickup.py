@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
 """Сервис для работы с ClickUp API."""
-import requests
 from datetime import datetime
 
+from utils.http import http_session
 from utils.config import CLICKUP_API_TOKEN, CLICKUP_TEAM_ID, CLICKUP_USER_ID, DEFAULT_TIMEOUT
 
 CLICKUP_BASE_URL = "https://api.clickup.com/api/v2"
@@ -56,7 +56,7 @@ def get_my_tasks(include_closed=False) -> list:
     }
     
     try:
-        response = requests.get(url, headers=_headers(), params=params, timeout=DEFAULT_TIMEOUT)
+        response = http_session.get(url, headers=_headers(), params=params, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         raw_tasks = response.json().get('tasks', [])
         
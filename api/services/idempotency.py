@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""Журнал доставок webhook (Telegram update_id, ClickUp history item).
+
+Повторная доставка того же update не должна создавать вторую заметку,
+событие или начислять XP ещё раз. Доставка сначала захватывается на
+IDEMPOTENCY_LEASE секунд («в работе») и только после успешной обработки
+отмечается выполненной на IDEMPOTENCY_TTL. Если обработка упала или процесс
+умер, захват снимается или истекает — повтор от Telegram/ClickUp пройдёт.
+
+Журнал локален для инстанса: OrderedDict в памяти процесса и таблица SQLite
+в LOCAL_DB_PATH (переживает перезапуск и общая для процессов на одном диске).
+На Vercel /tmp у каждого инстанса свой — дубль, попавший на другой инстанс,
+не отсекается.
+"""
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.config import LOCAL_DB_PATH, IDEMPOTENCY_TTL, IDEMPOTENCY_LEASE, IDEMPOTENCY_MAX_ENTRIES
+
+PURGE_EVERY = 200  # Раз в столько записей чистим просроченное в SQLite
+
+
+class IdempotencyLedger:
+    """Ключи доставок: захват с арендой -> выполнено (TTL) или снятие."""
+
+    def __init__(self, ttl: float, max_entries: int, db_path: str = None, lease: float = 300):
+        self.ttl = ttl
+        self.lease = lease
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._seen = OrderedDict()  # key -> expires_at, в порядке последнего изменения
+        self._lock = threading.Lock()
+        self._db_ready = False
+        self._claims = 0
+
+    def _expire(self, now: float):
+        while self._seen:
+            key, expires_at = next(iter(self._seen.items()))
+            if expires_at > now and len(self._seen) <= self.max_entries:
+                break
+            self._seen.popitem(last=False)
+
+    def _set(self, key: str, expires_at: float):
+        self._seen[key] = expires_at
+        self._seen.move_to_end(key)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=5, isolation_level=None)
+        if not self._db_ready:
+            conn.execute("CREATE TABLE IF NOT EXISTS deliveries (key TEXT PRIMARY KEY, expires_at REAL NOT NULL)")
+            self._db_ready = True
+        return conn
+
+    def _claim_in_db(self, key: str, now: float) -> bool:
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM deliveries WHERE key = ? AND expires_at <= ?", (key, now))
+            inserted = conn.execute(
+                "INSERT OR IGNORE INTO deliveries (key, expires_at) VALUES (?, ?)", (key, now + self.lease)
+            ).rowcount == 1
+            self._claims += 1
+            if self._claims % PURGE_EVERY == 0:
+                conn.execute("DELETE FROM deliveries WHERE expires_at <= ?", (now,))
+            return inserted
+        finally:
+            conn.close()
+
+    def _update_db(self, sql: str, params: tuple):
+        if not self.db_path:
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(sql, params)
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"Ошибка журнала доставок: {e}")
+
+    def claim(self, key: str) -> bool:
+        """Захватывает ключ на время обработки (lease секунд).
+
+        Returns:
+            True — ключ свободен, можно обрабатывать; False — дубль или уже в работе
+        """
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            expires_at = self._seen.get(key)
+            if expires_at is not None and expires_at > now:
+                return False
+            self._set(key, now + self.lease)
+
+        if self.db_path:
+            try:
+                if not self._claim_in_db(key, now):
+                    return False
+            except Exception as e:
+                # Без SQLite защищает хотя бы журнал в памяти
+                print(f"Ошибка журнала доставок: {e}")
+        return True
+
+    def complete(self, key: str):
+        """Доставка обработана: повторы отбрасываются ещё ttl секунд."""
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._set(key, expires_at)
+        self._update_db("UPDATE deliveries SET expires_at = ? WHERE key = ?", (expires_at, key))
+
+    def release(self, key: str):
+        """Обработка не удалась: снимает захват, повтор будет обработан."""
+        with self._lock:
+            self._seen.pop(key, None)
+        self._update_db("DELETE FROM deliveries WHERE key = ?", (key,))
+
+
+_ledger = IdempotencyLedger(IDEMPOTENCY_TTL, IDEMPOTENCY_MAX_ENTRIES, LOCAL_DB_PATH, lease=IDEMPOTENCY_LEASE)
+
+
+def claim_delivery(key: str) -> bool:
+    """True, если доставку с этим ключом можно обрабатывать (она захвачена на время обработки)."""
+    return _ledger.claim(key)
+
+
+def complete_delivery(key: str):
+    """Отмечает захваченную доставку обработанной."""
+    _ledger.complete(key)
+
+
+def release_delivery(key: str):
+    """Снимает захват после неудачной обработки — повторная доставка пройдёт."""
+    _ledger.release(key)
@@ -0,0 +1,396 @@
+# -*- coding: utf-8 -*-
+"""Надёжная очередь фоновых задач в SQLite.
+
+Webhook кладёт update в очередь и сразу отвечает Telegram 200 — повторных
+доставок (и дублей заметок/событий) из-за долгой обработки больше нет.
+Воркер выполняет задачи с ограниченной параллельностью: задачи одного
+чата строго по порядку, разные чаты — одновременно. Задачи, упавшие
+JOB_MAX_ATTEMPTS раз, уходят в dead-letter, откуда их можно вернуть
+командой /replay.
+
+Обработчик может быть корутиной (async def): такая задача выполняется на общем
+цикле utils.aio, а воркер сразу берёт следующую — один поток держит до
+AIO_MAX_INFLIGHT_JOBS задач, ждущих транскрибацию. Блокирующие шаги после
+неё (LLM, Notion, Telegram) обработчик выносит в asyncio.to_thread.
+"""
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import wait as wait_futures
+
+from utils.config import LOCAL_DB_PATH, JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_LEASE_SECONDS, AIO_MAX_INFLIGHT_JOBS
+
+RETRY_DELAYS = [5, 30, 120]  # Пауза перед повтором упавшей задачи, сек
+IDLE_POLL_SECONDS = 5        # Как часто воркер сам заглядывает в очередь (задачи других процессов)
+
+_init_lock = threading.Lock()
+_initialized = False
+_handlers = {}
+_dead_handlers = {}  # kind -> func(payload), вызывается при переносе задачи в dead-letter
+_current = threading.local()  # ID задачи, которую выполняет этот поток воркера
+_wakeup = threading.Event()
+_stopping = threading.Event()
+_workers = []
+_slots = threading.BoundedSemaphore(AIO_MAX_INFLIGHT_JOBS)  # Задач в работе (sync + async)
+_async_jobs = set()  # Future задач, выполняющихся на цикле событий
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    conn = sqlite3.connect(LOCAL_DB_PATH, timeout=10, isolation_level=None)
+    if not _initialized:
+        with _init_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " kind TEXT NOT NULL,"
+                " chat_id TEXT,"
+                " payload TEXT NOT NULL,"
+                " status TEXT NOT NULL DEFAULT 'queued',"  # queued | running | done | dead
+                " attempts INTEGER NOT NULL DEFAULT 0,"
+                " available_at REAL NOT NULL,"
+                " lease_until REAL,"
+                " created_at REAL NOT NULL,"
+                " last_error TEXT)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, chat_id, id)")
+            _initialized = True
+    return conn
+
+
+def register_job_handler(kind: str, func, on_dead=None):
+    """Регистрирует обработчик задач вида kind: func(payload: dict) или async def func(payload: dict).
+
+    on_dead(payload) вызывается, когда задача исчерпала попытки и ушла в dead-letter
+    (например, чтобы сообщить пользователю).
+    """
+    _handlers[kind] = func
+    if on_dead is not None:
+        _dead_handlers[kind] = on_dead
+
+
+def current_job_id() -> int:
+    """ID задачи, которую выполняет текущий поток воркера (None вне синхронного обработчика)."""
+    return getattr(_current, 'job_id', None)
+
+
+def save_job_payload(job_id: int, payload: dict):
+    """Сохраняет прогресс выполняющейся задачи: при повторе обработчик получит этот payload."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET payload = ? WHERE id = ? AND status = 'running'",
+            (json.dumps(payload, ensure_ascii=False), job_id)
+        )
+    finally:
+        conn.close()
+
+
+def extend_job_lease(job_id: int):
+    """Продлевает аренду выполняющейся задачи, чтобы её не вернули в очередь как брошенную."""
+    conn = _connect()
+    try:
+        conn.execute(
+            "UPDATE jobs SET lease_until = ? WHERE id = ? AND status = 'running'", (time.time() + JOB_LEASE_SECONDS, job_id)
+        )
+    finally:
+        conn.close()
+
+
+def enqueue_job(kind: str, payload: dict, chat_id=None) -> int:
+    """Кладёт задачу в очередь и будит воркер. Возвращает ID задачи."""
+    now = time.time()
+    conn = _connect()
+    try:
+        cursor = conn.execute(
+            "INSERT INTO jobs (kind, chat_id, payload, available_at, created_at) VALUES (?, ?, ?, ?, ?)",
+            (kind, str(chat_id) if chat_id is not None else None, json.dumps(payload, ensure_ascii=False), now, now)
+        )
+        job_id = cursor.lastrowid
+    finally:
+        conn.close()
+    _wakeup.set()
+    return job_id
+
+
+def enqueue_grouped_job(kind: str, group: str, item, chat_id, window: float, max_wait: float = None) -> int:
+    """Добавляет item в ещё не начатую задачу группы group или создаёт её.
+
+    Задача группы стартует через window секунд после последнего item (но не позже
+    max_wait от создания) и получает payload {'group': group, 'items': [...]}.
+    Группировка идёт через SQLite, поэтому работает и между процессами с общей базой.
+
+    Returns:
+        ID задачи группы
+    """
+    max_wait = max_wait if max_wait is not None else window * 4
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute(
+            "SELECT id, payload, created_at FROM jobs"
+            " WHERE kind = ? AND chat_id = ? AND status = 'queued' AND attempts = 0"
+            " AND json_extract(payload, '$.group') = ? ORDER BY id LIMIT 1",
+            (kind, str(chat_id), group)
+        ).fetchone()
+        if row:
+            job_id, payload, created_at = row
+            payload = json.loads(payload)
+            payload['items'].append(item)
+            conn.execute(
+                "UPDATE jobs SET payload = ?, available_at = ? WHERE id = ?",
+                (json.dumps(payload, ensure_ascii=False), min(now + window, created_at + max_wait), job_id)
+            )
+        else:
+            payload = {'group': group, 'items': [item]}
+            job_id = conn.execute(
+                "INSERT INTO jobs (kind, chat_id, payload, available_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (kind, str(chat_id), json.dumps(payload, ensure_ascii=False), now + window, now)
+            ).lastrowid
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    _wakeup.set()
+    return job_id
+
+
+def _claim_job() -> tuple:
+    """Забирает самую старую готовую задачу, у чата которой нет выполняющихся и более ранних.
+
+    Returns:
+        (id, kind, payload) или None
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        # Задачи, чья аренда истекла (процесс упал посреди работы), возвращаем в очередь
+        conn.execute(
+            "UPDATE jobs SET status = 'queued' WHERE status = 'running' AND lease_until < ?", (now,)
+        )
+        row = conn.execute(
+            "SELECT id, kind, payload FROM jobs AS j"
+            " WHERE status = 'queued' AND available_at <= ?"
+            " AND (chat_id IS NULL OR ("
+            "  NOT EXISTS (SELECT 1 FROM jobs r WHERE r.chat_id = j.chat_id AND r.status = 'running')"
+            "  AND j.id = (SELECT MIN(q.id) FROM jobs q WHERE q.chat_id = j.chat_id AND q.status = 'queued')))"
+            " ORDER BY id LIMIT 1",
+            (now,)
+        ).fetchone()
+        if row:
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, lease_until = ? WHERE id = ?",
+                (now + JOB_LEASE_SECONDS, row[0])
+            )
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    finally:
+        conn.close()
+    return row
+
+
+def _finish_job(job_id: int, error: str = None) -> dict:
+    """Записывает итог задачи. Returns: payload, если задача ушла в dead-letter, иначе None."""
+    conn = _connect()
+    try:
+        if error is None:
+            conn.execute("UPDATE jobs SET status = 'done', lease_until = NULL WHERE id = ?", (job_id,))
+            # Выполненные задачи старше суток не нужны
+            conn.execute("DELETE FROM jobs WHERE status = 'done' AND created_at < ?", (time.time() - 86400,))
+            return
+        attempts, payload = conn.execute("SELECT attempts, payload FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if attempts >= JOB_MAX_ATTEMPTS:
+            conn.execute(
+                "UPDATE jobs SET status = 'dead', lease_until = NULL, last_error = ? WHERE id = ?", (error, job_id)
+            )
+            print(f"Задача {job_id} перемещена в dead-letter после {attempts} попыток")
+            return json.loads(payload)
+        else:
+            delay = RETRY_DELAYS[min(attempts, len(RETRY_DELAYS)) - 1]
+            conn.execute(
+                "UPDATE jobs SET status = 'queued', lease_until = NULL, available_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + delay, error, job_id)
+            )
+    finally:
+        conn.close()
+
+
+def _job_done(job_id: int, kind: str, error: str = None):
+    if error is not None:
+        print(f"Задача {job_id} ({kind}) упала: {error}")
+        error = error[-2000:]
+    try:
+        dead_payload = _finish_job(job_id, error)
+    finally:
+        _slots.release()
+        # Освободился чат — его следующая задача может быть готова
+        _wakeup.set()
+    on_dead = _dead_handlers.get(kind)
+    if dead_payload is not None and on_dead is not None:
+        try:
+            on_dead(dead_payload)
+        except Exception as e:
+            print(f"Ошибка обработчика dead-letter для задачи {job_id}: {e}")
+
+
+def _start_async_job(job_id: int, kind: str, coro):
+    """Запускает корутину задачи на общем цикле; итог записывается по завершении."""
+    from utils.aio import submit
+
+    async def renew_lease():
+        # Async-задача (опрос долгой транскрибации) может идти дольше JOB_LEASE_SECONDS:
+        # без продления её вернули бы в очередь и выполнили второй раз
+        while True:
+            await asyncio.sleep(JOB_LEASE_SECONDS / 3)
+            try:
+                await asyncio.to_thread(extend_job_lease, job_id)
+            except Exception as e:
+                print(f"Не удалось продлить аренду задачи {job_id}: {e}")
+
+    async def run():
+        heartbeat = asyncio.ensure_future(renew_lease())
+        try:
+            await coro
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            heartbeat.cancel()
+        # SQLite блокирует — не в потоке цикла
+        await asyncio.to_thread(_job_done, job_id, kind, error)
+
+    future = submit(run())
+    with _init_lock:
+        _async_jobs.add(future)
+    future.add_done_callback(lambda f: _async_jobs.discard(f))
+
+
+def _idle_wait() -> float:
+    """Сколько спать без задач: до ближайшей отложенной задачи, но не дольше IDLE_POLL_SECONDS."""
+    try:
+        conn = _connect()
+        try:
+            # Уже доступные, но ждущие свой чат задачи разбудит _job_done
+            next_at = conn.execute(
+                "SELECT MIN(available_at) FROM jobs WHERE status = 'queued' AND available_at > ?", (time.time(),)
+            ).fetchone()[0]
+        finally:
+            conn.close()
+    except Exception:
+        return IDLE_POLL_SECONDS
+    if next_at is None:
+        return IDLE_POLL_SECONDS
+    return min(IDLE_POLL_SECONDS, max(0.01, next_at - time.time()))
+
+
+def _worker_loop():
+    while not _stopping.is_set():
+        # Слот занимаем до выборки: взятая задача сразу получает статус running
+        if not _slots.acquire(timeout=IDLE_POLL_SECONDS):
+            continue
+        try:
+            job = _claim_job()
+        except Exception as e:
+            print(f"Ошибка чтения очереди задач: {e}")
+            job = None
+        if job is None:
+            _slots.release()
+            _wakeup.wait(_idle_wait())
+            if not _stopping.is_set():
+                _wakeup.clear()
+            continue
+
+        job_id, kind, payload = job
+        handler = _handlers.get(kind)
+        try:
+            if handler is None:
+                raise ValueError(f"Нет обработчика для задач вида {kind}")
+            if asyncio.iscoroutinefunction(handler):
+                _start_async_job(job_id, kind, handler(json.loads(payload)))
+                continue
+            _current.job_id = job_id
+            handler(json.loads(payload))
+            error = None
+        except Exception:
+            error = traceback.format_exc()
+        finally:
+            _current.job_id = None
+        _job_done(job_id, kind, error)
+
+
+def start_job_workers(count: int = JOB_WORKERS):
+    """Запускает воркеры в фоновых потоках (один раз на процесс)."""
+    with _init_lock:
+        if _workers:
+            return
+        for i in range(count):
+            worker = threading.Thread(target=_worker_loop, name=f'job-worker-{i}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def stop_job_workers(timeout: float = None) -> bool:
+    """Останавливает воркеры: начатые задачи доделываются, новые не берутся.
+
+    Невыполненные задачи остаются в SQLite и подхватятся при следующем запуске.
+
+    Returns:
+        True, если все воркеры завершились за timeout
+    """
+    _stopping.set()
+    _wakeup.set()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    remaining = lambda: None if deadline is None else max(0, deadline - time.monotonic())
+    for worker in _workers:
+        worker.join(remaining())
+    with _init_lock:
+        async_jobs = list(_async_jobs)
+    _, pending = wait_futures(async_jobs, timeout=remaining())
+    return not pending and not any(worker.is_alive() for worker in _workers)
+
+
+def list_dead_jobs(limit: int = 10) -> list:
+    """Последние задачи из dead-letter: [{'id', 'kind', 'chat_id', 'attempts', 'last_error'}]."""
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT id, kind, chat_id, attempts, last_error FROM jobs WHERE status = 'dead' ORDER BY id DESC LIMIT ?",
+            (limit,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return [
+        {'id': r[0], 'kind': r[1], 'chat_id': r[2], 'attempts': r[3], 'last_error': r[4] or ''}
+        for r in rows
+    ]
+
+
+def replay_dead_jobs(job_id: int = None) -> int:
+    """Возвращает задачи из dead-letter в очередь (одну или все). Возвращает их число."""
+    conn = _connect()
+    try:
+        if job_id is None:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ? WHERE status = 'dead'", (time.time(),)
+            )
+        else:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, available_at = ? WHERE status = 'dead' AND id = ?",
+                (time.time(), job_id)
+            )
+        count = cursor.rowcount
+    finally:
+        conn.close()
+    if count:
+        _wakeup.set()
+    return count
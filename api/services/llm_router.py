@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Маршрутизация запросов к LLM: выбор модели/таймаута и hedged-запросы."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import requests
+
+from utils.config import AI_MODEL, AI_MODEL_STRONG, AI_FALLBACK_MODEL, AI_HEDGING, AI_CALL_DEADLINE
+
+CONNECT_TIMEOUT = 5
+LATENCY_WINDOW = 50          # Сколько последних ответов учитывать для p95
+MIN_SAMPLES_FOR_P95 = 10     # До этого используем hedge_delay из маршрута
+MIN_HEDGE_DELAY = 1.0        # Раньше секунды дублировать бессмысленно
+MIN_FALLBACK_SECONDS = 5.0   # Если до дедлайна меньше — запасную модель не пробуем
+
+# Маршруты по задачам: read-таймаут = base + per_kchar * (тысяч символов входа),
+# hedge_delay — задержка дубля, пока не накопилась статистика p95.
+# strong_above — с какой длины входа (символов) нужна AI_MODEL_STRONG: 0 — всегда,
+# None — всегда быстрая AI_MODEL. Резюме и длинные тексты требуют качества,
+# короткие заметки, поиск, чистка и map-шаг — скорости.
+# Задачи, которые переписывают весь текст (clean, transcript_combined), отвечают дольше.
+TASK_ROUTES = {
+    'note':                {'base': 20, 'per_kchar': 2, 'max': 45, 'hedge_delay': 6, 'strong_above': 4000},
+    'note_plain':          {'base': 20, 'per_kchar': 2, 'max': 45, 'hedge_delay': 6, 'strong_above': 4000},
+    'search':              {'base': 20, 'per_kchar': 1, 'max': 45, 'hedge_delay': 6, 'strong_above': None},
+    'polish':              {'base': 20, 'per_kchar': 3, 'max': 45, 'hedge_delay': 8, 'strong_above': 6000},
+    'summary':             {'base': 20, 'per_kchar': 1, 'max': 45, 'hedge_delay': 8, 'strong_above': 0},
+    'summary_map':         {'base': 20, 'per_kchar': 1, 'max': 45, 'hedge_delay': 8, 'strong_above': None},
+    'summary_reduce':      {'base': 20, 'per_kchar': 1, 'max': 45, 'hedge_delay': 8, 'strong_above': 0},
+    'clean':               {'base': 20, 'per_kchar': 5, 'max': 45, 'hedge_delay': 15, 'strong_above': None},
+    'transcript_meta':     {'base': 20, 'per_kchar': 1, 'max': 45, 'hedge_delay': 8, 'strong_above': None},
+    'transcript_combined': {'base': 20, 'per_kchar': 5, 'max': 45, 'hedge_delay': 15, 'strong_above': 8000},
+}
+DEFAULT_ROUTE = {'base': 30, 'per_kchar': 2, 'max': 45, 'hedge_delay': 10, 'strong_above': None}
+
+_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix='llm')
+_lock = threading.Lock()
+_latencies = {}  # task -> deque последних задержек успешных ответов
+ROUTING_STATS = {}
+
+
+def select_route(task: str, input_chars: int) -> dict:
+    """Выбирает модель, запасную модель и таймаут по задаче и размеру входа."""
+    route = TASK_ROUTES.get(task, DEFAULT_ROUTE)
+    strong_above = route['strong_above']
+    model = AI_MODEL_STRONG if strong_above is not None and input_chars >= strong_above else AI_MODEL
+    read_timeout = min(route['base'] + route['per_kchar'] * input_chars / 1000, route['max'], AI_CALL_DEADLINE)
+    return {
+        'model': model,
+        # Запасная должна отличаться от основной, иначе повтор той же упавшей модели
+        'fallback_model': AI_FALLBACK_MODEL if AI_FALLBACK_MODEL != model else AI_MODEL,
+        'timeout': (CONNECT_TIMEOUT, read_timeout),
+        'hedge_delay': route['hedge_delay'],
+        'deadline': AI_CALL_DEADLINE
+    }
+
+
+def _p95(task: str):
+    with _lock:
+        samples = sorted(_latencies.get(task, ()))
+    if len(samples) < MIN_SAMPLES_FOR_P95:
+        return None
+    return samples[int(0.95 * (len(samples) - 1))]
+
+
+def _stats(task: str) -> dict:
+    return ROUTING_STATS.setdefault(task, {
+        'calls': 0, 'hedges_fired': 0, 'hedges_won': 0, 'hedge_saved_seconds': 0.0, 'fallbacks': 0
+    })
+
+
+def _observe(task: str, latency: float):
+    with _lock:
+        _latencies.setdefault(task, deque(maxlen=LATENCY_WINDOW)).append(latency)
+
+
+def _is_retryable(error: Exception) -> bool:
+    """Таймауты, обрывы и 5xx/429 — повод попробовать ещё раз или другую модель."""
+    if isinstance(error, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+        return True
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return error.response.status_code >= 500 or error.response.status_code == 429
+    return False
+
+
+def hedged_call(task: str, input_chars: int, send):
+    """Выполняет send(model, timeout) с hedging и запасной моделью.
+
+    1. Запрос к основной модели с таймаутом по маршруту.
+    2. Если ответа нет дольше p95 задачи — параллельно шлём дубль, берём первый ответ.
+    3. Если все попытки упали по таймауту/5xx — один запрос к запасной модели.
+
+    Все шаги вместе укладываются в route['deadline'] секунд: после него
+    зависшие попытки бросаются и поднимается requests.exceptions.Timeout.
+
+    Returns:
+        Результат send победившей попытки
+    """
+    route = select_route(task, input_chars)
+    hedge_delay = max(_p95(task) or route['hedge_delay'], MIN_HEDGE_DELAY)
+    started = time.monotonic()
+    remaining = lambda: route['deadline'] - (time.monotonic() - started)
+
+    with _lock:
+        _stats(task)['calls'] += 1
+
+    def attempt(model):
+        # Поздняя попытка не получает read-таймаут дольше оставшегося бюджета
+        connect_timeout, read_timeout = route['timeout']
+        result = send(model, (connect_timeout, max(min(read_timeout, remaining()), 1.0)))
+        return result, time.monotonic() - started
+
+    futures = [_executor.submit(attempt, route['model'])]
+    done, _ = wait(futures, timeout=min(hedge_delay, remaining()))
+    if not done and AI_HEDGING and remaining() > MIN_HEDGE_DELAY:
+        print(f"LLM {task}: нет ответа за {hedge_delay:.1f}s — отправляю hedged-запрос")
+        with _lock:
+            _stats(task)['hedges_fired'] += 1
+        futures.append(_executor.submit(attempt, route['model']))
+
+    last_error = None
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=max(remaining(), 0), return_when=FIRST_COMPLETED)
+        if not done:
+            raise requests.exceptions.Timeout(f"LLM {task}: нет ответа за {route['deadline']:.0f}s")
+        for future in done:
+            if future.exception() is not None:
+                last_error = future.exception()
+                continue
+            result, latency = future.result()
+            _observe(task, latency)
+            if len(futures) > 1 and future is futures[1]:
+                _record_hedge_win(task, latency, futures[0])
+            return result
+
+    if last_error is not None and not _is_retryable(last_error):
+        raise last_error
+    if remaining() < MIN_FALLBACK_SECONDS:
+        raise last_error
+
+    print(f"LLM {task}: {route['model']} не ответила ({last_error}) — пробую {route['fallback_model']}")
+    with _lock:
+        _stats(task)['fallbacks'] += 1
+    fallback = _executor.submit(attempt, route['fallback_model'])
+    done, _ = wait([fallback], timeout=max(remaining(), 0))
+    if not done:
+        raise requests.exceptions.Timeout(f"LLM {task}: нет ответа за {route['deadline']:.0f}s")
+    result, latency = fallback.result()
+    _observe(task, latency)
+    return result
+
+
+def _record_hedge_win(task: str, hedge_latency: float, primary_future):
+    """Дубль выиграл: когда основной запрос всё же завершится, запишем выигрыш по времени."""
+    with _lock:
+        _stats(task)['hedges_won'] += 1
+
+    def on_primary_done(future):
+        if future.exception() is not None:
+            return
+        _, primary_latency = future.result()
+        with _lock:
+            _stats(task)['hedge_saved_seconds'] += max(primary_latency - hedge_latency, 0.0)
+
+    primary_future.add_done_callback(on_primary_done)
+
+
+def get_routing_stats() -> dict:
+    """Статистика маршрутизации по задачам: hedges, fallbacks, p95 и выигрыш хвоста."""
+    report = {}
+    with _lock:
+        tasks = list(ROUTING_STATS.items())
+    for task, stats in tasks:
+        report[task] = dict(stats, p95=_p95(task))
+    return report
@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
 """Сервис для работы с Notion API."""
 import os
-import requests
+import threading
 from datetime import datetime
 
+from utils.http import http_session
 from utils.config import (
     NOTION_TOKEN, 
     NOTION_DATABASE_ID, 
@@ -13,6 +14,7 @@ from utils.config import (
     CATEGORY_EMOJI_MAP
 )
 from utils.markdown import parse_to_notion_blocks
+from utils.concurrency import run_parallel
 
 
 def get_latest_notes(limit: int = 5):
@@ -23,7 +25,7 @@ def get_latest_notes(limit: int = 5):
         "page_size": limit
     }
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
-    response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     response.raise_for_status()
     return response.json().get('results', [])
 
@@ -39,7 +41,7 @@ def search_notion_pages(query: str):
         "page_size": 5
     }
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
-    response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     response.raise_for_status()
     return response.json().get('results', [])
 
@@ -48,7 +50,7 @@ def get_notion_page_content(page_id: str) -> str:
     """Получает все текстовое содержимое со страницы Notion."""
     url = f"https://api.notion.com/v1/blocks/{page_id}/children"
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Notion-Version': '2022-06-28'}
-    response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+    response = http_session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
     response.raise_for_status()
     blocks = response.json().get('results', [])
     
@@ -67,11 +69,24 @@ def get_notion_page_content(page_id: str) -> str:
     return "\n".join(content)
 
 
-def create_notion_page(title: str, formatted_content: str, category: str):
-    """Создает страницу в Notion и отправляет ее контент на индексацию в Pinecone."""
+def index_notion_page(page_id: str, title: str, formatted_content: str):
+    """Индексирует заметку в Pinecone для смыслового поиска. Ошибки только логируются."""
     # Import here to avoid circular dependency
     from services.pinecone_svc import upsert_to_pinecone
+
+    try:
+        full_text_for_embedding = f"Заголовок: {title}\nСодержимое: {formatted_content}"
+        upsert_to_pinecone(page_id, full_text_for_embedding)
+    except Exception as e:
+        print(f"ОШИБКА ИНДЕКСАЦИИ В PINECONE: {e}")
+
+
+def create_notion_page(title: str, formatted_content: str, category: str, index: bool = True):
+    """Создает страницу в Notion и отправляет ее контент на индексацию в Pinecone.
     
+    Args:
+        index: False — не индексировать сразу (вызывающий код сделает index_notion_page в фоне)
+    """
     url = 'https://api.notion.com/v1/pages'
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
     page_icon = CATEGORY_EMOJI_MAP.get(category, "📄")
@@ -89,17 +104,13 @@ def create_notion_page(title: str, formatted_content: str, category: str):
         'children': children
     }
     
-    response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     response.raise_for_status()
     page_id = response.json()['id']
     print(f"Страница {page_id} успешно создана в Notion.")
 
-    try:
-        full_text_for_embedding = f"Заголовок: {title}\nСодержимое: {formatted_content}"
-        upsert_to_pinecone(page_id, full_text_for_embedding)
-    except Exception as e:
-        print(f"ОШИБКА ИНДЕКСАЦИИ В PINECONE: {e}")
-        
+    if index:
+        index_notion_page(page_id, title, formatted_content)
     return page_id
 
 
@@ -108,7 +119,7 @@ def delete_notion_page(page_id):
     url = f"https://api.notion.com/v1/pages/{page_id}"
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Notion-Version': '2022-06-28'}
     payload = {'archived': True}
-    requests.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    http_session.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     print(f"Страница Notion {page_id} удалена.")
 
 
@@ -117,7 +128,7 @@ def restore_notion_page(page_id):
     url = f"https://api.notion.com/v1/pages/{page_id}"
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
     payload = {'archived': False}
-    requests.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    http_session.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     print(f"Страница Notion {page_id} восстановлена.")
 
 
@@ -127,7 +138,7 @@ def add_to_notion_page(page_id: str, text_to_add: str):
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
     new_blocks = parse_to_notion_blocks(text_to_add)
     payload = {'children': new_blocks}
-    requests.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT).raise_for_status()
+    http_session.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT).raise_for_status()
 
 
 def add_image_to_page(page_id: str, image_url: str, caption: str = None):
@@ -138,6 +149,17 @@ def add_image_to_page(page_id: str, image_url: str, caption: str = None):
         image_url: Публичный HTTPS URL изображения
         caption: Опциональная подпись к изображению
     """
+    add_images_to_page(page_id, [image_url], caption=caption)
+
+
+def add_images_to_page(page_id: str, image_urls: list, caption: str = None):
+    """Добавляет несколько изображений одним запросом (альбом из Telegram).
+    
+    Args:
+        page_id: ID страницы Notion
+        image_urls: Публичные HTTPS URL изображений, в нужном порядке
+        caption: Опциональная подпись к первому изображению
+    """
     url = f"https://api.notion.com/v1/blocks/{page_id}/children"
     headers = {
         'Authorization': f'Bearer {NOTION_TOKEN}', 
@@ -145,20 +167,24 @@ def add_image_to_page(page_id: str, image_url: str, caption: str = None):
         'Notion-Version': '2022-06-28'
     }
     
-    image_block = {
-        "object": "block",
-        "type": "image",
-        "image": {
-            "type": "external",
-            "external": {"url": image_url}
-        }
-    }
+    image_blocks = []
+    for image_url in image_urls:
+        image_blocks.append({
+            "object": "block",
+            "type": "image",
+            "image": {
+                "type": "external",
+                "external": {"url": image_url}
+            }
+        })
     
-    if caption:
-        image_block["image"]["caption"] = [{"type": "text", "text": {"content": caption}}]
+    if caption and image_blocks:
+        image_blocks[0]["image"]["caption"] = [{"type": "text", "text": {"content": caption}}]
     
-    payload = {"children": [image_block]}
-    requests.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT).raise_for_status()
+    # Notion принимает до 100 блоков за запрос
+    for i in range(0, len(image_blocks), 100):
+        payload = {"children": image_blocks[i:i + 100]}
+        http_session.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT).raise_for_status()
 
 
 def get_last_created_page_id():
@@ -183,7 +209,7 @@ def get_last_created_page_id():
         "page_size": 1
     }
     
-    response = requests.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response = http_session.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     results = response.json().get('results', [])
     
     if not results:
@@ -202,7 +228,7 @@ def get_page_title(page_id: str) -> str:
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Notion-Version': '2022-06-28'}
     
     try:
-        response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+        response = http_session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         properties = response.json().get('properties', {})
         title_prop = properties.get('Name', {}).get('title', [])
@@ -220,8 +246,10 @@ def get_page_preview(page_id: str, max_chars: int = 100) -> dict:
     Returns:
         dict с ключами: title, preview, page_id
     """
-    title = get_page_title(page_id)
-    content = get_notion_page_content(page_id)
+    title, content = run_parallel(
+        lambda: get_page_title(page_id),
+        lambda: get_notion_page_content(page_id)
+    )
     
     if len(content) > max_chars:
         preview = content[:max_chars].strip() + "..."
@@ -240,7 +268,7 @@ def get_page_blocks(page_id: str) -> list:
     url = f"https://api.notion.com/v1/blocks/{page_id}/children"
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Notion-Version': '2022-06-28'}
     
-    response = requests.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+    response = http_session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
     response.raise_for_status()
     return response.json().get('results', [])
 
@@ -249,17 +277,24 @@ def delete_block(block_id: str):
     """Удаляет блок в Notion."""
     url = f"https://api.notion.com/v1/blocks/{block_id}"
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Notion-Version': '2022-06-28'}
-    requests.delete(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+    http_session.delete(url, headers=headers, timeout=DEFAULT_TIMEOUT)
 
 
-def replace_page_content(page_id: str, new_content: str):
+def replace_page_content(page_id: str, new_content: str, keep_images: bool = False):
     """Заменяет весь контент страницы на новый (для полировки).
     
     1. Удаляет все существующие блоки
     2. Добавляет новые блоки из new_content
+    
+    Args:
+        keep_images: Вернуть фото (внешние картинки) после нового текста
     """
     # 1. Получаем и удаляем все блоки
     blocks = get_page_blocks(page_id)
+    image_urls = [
+        block['image']['external']['url'] for block in blocks
+        if block['type'] == 'image' and block.get('image', {}).get('type') == 'external'
+    ] if keep_images else []
     for block in blocks:
         try:
             delete_block(block['id'])
@@ -268,6 +303,25 @@ def replace_page_content(page_id: str, new_content: str):
     
     # 2. Добавляем новый контент
     add_to_notion_page(page_id, new_content)
+    if image_urls:
+        add_images_to_page(page_id, image_urls)
+
+
+def update_note_properties(page_id: str, title: str, category: str, formatted_content: str):
+    """Обновляет заголовок, категорию (и иконку) и поисковый текст заметки."""
+    url = f"https://api.notion.com/v1/pages/{page_id}"
+    headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
+    payload = {
+        'icon': {'type': 'emoji', 'emoji': CATEGORY_EMOJI_MAP.get(category, "📄")},
+        'properties': {
+            'Name': {'title': [{'type': 'text', 'text': {'content': title}}]},
+            'Категория': {'select': {'name': category}},
+            'Содержание': {'rich_text': [{'type': 'text', 'text': {'content': formatted_content[:2000]}}]}
+        }
+    }
+    response = http_session.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response.raise_for_status()
+    print(f"Свойства страницы {page_id} обновлены: '{title}', {category}")
 
 
 def rename_page(page_id: str, new_title: str):
@@ -279,7 +333,7 @@ def rename_page(page_id: str, new_title: str):
             'Name': {'title': [{'type': 'text', 'text': {'content': new_title}}]}
         }
     }
-    response = requests.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response = http_session.patch(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     response.raise_for_status()
     print(f"Страница {page_id} переименована в '{new_title}'")
 
@@ -296,7 +350,7 @@ def get_and_delete_last_log():
         "sorts": [{"timestamp": "created_time", "direction": "descending"}],
         "page_size": 1
     }
-    response = requests.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response = http_session.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     results = response.json().get('results', [])
 
     if not results:
@@ -342,7 +396,7 @@ def log_last_action(properties: dict = None, notion_page_id: str = None, gcal_ev
     payload = {'parent': {'database_id': log_db_id}, 'properties': properties}
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         print(f"Действие успешно залогировано: {properties.get('Name', {}).get('title', [{}])[0].get('text', {}).get('content')}")
     except Exception as e:
@@ -392,7 +446,7 @@ def get_user_state(user_id: str):
     }
     query_url = f"https://api.notion.com/v1/databases/{log_db_id}/query"
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
-    response = requests.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+    response = http_session.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
     results = response.json().get('results', [])
 
     if not results: 
@@ -416,9 +470,39 @@ def get_user_state(user_id: str):
 
 # === TEMP TRANSCRIPT STORAGE (Features 1, 2, 6) ===
 
-def save_temp_transcript(user_id: str, text: str) -> str:
+# Готовые результаты AI (резюме, заголовок, категория) по log_id временного транскрипта.
+# В долгоживущем процессе (server.py) не должен расти бесконечно: старые записи вытесняются
+_temp_transcript_meta_cache = {}
+_TEMP_META_CACHE_MAX = 200
+_temp_meta_lock = threading.Lock()
+
+
+def _remember_temp_meta(log_id: str, meta: dict):
+    with _temp_meta_lock:
+        _temp_transcript_meta_cache[log_id] = meta
+        while len(_temp_transcript_meta_cache) > _TEMP_META_CACHE_MAX:
+            _temp_transcript_meta_cache.pop(next(iter(_temp_transcript_meta_cache)))
+
+
+def _json_rich_text(data) -> list:
+    """JSON для rich_text-свойства: куски по 2000 символов (лимит одного объекта), не больше 100."""
+    import json as json_mod
+
+    raw = json_mod.dumps(data, ensure_ascii=False)
+    chunks = [raw[i:i + 2000] for i in range(0, len(raw), 2000)]
+    if len(chunks) > 100:
+        # Обрезанный JSON потом не прочитать — лучше упасть сразу
+        raise ValueError(f"JSON не помещается в свойство Notion: {len(raw)} символов")
+    return [{'type': 'text', 'text': {'content': chunk}} for chunk in chunks]
+
+
+def save_temp_transcript(user_id: str, text: str, meta: dict = None) -> str:
     """Сохраняет длинный текст транскрипта во временный лог и возвращает его ID.
     Необходимо для обхода лимита 64 байт в callback_data кнопок Telegram.
+    
+    Args:
+        meta: Заранее посчитанные summary / main_title / category, чтобы кнопки
+            «Резюме» и «В Notion» не ходили в AI повторно
     """
     log_db_id = NOTION_LOG_DB_ID
     if not log_db_id:
@@ -433,21 +517,51 @@ def save_temp_transcript(user_id: str, text: str) -> str:
         'State': {'select': {'name': 'temp_transcript'}}
     }
     
+    # Храним meta JSON в GCalEventID поле (переиспользуем, как pending_edit_text),
+    # режем на куски по 2000 символов — лимит одного rich_text объекта
+    if meta:
+        properties['GCalEventID'] = {'rich_text': _json_rich_text(meta)}
+    
     payload = {'parent': {'database_id': log_db_id}, 'properties': properties}
     
     try:
-        response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         response.raise_for_status()
         log_id = response.json()['id']
         
         # Записываем длинный текст блоком (может быть > 2000 симв)
         add_to_notion_page(log_id, text)
+        if meta:
+            _remember_temp_meta(log_id, meta)
         return log_id
     except Exception as e:
         print(f"Ошибка сохранения временного транскрипта: {e}")
         return None
 
 
+def get_temp_transcript_meta(log_id: str) -> dict:
+    """Возвращает сохранённые вместе с транскриптом результаты AI (или пустой dict)."""
+    import json as json_mod
+    
+    if not log_id:
+        return {}
+    meta = _temp_transcript_meta_cache.get(log_id)
+    if meta is not None:
+        return meta
+    
+    url = f"https://api.notion.com/v1/pages/{log_id}"
+    headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Notion-Version': '2022-06-28'}
+    try:
+        response = http_session.get(url, headers=headers, timeout=DEFAULT_TIMEOUT)
+        response.raise_for_status()
+        parts = response.json().get('properties', {}).get('GCalEventID', {}).get('rich_text', [])
+        raw_meta = "".join(part.get('plain_text', '') for part in parts)
+        return json_mod.loads(raw_meta) if raw_meta else {}
+    except Exception as e:
+        print(f"Ошибка чтения meta временного транскрипта: {e}")
+        return {}
+
+
 def get_temp_transcript(log_id: str) -> str:
     """Получает текст временного транскрипта и удаляет запись."""
     if not log_id:
@@ -457,12 +571,61 @@ def get_temp_transcript(log_id: str) -> str:
         content = get_notion_page_content(log_id)
         # Удаляем временную запись после использования
         delete_notion_page(log_id)
+        with _temp_meta_lock:
+            _temp_transcript_meta_cache.pop(log_id, None)
         return content
     except Exception as e:
         print(f"Ошибка получения временного транскрипта: {e}")
         return None
 
 
+def save_pending_transcription(transcript_id: str, context: dict):
+    """Запоминает контекст чата для задачи AssemblyAI, чтобы продолжить по webhook/кнопке."""
+    properties = {
+        'Name': {'title': [{'type': 'text', 'text': {'content': f"Pending transcript {transcript_id}"}}]},
+        'UserID': {'rich_text': [{'type': 'text', 'text': {'content': str(context.get('user_id', ''))}}]},
+        'NotionPageID': {'rich_text': [{'type': 'text', 'text': {'content': transcript_id}}]},
+        'State': {'select': {'name': 'pending_transcript'}},
+        # Контекст храним в GCalEventID поле (переиспользуем, как pending_edit_text)
+        'GCalEventID': {'rich_text': _json_rich_text(context)}
+    }
+    log_last_action(properties=properties)
+
+
+def get_pending_transcription(transcript_id: str, delete: bool = True) -> dict:
+    """Возвращает контекст чата для задачи AssemblyAI (и по умолчанию удаляет запись)."""
+    import json as json_mod
+    
+    log_db_id = NOTION_LOG_DB_ID
+    if not log_db_id:
+        return None
+    
+    payload = {
+        "filter": {"and": [
+            {"property": "NotionPageID", "rich_text": {"equals": transcript_id}},
+            {"property": "State", "select": {"equals": "pending_transcript"}}
+        ]},
+        "page_size": 1
+    }
+    query_url = f"https://api.notion.com/v1/databases/{log_db_id}/query"
+    headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
+    
+    try:
+        response = http_session.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        results = response.json().get('results', [])
+        if not results:
+            return None
+        page = results[0]
+        parts = page['properties'].get('GCalEventID', {}).get('rich_text', [])
+        context = json_mod.loads("".join(part.get('plain_text', '') for part in parts))
+        if delete:
+            delete_notion_page(page['id'])
+        return context
+    except Exception as e:
+        print(f"Ошибка получения контекста транскрибации {transcript_id}: {e}")
+        return None
+
+
 def get_transcript_buffer(user_id: str):
     """Возвращает текущий буфер мульти-транскрипта для пользователя."""
     log_db_id = NOTION_LOG_DB_ID
@@ -481,7 +644,7 @@ def get_transcript_buffer(user_id: str):
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
     
     try:
-        response = requests.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        response = http_session.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         results = response.json().get('results', [])
         
         if not results:
@@ -513,7 +676,7 @@ def append_to_transcript_buffer(user_id: str, new_text: str) -> str:
         payload = {'parent': {'database_id': log_db_id}, 'properties': properties}
         
         try:
-            response = requests.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+            response = http_session.post(url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
             response.raise_for_status()
             buffer_page_id = response.json()['id']
         except Exception as e:
@@ -541,7 +704,10 @@ def clear_transcript_buffer(user_id: str):
 # а НЕ database query (eventual consistency).
 
 _SETTINGS_PAGE_TITLE = "⚙️ Bot Settings"
-_settings_page_id_cache = None  # кеш page_id в рамках одного запроса
+_settings_page_id_cache = None  # page_id не меняется — кешируется на всё время жизни процесса
+# Поиск/создание страницы и read-modify-write настроек из параллельных запросов:
+# без блокировки два потока создадут две страницы или затрут изменения друг друга
+_settings_lock = threading.RLock()
 
 
 def _find_settings_page_id(user_id: str) -> str:
@@ -549,7 +715,6 @@ def _find_settings_page_id(user_id: str) -> str:
     
     Возвращает page_id или None.
     """
-    global _settings_page_id_cache
     if _settings_page_id_cache:
         return _settings_page_id_cache
     
@@ -557,6 +722,15 @@ def _find_settings_page_id(user_id: str) -> str:
     if not db_id:
         return None
     
+    with _settings_lock:
+        if _settings_page_id_cache:
+            return _settings_page_id_cache
+        return _query_settings_page_id(db_id)
+
+
+def _query_settings_page_id(db_id: str) -> str:
+    global _settings_page_id_cache
+    
     headers = {'Authorization': f'Bearer {NOTION_TOKEN}', 'Content-Type': 'application/json', 'Notion-Version': '2022-06-28'}
     
     # Поиск по названию в основной БД
@@ -570,7 +744,7 @@ def _find_settings_page_id(user_id: str) -> str:
     query_url = f"https://api.notion.com/v1/databases/{db_id}/query"
     
     try:
-        response = requests.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        response = http_session.post(query_url, headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         results = response.json().get('results', [])
         if results:
             _settings_page_id_cache = results[0]['id']
@@ -610,7 +784,7 @@ def _create_settings_page(user_id: str, settings: dict) -> str:
     }
     
     try:
-        resp = requests.post("https://api.notion.com/v1/pages", headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
+        resp = http_session.post("https://api.notion.com/v1/pages", headers=headers, json=payload, timeout=DEFAULT_TIMEOUT)
         if resp.status_code == 200:
             page_id = resp.json()['id']
             _settings_page_id_cache = page_id
@@ -638,7 +812,7 @@ def _read_settings(user_id: str) -> tuple:
     
     try:
         # GET блоки страницы — это ВСЕГДА консистентно (не database query)
-        resp = requests.get(
+        resp = http_session.get(
             f"https://api.notion.com/v1/blocks/{page_id}/children?page_size=5",
             headers=headers,
             timeout=DEFAULT_TIMEOUT
@@ -678,7 +852,7 @@ def _write_settings(user_id: str, settings: dict):
     if block_id:
         # UPDATE существующего блока
         try:
-            resp = requests.patch(
+            resp = http_session.patch(
                 f"https://api.notion.com/v1/blocks/{block_id}",
                 headers=headers,
                 json={
@@ -698,7 +872,7 @@ def _write_settings(user_id: str, settings: dict):
     elif page_id:
         # Страница есть но блока нет — добавляем блок
         try:
-            resp = requests.patch(
+            resp = http_session.patch(
                 f"https://api.notion.com/v1/blocks/{page_id}/children",
                 headers=headers,
                 json={
@@ -720,8 +894,13 @@ def _write_settings(user_id: str, settings: dict):
         except Exception as e:
             print(f"SETTINGS APPEND ERROR: {e}")
     else:
-        # Нет страницы — создаём
-        _create_settings_page(user_id, settings)
+        # Нет страницы — создаём, если её не успел создать соседний поток
+        with _settings_lock:
+            exists = _settings_page_id_cache is not None
+            if not exists:
+                _create_settings_page(user_id, settings)
+        if exists:
+            _write_settings(user_id, settings)
 
 
 # --- Public API ---
@@ -736,9 +915,10 @@ def get_user_settings(user_id: str) -> dict:
 
 def set_user_settings(user_id: str, reminder_minutes: int):
     """Сохраняет reminder_minutes (сохраняя остальные настройки)."""
-    _, _, settings = _read_settings(user_id)
-    settings['reminder_minutes'] = reminder_minutes
-    _write_settings(user_id, settings)
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        settings['reminder_minutes'] = reminder_minutes
+        _write_settings(user_id, settings)
 
 
 def get_hidden_tasks(user_id: str) -> list:
@@ -749,30 +929,33 @@ def get_hidden_tasks(user_id: str) -> list:
 
 def set_hidden_tasks(user_id: str, task_ids: list):
     """Сохраняет список скрытых задач."""
-    _, _, settings = _read_settings(user_id)
-    settings['hidden_tasks'] = task_ids
-    _write_settings(user_id, settings)
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        settings['hidden_tasks'] = task_ids
+        _write_settings(user_id, settings)
 
 
 def add_hidden_task(user_id: str, task_id: str):
     """Добавляет задачу в скрытые."""
-    _, _, settings = _read_settings(user_id)
-    hidden = settings.get('hidden_tasks', [])
-    if task_id not in hidden:
-        hidden.append(task_id)
-        settings['hidden_tasks'] = hidden
-        _write_settings(user_id, settings)
-        print(f"HIDDEN: +{task_id}, total={len(hidden)}")
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        hidden = settings.get('hidden_tasks', [])
+        if task_id not in hidden:
+            hidden.append(task_id)
+            settings['hidden_tasks'] = hidden
+            _write_settings(user_id, settings)
+            print(f"HIDDEN: +{task_id}, total={len(hidden)}")
 
 
 def remove_hidden_task(user_id: str, task_id: str):
     """Убирает задачу из скрытых."""
-    _, _, settings = _read_settings(user_id)
-    hidden = settings.get('hidden_tasks', [])
-    if task_id in hidden:
-        hidden.remove(task_id)
-        settings['hidden_tasks'] = hidden
-        _write_settings(user_id, settings)
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        hidden = settings.get('hidden_tasks', [])
+        if task_id in hidden:
+            hidden.remove(task_id)
+            settings['hidden_tasks'] = hidden
+            _write_settings(user_id, settings)
 
 
 def get_user_xp(user_id: str) -> dict:
@@ -783,10 +966,11 @@ def get_user_xp(user_id: str) -> dict:
 
 def set_user_xp(user_id: str, xp_data: dict):
     """Сохраняет XP пользователя."""
-    _, _, settings = _read_settings(user_id)
-    settings['xp'] = xp_data.get('xp', 0)
-    settings['level'] = xp_data.get('level', 1)
-    _write_settings(user_id, settings)
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        settings['xp'] = xp_data.get('xp', 0)
+        settings['level'] = xp_data.get('level', 1)
+        _write_settings(user_id, settings)
 
 
 # === ACTIVE MODE ===
@@ -808,12 +992,13 @@ def set_active_mode(user_id: str, mode: str):
         user_id: ID пользователя
         mode: Название режима ('transcript') или None для сброса
     """
-    _, _, settings = _read_settings(user_id)
-    if mode is None:
-        settings.pop('active_mode', None)
-    else:
-        settings['active_mode'] = mode
-    _write_settings(user_id, settings)
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        if mode is None:
+            settings.pop('active_mode', None)
+        else:
+            settings['active_mode'] = mode
+        _write_settings(user_id, settings)
 
 
 # === TRANSCRIPT SETTINGS ===
@@ -826,9 +1011,10 @@ def get_transcript_clean(user_id: str) -> bool:
 
 def set_transcript_clean(user_id: str, clean: bool):
     """Устанавливает подрежим транскрипта (чистый / дословный)."""
-    _, _, settings = _read_settings(user_id)
-    settings['transcript_clean'] = clean
-    _write_settings(user_id, settings)
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        settings['transcript_clean'] = clean
+        _write_settings(user_id, settings)
 
 
 def get_transcript_single_mode(user_id: str) -> bool:
@@ -839,6 +1025,7 @@ def get_transcript_single_mode(user_id: str) -> bool:
 
 def set_transcript_single_mode(user_id: str, single_mode: bool):
     """Устанавливает опцию одиночного режима транскрипта."""
-    _, _, settings = _read_settings(user_id)
-    settings['transcript_single_mode'] = single_mode
-    _write_settings(user_id, settings)
+    with _settings_lock:
+        _, _, settings = _read_settings(user_id)
+        settings['transcript_single_mode'] = single_mode
+        _write_settings(user_id, settings)
@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 """Сервис для работы с Pinecone векторной базой."""
-import openai
-from pinecone import Pinecone
-
 from utils.config import OPENAI_API_KEY, PINECONE_API_KEY, PINECONE_HOST
+from utils.lazy import lazy_import, lazy_object
+
+
+def _connect_index():
+    from pinecone import Pinecone
+    return Pinecone(api_key=PINECONE_API_KEY).Index(host=PINECONE_HOST)
+
 
-# Инициализация клиентов
-openai.api_key = OPENAI_API_KEY
-pc = Pinecone(api_key=PINECONE_API_KEY)
-pinecone_index = pc.Index(host=PINECONE_HOST)
+# Клиенты создаются при первом поиске/индексации: openai и pinecone — самые тяжёлые импорты бота
+openai = lazy_import('openai', on_load=lambda module: setattr(module, 'api_key', OPENAI_API_KEY))
+pinecone_index = lazy_object(_connect_index, 'pinecone_index')
 
 
 def get_text_embedding(text: str):
@@ -0,0 +1,752 @@
+# -*- coding: utf-8 -*-
+"""Конвейер обработки голосовых и текстовых заметок.
+
+Общий для webhook Telegram (bot.py) и webhook AssemblyAI (assemblyai_webhook.py):
+после распознавания речи обработка продолжается здесь, откуда бы ни пришёл результат.
+"""
+import asyncio
+import threading
+import time
+
+from utils.config import (
+    TRANSCRIPT_COMBINED,
+    TRANSCRIPT_CHUNK_CHARS,
+    ASSEMBLYAI_WEBHOOK_URL,
+    ASSEMBLYAI_AUDIO_INGEST,
+    TRANSCRIPT_BATCH_WINDOW,
+    AI_MAX_PARALLEL,
+    PIPELINE_MAX_PARALLEL,
+    FAST_ACK,
+    FAST_CAPTURE_MODE,
+    FAST_CAPTURE_CATEGORY,
+    FAST_CAPTURE_TITLE_CHARS
+)
+from utils.batching import KeyedBatcher
+from utils.concurrency import parallel_map, run_parallel, TaskGraph
+from utils.timeparse import parse_reminder
+from services.telegram import (
+    download_telegram_file,
+    stream_telegram_file,
+    get_telegram_file_url,
+    send_telegram_message,
+    send_initial_status_message,
+    edit_telegram_message,
+    send_message_with_buttons,
+    send_long_message
+)
+from services.notion import (
+    create_notion_page,
+    index_notion_page,
+    update_note_properties,
+    replace_page_content,
+    delete_notion_page,
+    add_images_to_page,
+    log_last_action,
+    get_transcript_clean,
+    get_transcript_single_mode,
+    save_temp_transcript,
+    append_to_transcript_buffer,
+    save_pending_transcription
+)
+from services.calendar import create_google_calendar_event
+from services.progress import ProgressReporter
+from services.transcript_cache import get_cached_transcript, put_cached_transcript
+from services.speech_policy import select_speech_tier, get_speech_tier, record_transcription_latency
+from services.job_queue import (
+    enqueue_job,
+    register_job_handler,
+    start_job_workers,
+    current_job_id,
+    save_job_payload
+)
+from services.ai import (
+    upload_to_assemblyai,
+    submit_transcription,
+    poll_transcription,
+    process_with_ai,
+    clean_transcript,
+    process_transcript
+)
+
+
+TRANSCRIPT_PART_SEPARATOR = "\n\n---\n\n"
+
+# Пачки аудио одного чата для режима «Поток»
+_stream_batcher = KeyedBatcher(window=TRANSCRIPT_BATCH_WINDOW)
+
+
+def format_with_timecodes(words: list) -> str:
+    """Группирует слова из AssemblyAI в абзацы по предложениям и добавляет таймкоды."""
+    if not words:
+        return ""
+    
+    formatted = []
+    current_chunk = []
+    chunk_start = words[0]['start']
+    
+    for word in words:
+        if chunk_start is None:
+            chunk_start = word.get('start', 0)
+            
+        current_chunk.append(word['text'])
+        
+        # Start new line if sentence ends
+        if word['text'].endswith(('.', '?', '!')):
+            text = " ".join(current_chunk)
+            
+            safe_start = chunk_start if chunk_start is not None else 0
+            minutes = safe_start // 60000
+            seconds = (safe_start % 60000) // 1000
+            
+            timecode = f"[{minutes:02d}:{seconds:02d}]"
+            formatted.append(f"{timecode} {text}")
+            current_chunk = []
+            chunk_start = None
+            
+    if current_chunk:
+        text = " ".join(current_chunk)
+        safe_start = chunk_start if chunk_start is not None else 0
+        minutes = safe_start // 60000
+        seconds = (safe_start % 60000) // 1000
+        timecode = f"[{minutes:02d}:{seconds:02d}]"
+        formatted.append(f"{timecode} {text}")
+        
+    return "\n\n".join(formatted)
+
+
+def _ingest_audio(audio_file_id: str) -> str:
+    """Передаёт аудио из Telegram в AssemblyAI согласно ASSEMBLYAI_AUDIO_INGEST.
+    
+    Returns:
+        audio_url для submit_transcription
+    """
+    if ASSEMBLYAI_AUDIO_INGEST == 'direct':
+        # Ни скачивания, ни загрузки: AssemblyAI заберёт файл сам (URL живёт ~1 час)
+        return get_telegram_file_url(audio_file_id)
+    if ASSEMBLYAI_AUDIO_INGEST == 'buffer':
+        return upload_to_assemblyai(download_telegram_file(audio_file_id).getvalue())
+    return upload_to_assemblyai(stream_telegram_file(audio_file_id))
+
+
+def start_transcription(audio_file_id: str, context: dict):
+    """Запускает распознавание аудио из Telegram.
+    
+    С ASSEMBLYAI_WEBHOOK_URL только ставит задачу и сохраняет контекст чата —
+    результат придёт в assemblyai_webhook.py. С FAST_ACK ожидание уходит в
+    async-задачу очереди (поток воркера не занят). Иначе опрашивает AssemblyAI
+    и сразу продолжает конвейер.
+    
+    Модель и частота опроса зависят от длительности аудио (services/speech_policy.py).
+    
+    Args:
+        context: {'chat_id', 'user_id', 'mode': 'transcript' | 'note', 'reply_to_message_id',
+                  'file_unique_id', 'duration'}
+    """
+    # Это аудио уже распознавали (пересылка, повторная отправка)
+    cached = get_cached_transcript(context.get('file_unique_id'))
+    if cached:
+        continue_after_transcription(context, cached)
+        return
+    
+    tier = select_speech_tier(context.get('duration'))
+    audio_url = _ingest_audio(audio_file_id)
+    
+    if ASSEMBLYAI_WEBHOOK_URL:
+        transcript_id = _submit_for_tier(audio_url, tier, context, webhook_url=ASSEMBLYAI_WEBHOOK_URL)
+        save_pending_transcription(transcript_id, context)
+        return
+    
+    transcript_id = _submit_for_tier(audio_url, tier, context)
+    if FAST_ACK:
+        # Задача того же чата: update, пришедшие после постановки, подождут результат.
+        # Уже стоящие в очереди update чата (их ID меньше) выполнятся раньше неё.
+        # Пока идёт опрос, очередь продлевает аренду задачи
+        enqueue_job('transcription_poll', {'transcript_id': transcript_id, 'context': context},
+                    chat_id=context['chat_id'])
+        start_job_workers()
+        return
+    transcript_data = _poll_for_tier(transcript_id, tier)
+    record_queue_latency(context, transcript_data)
+    continue_after_transcription(context, transcript_data)
+
+
+def _submit_for_tier(audio_url: str, tier: dict, context: dict, webhook_url: str = None) -> str:
+    """Ставит задачу с моделью уровня и отмечает в контексте время постановки."""
+    transcript_id = submit_transcription(audio_url, webhook_url=webhook_url, speech_model=tier['speech_model'])
+    context['speech_tier'] = tier['name']
+    context['submitted_at'] = time.time()
+    return transcript_id
+
+
+def _poll_for_tier(transcript_id: str, tier: dict) -> dict:
+    return poll_transcription(
+        transcript_id,
+        max_wait=tier['max_wait'],
+        initial_delay=tier['initial_delay'],
+        max_delay=tier['max_delay']
+    )
+
+
+async def _poll_transcription_job(payload: dict):
+    """Задача очереди (FAST_ACK): ждёт транскрибацию на цикле событий и продолжает конвейер."""
+    from services.aio import poll_transcription as poll_transcription_async
+
+    context = payload['context']
+    tier = get_speech_tier(context.get('speech_tier'))
+    transcript_data = await poll_transcription_async(
+        payload['transcript_id'],
+        max_wait=tier['max_wait'],
+        initial_delay=tier['initial_delay'],
+        max_delay=tier['max_delay']
+    )
+    record_queue_latency(context, transcript_data)
+    # Дальше блокирующие запросы (AI, Notion, Telegram) — вне потока цикла
+    await asyncio.to_thread(continue_after_transcription, context, transcript_data)
+
+
+register_job_handler('transcription_poll', _poll_transcription_job)
+
+
+def record_queue_latency(context: dict, transcript_data: dict):
+    """Записывает задержку «задача создана → текст готов» для уровня из контекста."""
+    if not transcript_data or transcript_data.get('status') != 'completed':
+        return
+    submitted_at = context.get('submitted_at')
+    if submitted_at:
+        record_transcription_latency(context.get('speech_tier', 'medium'), time.time() - submitted_at)
+
+
+def continue_after_transcription(context: dict, transcript_data: dict):
+    """Продолжает конвейер после распознавания (опрос, webhook или кнопка «Проверить»)."""
+    chat_id = context['chat_id']
+    
+    if transcript_data and transcript_data.get('status') in ('queued', 'processing'):
+        # Не дождались — сохраняем контекст, чтобы продолжить по ID задачи
+        transcript_id = transcript_data['id']
+        save_pending_transcription(transcript_id, context)
+        buttons = [[{"text": "🔄 Проверить ещё раз", "callback_data": f"resume_transcript_{transcript_id}"}]]
+        send_message_with_buttons(chat_id, "⏳ Распознавание ещё идёт. Нажмите кнопку чуть позже — результат не потеряется.", buttons)
+        return
+    
+    put_cached_transcript(context.get('file_unique_id'), transcript_data)
+    
+    if context.get('mode') == 'transcript':
+        deliver_transcript(chat_id, context['user_id'], transcript_data, context.get('reply_to_message_id'))
+        return
+    
+    text_to_process = transcript_data.get('text') if transcript_data else None
+    if not text_to_process:
+        send_telegram_message(chat_id, "❌ Не удалось распознать речь.")
+        return
+    process_note_text(chat_id, text_to_process)
+
+
+def deliver_transcript(chat_id, user_id: str, transcript_data: dict, reply_to_message_id: int = None):
+    """РЕЖИМ ТРАНСКРИПТА — только расшифровка, без AI-заметки и Notion."""
+    transcript = transcript_data.get('text') if transcript_data else None
+
+    if not transcript:
+        send_telegram_message(chat_id, "❌ Не удалось распознать речь. Попробуйте другой файл.")
+        return
+
+    is_single_mode = get_transcript_single_mode(user_id)
+    is_clean = get_transcript_clean(user_id)
+    mode_icon = "✨" if is_clean else "📜"
+
+    # SINGLE MODE
+    if is_single_mode:
+        words = transcript_data.get('words', [])
+        if words:
+            transcript = format_with_timecodes(words)
+
+        # Один AI-запрос сразу на очистку, резюме и заголовок — кнопки потом отвечают мгновенно
+        transcript_meta = None
+        if TRANSCRIPT_COMBINED and len(transcript) <= TRANSCRIPT_CHUNK_CHARS:
+            try:
+                combined = process_transcript(transcript, clean=is_clean)
+                transcript = combined.pop('text')
+                transcript_meta = combined
+            except Exception as e:
+                print(f"Combined transcript error: {e}")
+
+        # Чистый режим поверх таймкодов
+        if is_clean and transcript_meta is None:
+            try:
+                transcript = clean_transcript(transcript)
+            except Exception as e:
+                print(f"Clean transcript error: {e}")
+
+        log_id = save_temp_transcript(user_id, transcript, meta=transcript_meta)
+        buttons = []
+        if log_id:
+            buttons.append([
+                {"text": "💾 В Notion", "callback_data": f"save_transcript_{log_id}"},
+                {"text": "📊 Резюме", "callback_data": f"summarize_transcript_{log_id}"}
+            ])
+        buttons.append([{"text": "🔙 Выйти из режима", "callback_data": "exit_transcript"}])
+
+        # Длинный текст — несколькими сообщениями или .txt-файлом, без обрезки
+        send_long_message(
+            chat_id, transcript, inline_buttons=buttons, reply_to_message_id=reply_to_message_id,
+            header=f"✅ *Одиночный транскрипт ({mode_icon}):*\n\n"
+        )
+
+        return
+
+    # MULTI MODE
+    if is_clean:
+        try:
+            transcript = clean_transcript(transcript)
+        except Exception as e:
+            print(f"Clean transcript error: {e}")
+
+    # Добавляем в буфер
+    new_buffer = append_to_transcript_buffer(user_id, transcript)
+    _report_stream_parts(chat_id, new_buffer, [transcript], mode_icon)
+
+
+def _report_stream_parts(chat_id, new_buffer: str, texts: list, mode_icon: str, status_message_id: int = None):
+    """Сообщает о добавленных в буфер частях (одним сообщением на пачку)."""
+    if not new_buffer:
+        if status_message_id:
+            edit_telegram_message(chat_id, status_message_id, "❌ Ошибка буферизации.")
+        else:
+            send_telegram_message(chat_id, "❌ Ошибка буферизации.")
+        return
+
+    # Считаем количество частей по сепараторам
+    parts_count = new_buffer.count(TRANSCRIPT_PART_SEPARATOR)
+
+    preview_text = "\n\n".join(texts)
+    if len(preview_text) > 500:
+        preview_text = preview_text[:500] + "..."
+
+    if len(texts) == 1:
+        header = f"{mode_icon} *Распознана часть {parts_count}:*"
+    else:
+        header = f"{mode_icon} *Распознаны части {parts_count - len(texts) + 1}–{parts_count}:*"
+    msg = (
+        f"{header}\n_{preview_text}_\n\n"
+        f"🗣 Отправьте следующее аудио, чтобы дополнить, или нажмите кнопку ниже."
+    )
+
+    buttons = [
+        [
+            {"text": "✅ Завершить и показать все", "callback_data": "transcript_finish"}
+        ],
+        [
+            {"text": "🗑 Очистить", "callback_data": "transcript_clear"},
+            {"text": "🔙 Выйти", "callback_data": "exit_transcript"}
+        ]
+    ]
+    if status_message_id:
+        edit_telegram_message(chat_id, status_message_id, msg, inline_buttons=buttons)
+    else:
+        send_message_with_buttons(chat_id, msg, buttons)
+
+
+def start_stream_transcription(audio_file_id: str, message_id: int, context: dict):
+    """Режим «Поток»: аудио, пришедшие пачкой, распознаются параллельно.
+
+    Первый вызов для чата ждёт TRANSCRIPT_BATCH_WINDOW секунд и забирает все
+    аудио, пришедшие за это время; остальные вызовы сразу возвращаются.
+    Части попадают в буфер одним добавлением в порядке message_id.
+    """
+    chat_id = context['chat_id']
+    batch = _stream_batcher.submit(chat_id, (message_id, audio_file_id, context))
+    if batch is None:
+        return  # Аудио забрал вызов, который собирает пачку
+
+    batch.sort(key=lambda item: item[0])
+    label = "аудио" if len(batch) == 1 else f"{len(batch)} аудио"
+    status_message_id = send_initial_status_message(chat_id, f"⏳ Распознаю {label}...")
+
+    is_clean = get_transcript_clean(context['user_id'])
+    texts = parallel_map(lambda item: _transcribe_stream_part(item, is_clean), batch, max_workers=AI_MAX_PARALLEL)
+    texts = [text for text in texts if text]
+
+    if not texts:
+        error_text = "❌ Не удалось распознать речь. Попробуйте другой файл."
+        if status_message_id:
+            edit_telegram_message(chat_id, status_message_id, error_text)
+        else:
+            send_telegram_message(chat_id, error_text)
+        return
+
+    new_buffer = append_to_transcript_buffer(context['user_id'], TRANSCRIPT_PART_SEPARATOR.join(texts))
+    _report_stream_parts(chat_id, new_buffer, texts, "✨" if is_clean else "📜", status_message_id)
+
+
+def _transcribe_stream_part(item: tuple, is_clean: bool) -> str:
+    """Распознаёт одно аудио пачки. Возвращает текст части или None."""
+    _, audio_file_id, context = item
+    try:
+        transcript_data = get_cached_transcript(context.get('file_unique_id'))
+        if not transcript_data:
+            # Пачка ждёт все части, поэтому здесь всегда опрос, даже при ASSEMBLYAI_WEBHOOK_URL
+            tier = select_speech_tier(context.get('duration'))
+            transcript_id = _submit_for_tier(_ingest_audio(audio_file_id), tier, context)
+            transcript_data = _poll_for_tier(transcript_id, tier)
+            record_queue_latency(context, transcript_data)
+            if transcript_data and transcript_data.get('status') != 'completed':
+                # Не дождались — эта часть придёт отдельно по кнопке «Проверить»
+                continue_after_transcription(context, transcript_data)
+                return None
+            put_cached_transcript(context.get('file_unique_id'), transcript_data)
+    except Exception as e:
+        print(f"Stream transcription error: {e}")
+        return None
+
+    transcript = transcript_data.get('text') if transcript_data else None
+    if transcript and is_clean:
+        try:
+            transcript = clean_transcript(transcript)
+        except Exception as e:
+            print(f"Clean transcript error: {e}")
+    return transcript
+
+
+def process_note_text(chat_id, text_to_process: str, is_text_message: bool = False, photo_urls: list = None):
+    """Создаёт заметку (или только напоминание) из текста: AI → Notion → календарь."""
+    photo_urls = photo_urls or []
+
+    # Простые напоминания («через 15 минут позвонить») разбираем локально, без AI
+    local_reminder = parse_reminder(text_to_process)
+    if FAST_CAPTURE_MODE and not local_reminder:
+        capture_note(chat_id, text_to_process, photo_urls)
+        return
+
+    status_message_id = None
+    if is_text_message:
+        progress_bar = "⬜️⬜️⬜️⬜️⬜️⬜️ 0%"
+        status_message_id = send_initial_status_message(chat_id, f"⏳ Анализирую...\n`{progress_bar}`")
+    # Правки статуса уходят в фоне и не задерживают AI/Notion/календарь
+    progress = ProgressReporter(chat_id, status_message_id)
+    progress.update("⏳ Анализирую...\n`🟩🟩⬜️⬜️⬜️⬜️ 33%`")
+
+    if local_reminder:
+        print(f"Напоминание разобрано локально: {local_reminder}")
+        ai_data = {
+            'main_title': local_reminder['title'],
+            'category': 'Задача',
+            'formatted_body': text_to_process,
+            'is_reminder_only': True,
+            'events': [local_reminder]
+        }
+    else:
+        ai_data = process_with_ai(text_to_process)
+    notion_title = ai_data.get('main_title', 'Новая заметка')
+    notion_category = ai_data.get('category', 'Мысль')
+    formatted_body = ai_data.get('formatted_body', text_to_process)
+    is_reminder_only = ai_data.get('is_reminder_only', False)
+    valid_events = _valid_events(ai_data)
+
+    # Лог для «↩️ Отменить» пишется после записей и по порядку: сначала заметка, потом события
+    graph = TaskGraph(max_workers=PIPELINE_MAX_PARALLEL)
+
+    # --- РЕЖИМ ТОЛЬКО НАПОМИНАНИЕ (без Notion) ---
+    if is_reminder_only and valid_events:
+        event_tasks = _add_event_tasks(graph, valid_events, formatted_body)
+        progress.update("⏳ Добавляю в календарь...\n`🟩🟩🟩🟩🟩🟩 99%`")
+        graph.add('log_events', _log_created_events, optional_deps=event_tasks)
+        graph.run()
+        graph.wait()
+        created_events = _collect_created_events(chat_id, graph, valid_events)
+        if created_events:
+            final_text, action_buttons = _reminder_report(created_events)
+            progress.finish(final_text, inline_buttons=action_buttons)
+        return
+
+    # --- ОБЫЧНЫЙ РЕЖИМ (Notion + календарь) ---
+    if valid_events:
+        progress.update("⏳ Сохраняю в Notion и календарь...\n`🟩🟩🟩🟩⬜️⬜️ 66%`")
+    else:
+        progress.update("⏳ Сохраняю в Notion...\n`🟩🟩🟩🟩⬜️⬜️ 66%`")
+
+    graph.add('page', lambda: create_notion_page(notion_title, formatted_body, notion_category, index=False))
+    # События — только если заметка создалась (иначе пользователь видит лишь ошибку Notion);
+    # между собой и с фото/логом заметки они идут параллельно
+    event_tasks = _add_event_tasks(graph, valid_events, formatted_body, deps=['page'])
+    graph.add('log_page', lambda page_id: page_id and log_last_action(notion_page_id=page_id), deps=['page'])
+    if photo_urls:
+        # Прикрепляем фото к созданной заметке — все одним запросом
+        graph.add('photos', lambda page_id: page_id and add_images_to_page(page_id, photo_urls), deps=['page'])
+    graph.add(
+        'log_events',
+        lambda _, *gcal_results: _log_created_events(*gcal_results),
+        optional_deps=['log_page', *event_tasks]
+    )
+    # Эмбеддинг и запись в Pinecone для ответа не нужны — идут в фоне
+    graph.add(
+        'index',
+        lambda page_id: page_id and index_notion_page(page_id, notion_title, formatted_body),
+        deps=['page'],
+        critical=False
+    )
+
+    try:
+        results = graph.run()
+        if 'page' in graph.errors:
+            e = graph.errors['page']
+            detailed_error = e.response.text if hasattr(e, 'response') else str(e)
+            final_text = f"❌ *Ошибка при создании заметки в Notion:*\n<pre>{detailed_error}</pre>"
+            progress.finish(final_text, use_html=True)
+            return
+
+        notion_page_id = results['page']
+        if not is_text_message:
+            send_telegram_message(
+                chat_id, 
+                f"✅ *Заметка в Notion создана!*\n\n*Название:* {notion_title}\n*Категория:* {notion_category}", 
+                add_undo_button=True
+            )
+        created_events = _collect_created_events(chat_id, graph, valid_events)
+
+        # Статус с прогресс-баром превращается в итог (или итог уходит новым сообщением)
+        final_report_text, action_buttons = _note_report(notion_page_id, notion_title, notion_category, formatted_body, created_events)
+        progress.finish(final_report_text, inline_buttons=action_buttons)
+    finally:
+        # Индексация в Pinecone дорабатывает уже после ответа пользователю
+        graph.wait()
+
+
+def capture_note(chat_id, text: str, photo_urls: list = None):
+    """Быстрая запись (FAST_CAPTURE_MODE): сырой текст сразу в Notion, AI-обработка — следом.
+
+    Заметка сохраняется и подтверждается без ожидания OpenAI; если AI
+    недоступен, она остаётся как есть и её можно обработать позже кнопкой.
+    """
+    photo_urls = photo_urls or []
+    title = _placeholder_title(text)
+    try:
+        page_id = create_notion_page(title, text, FAST_CAPTURE_CATEGORY, index=False)
+    except Exception as e:
+        detailed_error = e.response.text if getattr(e, 'response', None) is not None else str(e)
+        send_telegram_message(chat_id, f"❌ *Ошибка при создании заметки в Notion:*\n<pre>{detailed_error}</pre>", use_html=True)
+        return
+
+    calls = [lambda: log_last_action(notion_page_id=page_id)]
+    if photo_urls:
+        calls.append(lambda: add_images_to_page(page_id, photo_urls))
+    calls.append(lambda: send_initial_status_message(chat_id, f"📥 *Сохранено:* {title}\n_✨ Оформляю заметку..._"))
+    status_message_id = run_parallel(*calls)[-1]
+
+    payload = {'chat_id': chat_id, 'page_id': page_id, 'text': text, 'status_message_id': status_message_id}
+    if FAST_ACK:
+        # Долгоживущий процесс: обработка в очереди задач, с повторами и dead-letter
+        enqueue_job('enrich_note', payload, chat_id=chat_id)
+        start_job_workers()
+        return
+
+    try:
+        enrich_note(**payload)
+    except Exception as e:
+        print(f"Ошибка AI-обработки заметки {page_id}: {e}")
+        _report_unformatted_note(payload)
+
+
+def _report_unformatted_note(payload: dict):
+    """AI-оформление не удалось: статус говорит, что сырая заметка сохранена, и даёт кнопку повтора."""
+    page_id = payload['page_id']
+    buttons = [[
+        {"text": "✨ Обработать", "callback_data": f"enrich_note_{page_id}"},
+        {"text": "👁️ Просмотр", "callback_data": f"view_page_{page_id}"},
+        {"text": "↩️ Отменить", "callback_data": "undo_last_action"}
+    ]]
+    ProgressReporter(payload['chat_id'], payload.get('status_message_id')).finish(
+        f"📥 *Сохранено:* {_placeholder_title(payload['text'])}\n_AI сейчас недоступен — заметка сохранена как есть._",
+        inline_buttons=buttons
+    )
+
+
+def enrich_note(chat_id, page_id: str, text: str, status_message_id: int = None,
+                ai_data: dict = None, created_events: dict = None):
+    """Вторая половина быстрой записи: AI → заголовок, категория, текст, события, индекс.
+
+    Страница правится на месте. Ошибка AI пробрасывается (повтор задачи);
+    ошибки отдельных записей не мешают остальным.
+
+    В очереди задач ответ AI и созданные события сохраняются в payload задачи:
+    повтор не спрашивает AI заново и не создаёт те же события ещё раз.
+
+    Args:
+        ai_data: Ответ AI из прошлой попытки
+        created_events: {номер события: результат календаря} из прошлой попытки
+    """
+    job_id = current_job_id()
+    state = {'chat_id': chat_id, 'page_id': page_id, 'text': text, 'status_message_id': status_message_id,
+             'ai_data': ai_data, 'created_events': dict(created_events or {})}
+    state_lock = threading.Lock()
+
+    def checkpoint():
+        if job_id is not None:
+            save_job_payload(job_id, state)
+
+    if ai_data is None:
+        ai_data = process_with_ai(text)
+        state['ai_data'] = ai_data
+        checkpoint()
+    notion_title = ai_data.get('main_title', 'Новая заметка')
+    notion_category = ai_data.get('category', 'Мысль')
+    formatted_body = ai_data.get('formatted_body', text)
+    valid_events = _valid_events(ai_data)
+    progress = ProgressReporter(chat_id, status_message_id)
+
+    def create_event(index: int, event: dict) -> dict:
+        done = state['created_events'].get(str(index))
+        if done is not None:
+            return dict(done, reused=True)  # Создано в прошлой попытке
+        result = create_google_calendar_event(event['title'], formatted_body, event['datetime_iso'])
+        with state_lock:
+            state['created_events'][str(index)] = result
+            checkpoint()
+        return result
+
+    graph = TaskGraph(max_workers=PIPELINE_MAX_PARALLEL)
+    event_tasks = [
+        graph.add(f'event_{i}', lambda i=i, event=event: create_event(i, event))
+        for i, event in enumerate(valid_events)
+    ]
+    graph.add('log_events', _log_created_events, optional_deps=event_tasks)
+
+    if ai_data.get('is_reminder_only') and valid_events:
+        # Напоминания живут только в календаре — как и без быстрой записи.
+        # Сырую заметку убираем, только если хоть одно событие создано
+        graph.add(
+            'delete_page',
+            lambda *results: any(results) and delete_notion_page(page_id),
+            optional_deps=event_tasks
+        )
+        graph.run()
+        graph.wait()
+        created_events = _collect_created_events(chat_id, graph, valid_events)
+        if created_events:
+            final_text, action_buttons = _reminder_report(created_events)
+            progress.finish(final_text, inline_buttons=action_buttons)
+        else:
+            buttons = [[{"text": "👁️ Просмотр", "callback_data": f"view_page_{page_id}"}]]
+            progress.finish(
+                f"📥 *Сохранено:* {_placeholder_title(text)}\n"
+                "_Не удалось создать напоминание в календаре — заметка осталась в Notion._",
+                inline_buttons=buttons
+            )
+        return
+
+    graph.add('properties', lambda: update_note_properties(page_id, notion_title, notion_category, formatted_body))
+    # Фото, прикреплённые при записи, остаются — после нового текста
+    graph.add('content', lambda: replace_page_content(page_id, formatted_body, keep_images=True))
+    graph.add('index', lambda _: index_notion_page(page_id, notion_title, formatted_body), deps=['content'])
+    graph.run()
+    graph.wait()
+
+    created_events = _collect_created_events(chat_id, graph, valid_events)
+    final_report_text, action_buttons = _note_report(page_id, notion_title, notion_category, formatted_body, created_events)
+    progress.finish(final_report_text, inline_buttons=action_buttons)
+
+
+register_job_handler('enrich_note', lambda payload: enrich_note(**payload), on_dead=_report_unformatted_note)
+
+
+def _placeholder_title(text: str) -> str:
+    """Временный заголовок — начало первой строки заметки."""
+    first_line = text.strip().split('\n', 1)[0]
+    if len(first_line) > FAST_CAPTURE_TITLE_CHARS:
+        return first_line[:FAST_CAPTURE_TITLE_CHARS].rstrip() + '…'
+    return first_line or 'Новая заметка'
+
+
+def _valid_events(ai_data: dict) -> list:
+    return [
+        event for event in ai_data.get('events', []) 
+        if event and event.get('title') and event.get('datetime_iso')
+    ]
+
+
+def _add_event_tasks(graph: TaskGraph, events: list, description: str, deps=()) -> list:
+    """Добавляет в граф создание событий календаря (задачи event_0, event_1, ...) после deps."""
+    return [
+        graph.add(f'event_{i}', lambda *_, event=event: create_google_calendar_event(
+            event['title'],
+            description,
+            event['datetime_iso']
+        ), deps=deps)
+        for i, event in enumerate(events)
+    ]
+
+
+def _log_created_events(*gcal_results):
+    """Пишет созданные события в лог (для «↩️ Отменить») в порядке событий заметки."""
+    for gcal_result in gcal_results:
+        # reused — событие из прошлой попытки задачи, оно уже в логе
+        if gcal_result and gcal_result.get('id') and not gcal_result.get('reused'):
+            log_last_action(gcal_event_id=gcal_result['id'])
+
+
+def _collect_created_events(chat_id, graph: TaskGraph, events: list) -> list:
+    """[(event, gcal_result)] созданных событий; об ошибках сообщает пользователю."""
+    created = []
+    for i, event in enumerate(events):
+        error = graph.errors.get(f'event_{i}')
+        if error is not None:
+            send_telegram_message(chat_id, f"❌ *Ошибка при создании события '{event['title']}':*\n`{error}`")
+        else:
+            created.append((event, graph.results.get(f'event_{i}')))
+    return created
+
+
+def _first_event_link(created_events: list) -> str:
+    """Ссылка на первое созданное событие (для кнопки «Открыть в календаре»)."""
+    links = [gcal_result.get('html_link') for _, gcal_result in created_events if gcal_result and gcal_result.get('id')]
+    return links[0] if links else None
+
+
+def _reminder_report(created_events: list) -> tuple:
+    """Итог режима «только напоминание»: текст и кнопки."""
+    # Форматируем события с датой и временем
+    from datetime import datetime
+    events_text = []
+    for event, _ in created_events:
+        title, dt_iso = event['title'], event['datetime_iso']
+        try:
+            dt = datetime.fromisoformat(dt_iso)
+            formatted_dt = dt.strftime('%d.%m.%Y в %H:%M')
+            events_text.append(f"*{title}*\n   📆 {formatted_dt}")
+        except:
+            events_text.append(f"*{title}*")
+
+    final_text = "📅 *Напоминание создано!*\n\n" + "\n\n".join(events_text)
+    action_buttons = [[{"text": "↩️ Отменить", "callback_data": "undo_last_action"}]]
+
+    first_link = _first_event_link(created_events)
+    if first_link:
+        action_buttons.append([{"text": "📅 Открыть в календаре", "url": first_link}])
+    return final_text, action_buttons
+
+
+def _note_report(notion_page_id: str, notion_title: str, notion_category: str, formatted_body: str, created_events: list) -> tuple:
+    """Итог создания заметки: текст и кнопки."""
+    final_report_text = f"✅ *Заметка создана!*\n\n📋 *{notion_title}*\n_{formatted_body[:100]}..._" if len(formatted_body) > 100 else f"✅ *Заметка создана!*\n\n📋 *{notion_title}*\n_{formatted_body}_"
+    final_report_text += f"\n\n_Категория: {notion_category}_"
+
+    if created_events:
+        final_report_text += "\n\n📅 *Добавлено в календарь:*\n- " + "\n- ".join(event['title'] for event, _ in created_events)
+
+    # Создаём inline кнопки для действий
+    action_buttons = [
+        [
+            {"text": "✏️ Переименовать", "callback_data": f"rename_page_{notion_page_id}"},
+            {"text": "👁️ Просмотр", "callback_data": f"view_page_{notion_page_id}"}
+        ],
+        [
+            {"text": "➕ Добавить", "callback_data": f"add_to_notion_{notion_page_id}"},
+            {"text": "↩️ Отменить", "callback_data": "undo_last_action"}
+        ]
+    ]
+
+    # Добавляем кнопку календаря если есть события
+    first_link = _first_event_link(created_events)
+    if first_link:
+        action_buttons.append([
+            {"text": "📅 Открыть в календаре", "url": first_link}
+        ])
+    return final_report_text, action_buttons
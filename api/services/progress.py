@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Статус-сообщение с прогрессом, которое не тормозит конвейер."""
+import threading
+import time
+
+from services.telegram import edit_telegram_message, send_telegram_message, send_message_with_buttons
+
+# Не чаще одной правки статуса за столько секунд
+PROGRESS_MIN_INTERVAL = 1.0
+
+
+class ProgressReporter:
+    """Обновляет статус-сообщение асинхронно и не чаще PROGRESS_MIN_INTERVAL.
+
+    update() не ждёт Telegram: хранится только самый свежий текст, промежуточные
+    состояния, не успевшие уйти, просто пропускаются. Правка с тем же текстом
+    не отправляется. finish() отправляет итог всегда — правкой статуса или
+    новым сообщением, если статуса нет.
+    """
+
+    def __init__(self, chat_id, message_id: int = None, min_interval: float = PROGRESS_MIN_INTERVAL):
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._pending = None
+        self._last_sent = None
+        self._last_sent_at = 0.0
+        self._timer = None
+        self._finished = False
+
+    def update(self, text: str):
+        """Показывает новый этап. Без статус-сообщения ничего не делает."""
+        if not self.message_id:
+            return
+        with self._lock:
+            if self._finished:
+                return
+            self._pending = text
+            if self._timer is not None:
+                return  # Уже запланировано: уйдёт самый свежий текст
+            wait = self._last_sent_at + self.min_interval - time.monotonic()
+            if wait > 0:
+                self._timer = threading.Timer(wait, self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+                return
+        self._flush()
+
+    def _flush(self):
+        with self._lock:
+            self._timer = None
+            text, self._pending = self._pending, None
+            if self._finished or text is None or text == self._last_sent:
+                return
+            self._last_sent = text
+            self._last_sent_at = time.monotonic()
+            # Ставим в очередь под блокировкой: finish() не сможет вклиниться между
+            # проверкой _finished и постановкой, и устаревшая правка не уйдёт после итога.
+            # Очередь клиента Telegram сохраняет порядок правок одного чата, wait=False не ждёт сеть
+            edit_telegram_message(self.chat_id, self.message_id, text, wait=False)
+
+    def finish(self, text: str, inline_buttons: list = None, use_html: bool = False):
+        """Итоговое состояние: отменяет отложенные правки и отправляет text."""
+        with self._lock:
+            self._finished = True
+            self._pending = None
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if self.message_id:
+            # Итог — через ту же очередь чата и с ожиданием: уже поставленные правки
+            # уходят раньше. Отложенный до ответа webhook итог обогнал бы их
+            edit_telegram_message(self.chat_id, self.message_id, text, use_html=use_html,
+                                  inline_buttons=inline_buttons, hold=False)
+        elif inline_buttons:
+            send_message_with_buttons(self.chat_id, text, inline_buttons, use_html=use_html)
+        else:
+            send_telegram_message(self.chat_id, text, use_html=use_html)
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Выбор модели распознавания и режима опроса по длительности аудио."""
+import threading
+from collections import deque
+
+from utils.config import SPEECH_MODEL_FAST, SPEECH_MODEL_ACCURATE, POLLING_MAX_WAIT
+
+LATENCY_WINDOW = 50  # Сколько последних распознаваний учитывать в статистике уровня
+
+# Уровни по длительности (сек). Короткие голосовые — быстрая модель и частый опрос:
+# ответ нужен через секунды. Длинные записи — точная модель и редкий опрос:
+# они всё равно идут минутами, а лишние запросы статуса ничего не ускоряют.
+SPEECH_TIERS = [
+    {'name': 'short',  'max_duration': 60,   'speech_model': SPEECH_MODEL_FAST,
+     'initial_delay': 0.5, 'max_delay': 2.0,  'max_wait': 60},
+    {'name': 'medium', 'max_duration': 900,  'speech_model': SPEECH_MODEL_ACCURATE,
+     'initial_delay': 1.5, 'max_delay': 6.0,  'max_wait': POLLING_MAX_WAIT},
+    {'name': 'long',   'max_duration': None, 'speech_model': SPEECH_MODEL_ACCURATE,
+     'initial_delay': 5.0, 'max_delay': 15.0, 'max_wait': POLLING_MAX_WAIT},
+]
+# Telegram не прислал duration (например, документ) — считаем средним
+DEFAULT_TIER = 'medium'
+
+_lock = threading.Lock()
+_latencies = {}  # tier -> deque задержек «задача создана → текст готов»
+
+
+def select_speech_tier(duration) -> dict:
+    """Возвращает уровень распознавания для аудио длительностью duration секунд."""
+    if duration is None:
+        return get_speech_tier(DEFAULT_TIER)
+    for tier in SPEECH_TIERS:
+        if tier['max_duration'] is None or duration <= tier['max_duration']:
+            return tier
+    return SPEECH_TIERS[-1]
+
+
+def get_speech_tier(name: str) -> dict:
+    """Уровень по имени (для продолжения по webhook/кнопке)."""
+    for tier in SPEECH_TIERS:
+        if tier['name'] == name:
+            return tier
+    return get_speech_tier(DEFAULT_TIER)
+
+
+def record_transcription_latency(tier_name: str, seconds: float):
+    """Запоминает задержку от создания задачи до готового текста."""
+    with _lock:
+        _latencies.setdefault(tier_name, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+    print(f"Распознавание ({tier_name}): {seconds:.1f} сек от постановки в очередь")
+
+
+def get_transcription_stats() -> dict:
+    """Статистика задержек по уровням: count, p50, p95, max (сек)."""
+    stats = {}
+    with _lock:
+        snapshot = {name: sorted(samples) for name, samples in _latencies.items()}
+    for name, samples in snapshot.items():
+        if not samples:
+            continue
+        stats[name] = {
+            'count': len(samples),
+            'p50': round(samples[int(0.5 * (len(samples) - 1))], 2),
+            'p95': round(samples[int(0.95 * (len(samples) - 1))], 2),
+            'max': round(samples[-1], 2)
+        }
+    return stats
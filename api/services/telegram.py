@@ -2,9 +2,11 @@
 """Сервис для работы с Telegram API."""
 import json
 import io
-import requests
+import re
+import uuid
 
-from utils.config import TELEGRAM_TOKEN, DEFAULT_TIMEOUT
+from utils.config import DEFAULT_TIMEOUT, TRANSCRIPT_FILE_THRESHOLD
+from services.telegram_client import get_telegram_client
 
 
 def get_persistent_keyboard():
@@ -19,21 +21,47 @@ def get_persistent_keyboard():
     }
 
 
-def download_telegram_file(file_id: str) -> io.BytesIO:
-    """Загружает файл (голосовое сообщение) с серверов Telegram."""
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getFile?file_id={file_id}"
-    response = requests.get(url, timeout=DEFAULT_TIMEOUT)
-    response.raise_for_status()
-    data = response.json()
+# Размер куска при потоковой передаче файла Telegram → AssemblyAI
+STREAM_CHUNK_SIZE = 256 * 1024
+TELEGRAM_MESSAGE_LIMIT = 4096
+# Сколько символов текста кодируется за раз при потоковой отправке документа
+DOCUMENT_TEXT_SLICE = 64 * 1024
+
+_TIMECODE_LINE_RE = re.compile(r'\n(?=\[\d{2,}:\d{2}\])')
+_SENTENCE_END_RE = re.compile(r'[.!?…](?=\s)')
+_HTML_TAG_RE = re.compile(r'<\s*(/)?\s*([a-zA-Z-]+)[^>]*>')
+
+
+def _get_telegram_file_path(file_id: str) -> str:
+    """Возвращает file_path файла на серверах Telegram."""
+    data = get_telegram_client().request('getFile', {'file_id': file_id})
     if 'result' not in data or 'file_path' not in data['result']:
         raise ValueError(f"Не удалось получить путь к файлу: {data}")
-    file_path = data['result']['file_path']
-    file_url = f"https://api.telegram.org/file/bot{TELEGRAM_TOKEN}/{file_path}"
-    file_response = requests.get(file_url, timeout=DEFAULT_TIMEOUT)
+    return data['result']['file_path']
+
+
+def download_telegram_file(file_id: str) -> io.BytesIO:
+    """Загружает файл (голосовое сообщение) с серверов Telegram."""
+    file_url = get_telegram_file_url(file_id)
+    file_response = get_telegram_client().session.get(file_url, timeout=DEFAULT_TIMEOUT)
     file_response.raise_for_status()
     return io.BytesIO(file_response.content)
 
 
+def stream_telegram_file(file_id: str, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Отдаёт файл из Telegram кусками, не держа его целиком в памяти.
+    
+    Генератор можно передать прямо в requests как тело запроса —
+    тогда файл уходит дальше chunked-передачей по мере скачивания.
+    """
+    file_url = get_telegram_file_url(file_id)
+    with get_telegram_client().session.get(file_url, stream=True, timeout=DEFAULT_TIMEOUT) as file_response:
+        file_response.raise_for_status()
+        for chunk in file_response.iter_content(chunk_size=chunk_size):
+            if chunk:
+                yield chunk
+
+
 def get_telegram_file_url(file_id: str) -> str:
     """Получает публичный URL файла из Telegram.
     
@@ -43,16 +71,8 @@ def get_telegram_file_url(file_id: str) -> str:
     Returns:
         Публичный HTTPS URL файла
     """
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/getFile?file_id={file_id}"
-    response = requests.get(url, timeout=DEFAULT_TIMEOUT)
-    response.raise_for_status()
-    data = response.json()
-    
-    if 'result' not in data or 'file_path' not in data['result']:
-        raise ValueError(f"Не удалось получить путь к файлу: {data}")
-    
-    file_path = data['result']['file_path']
-    return f"https://api.telegram.org/file/bot{TELEGRAM_TOKEN}/{file_path}"
+    file_path = _get_telegram_file_path(file_id)
+    return f"{get_telegram_client().file_url}/{file_path}"
 
 
 def send_telegram_message(chat_id: str, text: str, use_html: bool = False, add_undo_button: bool = False, show_keyboard: bool = False, reply_to_message_id: int = None):
@@ -66,8 +86,6 @@ def send_telegram_message(chat_id: str, text: str, use_html: bool = False, add_u
         show_keyboard: Показать постоянную клавиатуру
         reply_to_message_id: ID сообщения, на которое нужно ответить
     """
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    
     payload = {
         'chat_id': chat_id,
         'text': text,
@@ -88,7 +106,7 @@ def send_telegram_message(chat_id: str, text: str, use_html: bool = False, add_u
         payload['reply_to_message_id'] = reply_to_message_id
 
     try:
-        requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT).raise_for_status()
+        get_telegram_client().call('sendMessage', payload, chat_id=chat_id, holdable=True)
     except Exception as e:
         print(f"Ошибка при отправке сообщения в Telegram: {e}")
 
@@ -104,8 +122,6 @@ def send_message_with_buttons(chat_id: str, text: str, inline_buttons: list, use
         use_html: Использовать HTML вместо Markdown
         reply_to_message_id: ID сообщения, на которое нужно ответить
     """
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
-    
     payload = {
         'chat_id': chat_id,
         'text': text,
@@ -117,25 +133,22 @@ def send_message_with_buttons(chat_id: str, text: str, inline_buttons: list, use
         payload['reply_to_message_id'] = reply_to_message_id
 
     try:
-        requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT).raise_for_status()
+        get_telegram_client().call('sendMessage', payload, chat_id=chat_id, holdable=True)
     except Exception as e:
         print(f"Ошибка при отправке сообщения с кнопками: {e}")
 
 
 def send_initial_status_message(chat_id: str, text: str):
     """Отправляет начальное сообщение и возвращает его ID для последующего редактирования."""
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
     payload = {'chat_id': chat_id, 'text': text, 'parse_mode': 'Markdown'}
     try:
-        response = requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
-        response.raise_for_status()
-        return response.json()['result']['message_id']
+        return get_telegram_client().call('sendMessage', payload, chat_id=chat_id)['result']['message_id']
     except Exception as e:
         print(f"Ошибка при отправке начального сообщения: {e}")
         return None
 
 
-def edit_telegram_message(chat_id: str, message_id: int, new_text: str, use_html: bool = False, add_undo_button: bool = False, inline_buttons: list = None):
+def edit_telegram_message(chat_id: str, message_id: int, new_text: str, use_html: bool = False, add_undo_button: bool = False, inline_buttons: list = None, wait: bool = True, hold: bool = True):
     """Редактирует существующее сообщение в Telegram.
     
     Args:
@@ -145,8 +158,9 @@ def edit_telegram_message(chat_id: str, message_id: int, new_text: str, use_html
         use_html: Использовать HTML вместо Markdown
         add_undo_button: Добавить только кнопку "Отменить" (устаревший параметр)
         inline_buttons: Список рядов inline-кнопок (приоритетнее add_undo_button)
+        wait: False — только поставить в очередь, не дожидаясь Telegram
+        hold: False — не откладывать правку до ответа webhook, а отправить через очередь чата
     """
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/editMessageText"
     payload = {
         'chat_id': chat_id,
         'message_id': message_id,
@@ -161,19 +175,244 @@ def edit_telegram_message(chat_id: str, message_id: int, new_text: str, use_html
         payload['reply_markup'] = json.dumps(keyboard)
     
     try:
-        requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT).raise_for_status()
+        if wait:
+            get_telegram_client().call('editMessageText', payload, chat_id=chat_id, holdable=hold)
+        else:
+            future = get_telegram_client().submit('editMessageText', payload, chat_id=chat_id)
+            future.add_done_callback(
+                lambda f: f.exception() and print(f"Ошибка при редактировании сообщения: {f.exception()}")
+            )
     except Exception as e:
         print(f"Ошибка при редактировании сообщения: {e}")
 
 
+def begin_webhook_reply():
+    """Начало обработки update: последний вызов можно будет вернуть в ответе webhook."""
+    get_telegram_client().begin_webhook_reply()
+
+
+def end_webhook_reply(chat_id=None) -> dict:
+    """Конец обработки update: дожидается отправки вызовов чата и возвращает
+    тело ответа webhook с отложенным вызовом или None."""
+    return get_telegram_client().end_webhook_reply(chat_id)
+
+
 def answer_callback_query(callback_query_id: str, text: str = None):
-    """Отвечает на callback query (убирает 'часики' на кнопке)."""
-    url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/answerCallbackQuery"
+    """Отвечает на callback query (убирает 'часики' на кнопке).
+    
+    Не ждёт ответа Telegram: обработчик кнопки сразу берётся за работу.
+    """
     payload = {'callback_query_id': callback_query_id}
     if text:
         payload['text'] = text
     try:
-        requests.post(url, json=payload, timeout=DEFAULT_TIMEOUT)
+        future = get_telegram_client().submit('answerCallbackQuery', payload)
+        future.add_done_callback(
+            lambda f: f.exception() and print(f"Ошибка при ответе на callback: {f.exception()}")
+        )
     except Exception as e:
         print(f"Ошибка при ответе на callback: {e}")
 
+
+
+def _find_break(text: str, start: int, hard_end: int) -> int:
+    """Ищет, где разрезать text[start:hard_end]: абзац → таймкод → строка → предложение → пробел."""
+    window = text[start:hard_end]
+    min_len = len(window) // 4  # Не режем так, чтобы получился огрызок
+
+    pos = window.rfind("\n\n")
+    if pos > min_len:
+        return start + pos
+    timecodes = [m.start() for m in _TIMECODE_LINE_RE.finditer(window)]
+    if timecodes and timecodes[-1] > min_len:
+        return start + timecodes[-1]
+    pos = window.rfind("\n")
+    if pos > min_len:
+        return start + pos
+    sentence_ends = [m.end() for m in _SENTENCE_END_RE.finditer(window)]
+    if sentence_ends and sentence_ends[-1] > min_len:
+        return start + sentence_ends[-1]
+    pos = window.rfind(" ")
+    if pos > min_len:
+        return start + pos
+    return hard_end
+
+
+def _markdown_state(piece: str, state: str) -> str:
+    """Какая сущность Markdown (*, _, `, ```) остаётся открытой после piece."""
+    i = 0
+    while i < len(piece):
+        if state in ('`', '```'):
+            if piece.startswith(state, i):
+                i += len(state)
+                state = None
+                continue
+        elif piece[i] == '\\':
+            i += 2
+            continue
+        elif state in ('*', '_'):
+            if piece[i] == state:
+                state = None
+        elif piece.startswith('```', i):
+            state = '```'
+            i += 3
+            continue
+        elif piece[i] in '*_`':
+            state = piece[i]
+        i += 1
+    return state
+
+
+def _html_state(piece: str, stack: list) -> list:
+    """Стек открытых HTML-тегов [(имя, открывающий тег)] после piece."""
+    stack = list(stack)
+    for match in _HTML_TAG_RE.finditer(piece):
+        name = match.group(2).lower()
+        if match.group(1):
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i][0] == name:
+                    del stack[i]
+                    break
+        elif not match.group(0).endswith('/>'):
+            stack.append((name, match.group(0)))
+    return stack
+
+
+def split_message(text: str, limit: int = TELEGRAM_MESSAGE_LIMIT, use_html: bool = False) -> list:
+    """Режет текст на сообщения не длиннее limit.
+
+    Границы — абзацы и строки с таймкодами [mm:ss], затем предложения и пробелы.
+    Разметка не ломается: открытая на границе сущность Markdown или HTML-тег
+    закрывается в конце куска и открывается заново в начале следующего.
+    """
+    # Запас под закрывающие теги/символы разметки
+    reserve = limit // 16 if use_html else 3
+    chunks = []
+    prefix = ""
+    md_state, html_stack = None, []
+    pos, n = 0, len(text)
+
+    while pos < n:
+        available = limit - len(prefix) - reserve
+        if n - pos <= limit - len(prefix):
+            end = n
+        else:
+            end = _find_break(text, pos, pos + available)
+            if use_html:
+                # Не режем внутри тега или HTML-сущности (&amp;)
+                tag_open = text.rfind('<', pos, end)
+                if tag_open > text.rfind('>', pos, end):
+                    end = tag_open
+                amp = text.rfind('&', max(pos, end - 10), end)
+                if amp != -1 and text.find(';', amp, end) == -1:
+                    end = amp
+                end = max(end, pos + 1)
+        piece = text[pos:end]
+
+        if use_html:
+            html_stack = _html_state(piece, html_stack)
+            closers = "".join(f"</{name}>" for name, _ in reversed(html_stack))
+            next_prefix = "".join(tag for _, tag in html_stack)
+        else:
+            md_state = _markdown_state(piece, md_state)
+            closers = next_prefix = md_state or ""
+
+        chunk = (prefix + piece.rstrip() + closers).strip()
+        if chunk:
+            chunks.append(chunk)
+        prefix = next_prefix
+
+        pos = end
+        while pos < n and text[pos].isspace():
+            pos += 1
+    return chunks
+
+
+def send_long_message(chat_id: str, text: str, inline_buttons: list = None, use_html: bool = False,
+                      reply_to_message_id: int = None, header: str = "", filename: str = "transcript.txt"):
+    """Отправляет текст любой длины.
+
+    До TRANSCRIPT_FILE_THRESHOLD символов — несколько сообщений подряд (кнопки на
+    последнем), длиннее — одним .txt-документом с header в подписи.
+    """
+    if len(header) + len(text) > TRANSCRIPT_FILE_THRESHOLD:
+        send_text_document(chat_id, [text], filename, caption=header.strip(), inline_buttons=inline_buttons,
+                           use_html=use_html, reply_to_message_id=reply_to_message_id)
+        return
+
+    chunks = split_message(header + text, use_html=use_html)
+    client = get_telegram_client()
+    futures = []
+    # Все части сразу в очередь: порядок внутри чата сохранит клиент
+    for i, chunk in enumerate(chunks):
+        payload = {
+            'chat_id': chat_id,
+            'text': chunk,
+            'parse_mode': 'HTML' if use_html else 'Markdown'
+        }
+        if i == 0 and reply_to_message_id:
+            payload['reply_to_message_id'] = reply_to_message_id
+        if i == len(chunks) - 1 and inline_buttons:
+            payload['reply_markup'] = json.dumps({"inline_keyboard": inline_buttons})
+        futures.append(client.submit('sendMessage', payload, chat_id=chat_id))
+    for i, future in enumerate(futures):
+        try:
+            future.result()
+        except Exception as e:
+            print(f"Ошибка при отправке части {i + 1}/{len(chunks)} длинного сообщения: {e}")
+
+
+def send_text_document(chat_id: str, parts: list, filename: str, caption: str = None, inline_buttons: list = None,
+                       use_html: bool = False, reply_to_message_id: int = None):
+    """Отправляет текст .txt-документом, кодируя и передавая его кусками.
+
+    Тело multipart собирается генератором: текст не копируется в одну
+    большую строку или bytes.
+
+    Args:
+        parts: Куски текста, которые идут в файл подряд
+    """
+    boundary = uuid.uuid4().hex
+
+    fields = {'chat_id': str(chat_id)}
+    if caption:
+        fields['caption'] = caption
+        fields['parse_mode'] = 'HTML' if use_html else 'Markdown'
+    if inline_buttons:
+        fields['reply_markup'] = json.dumps({"inline_keyboard": inline_buttons})
+    if reply_to_message_id:
+        fields['reply_to_message_id'] = str(reply_to_message_id)
+
+    head = "".join(
+        f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'
+        for name, value in fields.items()
+    )
+    head += (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="document"; filename="{filename}"\r\n'
+        f'Content-Type: text/plain; charset=utf-8\r\n\r\n'
+    )
+    head = head.encode('utf-8')
+    tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+
+    def text_slices():
+        for part in parts:
+            for i in range(0, len(part), DOCUMENT_TEXT_SLICE):
+                yield part[i:i + DOCUMENT_TEXT_SLICE].encode('utf-8')
+
+    def body():
+        yield head
+        yield from text_slices()
+        yield tail
+
+    # Длину считаем заранее, чтобы не уходить в chunked-передачу
+    content_length = len(head) + len(tail) + sum(len(chunk) for chunk in text_slices())
+    headers = {
+        'Content-Type': f'multipart/form-data; boundary={boundary}',
+        'Content-Length': str(content_length)
+    }
+    try:
+        # body() — генератор, поэтому при повторе после 429 собираем его заново
+        get_telegram_client().call('sendDocument', chat_id=chat_id,
+                                   build_kwargs=lambda: {'data': body(), 'headers': headers})
+    except Exception as e:
+        print(f"Ошибка при отправке документа в Telegram: {e}")
@@ -0,0 +1,368 @@
+# -*- coding: utf-8 -*-
+"""Клиент Telegram Bot API: общий пул соединений, лимиты Telegram и очередь отправки."""
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import TELEGRAM_TOKEN, DEFAULT_TIMEOUT, WEBHOOK_REPLY_HOLD, WEBHOOK_DRAIN_TIMEOUT
+
+# Лимиты Telegram: ~1 сообщение/сек в чат (короткие всплески допустимы),
+# ~30 сообщений/сек на бота, ~20 сообщений/мин в группу
+CHAT_RATE, CHAT_BURST = 1.0, 3
+GLOBAL_RATE, GLOBAL_BURST = 30.0, 30
+GROUP_RATE, GROUP_BURST = 20 / 60, 20
+MAX_RETRIES = 3          # Повторов после 429
+MAX_RETRY_AFTER = 30     # Дольше не ждём — пусть вызывающий код получит ошибку
+POOL_SIZE = 8
+
+
+class TelegramRetryAfter(Exception):
+    """Telegram ответил 429 Too Many Requests."""
+
+    def __init__(self, retry_after: float, response):
+        super().__init__(f"429 Too Many Requests, retry after {retry_after} s")
+        self.retry_after = retry_after
+        self.response = response
+
+
+class _TokenBucket:
+    """Лимитер «ведро токенов»: rate в секунду, до capacity подряд."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        """Сколько секунд ждать до свободного токена (0 — можно сейчас)."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float):
+        self._refill(now)
+        self.tokens -= 1
+
+
+class _Job:
+    __slots__ = ('method', 'build_kwargs', 'chat_id', 'future', 'attempts', 'queued_at')
+
+    def __init__(self, method, build_kwargs, chat_id):
+        self.method = method
+        self.build_kwargs = build_kwargs
+        self.chat_id = chat_id
+        self.future = Future()
+        self.attempts = 0
+        self.queued_at = time.monotonic()
+
+
+class _WebhookReply:
+    """Вызов, отложенный до ответа на webhook текущего update."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.held = None  # (method, payload, chat_id)
+        self.timer = None
+
+
+class TelegramClient:
+    """Все отправки и правки сообщений идут через одну очередь.
+
+    Диспетчер берёт из очереди первый вызов, который можно выполнить прямо
+    сейчас по лимитам, и отдаёт его в пул потоков. Вызовы одного чата
+    выполняются строго по очереди, так что сообщения не перемешиваются,
+    а занятый (или ждущий после 429) чат не задерживает остальные.
+    """
+
+    def __init__(self, token: str, pool_size: int = POOL_SIZE):
+        self.base_url = f"https://api.telegram.org/bot{token}"
+        self.file_url = f"https://api.telegram.org/file/bot{token}"
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._busy_chats = set()
+        self._running = 0  # Вызовов в работе (для drain)
+        self._running_unbound = 0  # Из них без chat_id (answerCallbackQuery и т. п.)
+        self._chat_limits = {}
+        self._hold_until = {}  # chat_id -> monotonic, после 429
+        self._global = _TokenBucket(GLOBAL_RATE, GLOBAL_BURST)
+        self._workers = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix='telegram')
+        self._dispatcher = None
+        self._local = threading.local()
+        self.metrics = {
+            'calls': {}, 'errors': 0, 'rate_limited': 0, 'retry_after_seconds': 0.0,
+            'queue_wait_seconds': 0.0, 'max_queue_wait': 0.0, 'webhook_replies': 0
+        }
+
+    # --- Публичный интерфейс ---
+
+    def submit(self, method: str, payload: dict = None, chat_id=None, build_kwargs=None) -> Future:
+        """Ставит вызов метода Bot API в очередь.
+
+        Args:
+            payload: JSON-параметры метода
+            chat_id: Чат для лимитов и порядка (None — только общий лимит)
+            build_kwargs: Вместо payload — функция, возвращающая kwargs для session.post
+                (для multipart; вызывается заново при каждом повторе)
+
+        Returns:
+            Future с JSON-ответом Telegram
+        """
+        # Всё, что отложено для ответа webhook, должно уйти раньше — порядок сообщений важен
+        reply = getattr(self._local, 'reply', None)
+        if reply is not None:
+            self._flush_held(reply)
+        if build_kwargs is None:
+            build_kwargs = lambda: {'json': payload}
+        return self._enqueue(method, build_kwargs, chat_id)
+
+    def _enqueue(self, method: str, build_kwargs, chat_id) -> Future:
+        # 123 и '123' — один и тот же чат
+        job = _Job(method, build_kwargs, str(chat_id) if chat_id is not None else None)
+        with self._cond:
+            self._queue.append(job)
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch_loop, name='telegram-dispatch', daemon=True)
+                self._dispatcher.start()
+            self._cond.notify_all()
+        return job.future
+
+    def call(self, method: str, payload: dict = None, chat_id=None, build_kwargs=None, holdable: bool = False) -> dict:
+        """Как submit, но ждёт результат. Ошибки пробрасываются.
+
+        holdable=True — результат не нужен вызывающему коду. Внутри
+        begin_webhook_reply() такой вызов откладывается: если за
+        WEBHOOK_REPLY_HOLD секунд не появится следующий, он уйдёт в ответе webhook.
+        """
+        reply = getattr(self._local, 'reply', None)
+        if holdable and reply is not None and build_kwargs is None:
+            self._flush_held(reply)
+            with reply.lock:
+                reply.held = (method, payload, chat_id)
+                # Долгая работа после статуса не должна задерживать сам статус
+                reply.timer = threading.Timer(WEBHOOK_REPLY_HOLD, self._flush_held, args=(reply,))
+                reply.timer.daemon = True
+                reply.timer.start()
+            return {'ok': True, 'result': None}
+        return self.submit(method, payload, chat_id, build_kwargs).result()
+
+    def begin_webhook_reply(self):
+        """Начинает обработку update в текущем потоке."""
+        self._local.reply = _WebhookReply()
+
+    def end_webhook_reply(self, chat_id=None) -> dict:
+        """Завершает обработку update.
+
+        Перед ответом ждёт (не дольше WEBHOOK_DRAIN_TIMEOUT), пока уйдут вызовы
+        чата из очереди и вызовы без чата: после ответа webhook serverless-функцию
+        могут заморозить, и неотправленное потерялось бы. Отложенный вызов
+        уходит в ответе — то есть после них.
+
+        Returns:
+            Тело ответа webhook {'method': ..., ...параметры} или None
+        """
+        reply = getattr(self._local, 'reply', None)
+        self._local.reply = None
+        if reply is None:
+            return None
+        with reply.lock:
+            held, reply.held = reply.held, None
+            if reply.timer:
+                reply.timer.cancel()
+        if not self.drain(timeout=WEBHOOK_DRAIN_TIMEOUT, chat_id=chat_id):
+            print(f"Очередь Telegram чата {chat_id} не опустела за {WEBHOOK_DRAIN_TIMEOUT} сек")
+        if held is None:
+            return None
+        method, payload, _ = held
+        with self._cond:
+            self.metrics['webhook_replies'] += 1
+        return dict(payload, method=method)
+
+    def _flush_held(self, reply: _WebhookReply):
+        """Отправляет отложенный вызов обычным путём (без ожидания результата)."""
+        # Ставим в очередь под блокировкой: end_webhook_reply() либо заберёт вызов
+        # себе, либо уже увидит его в очереди и дождётся отправки
+        with reply.lock:
+            held, reply.held = reply.held, None
+            if reply.timer:
+                reply.timer.cancel()
+                reply.timer = None
+            if held is None:
+                return
+            method, payload, chat_id = held
+            future = self._enqueue(method, lambda: {'json': payload}, chat_id)
+        future.add_done_callback(lambda f: f.exception() and print(f"Ошибка отложенного {method}: {f.exception()}"))
+
+    def request(self, method: str, payload: dict = None) -> dict:
+        """Запрос в обход очереди — для чтения (getFile и т. п.), с повтором после 429."""
+        for attempt in range(MAX_RETRIES + 1):
+            try:
+                return self._post(method, {'json': payload})
+            except TelegramRetryAfter as e:
+                if attempt == MAX_RETRIES or e.retry_after > MAX_RETRY_AFTER:
+                    raise requests.exceptions.HTTPError(str(e), response=e.response)
+                time.sleep(e.retry_after)
+
+    def drain(self, timeout: float = None, chat_id=None) -> bool:
+        """Ждёт, пока очередь опустеет и все вызовы завершатся (перед остановкой процесса).
+
+        Args:
+            chat_id: Ждать только вызовы этого чата и вызовы без чата
+                (None — всю очередь)
+
+        Returns:
+            True, если всё отправлено за timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while self._has_pending(chat_id):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(timeout=remaining)
+        return True
+
+    def _has_pending(self, chat_id) -> bool:
+        if chat_id is None:
+            return bool(self._queue or self._running)
+        chat_id = str(chat_id)
+        if chat_id in self._busy_chats or self._running_unbound:
+            return True
+        return any(job.chat_id in (chat_id, None) for job in self._queue)
+
+    def get_metrics(self) -> dict:
+        with self._cond:
+            metrics = dict(self.metrics, calls=dict(self.metrics['calls']))
+            metrics['queued'] = len(self._queue)
+        return metrics
+
+    # --- Внутреннее ---
+
+    def _post(self, method: str, kwargs: dict) -> dict:
+        kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+        response = self.session.post(f"{self.base_url}/{method}", **kwargs)
+        if response.status_code == 429:
+            try:
+                retry_after = response.json().get('parameters', {}).get('retry_after', 1)
+            except ValueError:
+                retry_after = 1
+            with self._cond:
+                self.metrics['rate_limited'] += 1
+                self.metrics['retry_after_seconds'] += retry_after
+            print(f"Telegram 429 на {method}: повтор через {retry_after} сек")
+            raise TelegramRetryAfter(retry_after, response)
+        response.raise_for_status()
+        return response.json()
+
+    def _limits_for(self, chat_id) -> list:
+        limits = self._chat_limits.get(chat_id)
+        if limits is None:
+            limits = [_TokenBucket(CHAT_RATE, CHAT_BURST)]
+            if str(chat_id).startswith('-'):  # Группы и каналы
+                limits.append(_TokenBucket(GROUP_RATE, GROUP_BURST))
+            self._chat_limits[chat_id] = limits
+        return limits
+
+    def _next_ready(self):
+        """Первый вызов, который можно выполнить сейчас, или (None, сколько ждать)."""
+        now = time.monotonic()
+        earliest = None
+        seen_chats = set()
+        global_delay = self._global.delay(now)
+        for job in self._queue:
+            chat_id = job.chat_id
+            if chat_id is not None:
+                # Только первый вызов чата и только если предыдущий уже завершён
+                if chat_id in seen_chats or chat_id in self._busy_chats:
+                    seen_chats.add(chat_id)
+                    continue
+                seen_chats.add(chat_id)
+                limits = self._limits_for(chat_id)
+                delay = max([global_delay, self._hold_until.get(chat_id, 0) - now] + [l.delay(now) for l in limits])
+            else:
+                limits = []
+                delay = max(global_delay, self._hold_until.get(None, 0) - now)
+            if delay <= 0:
+                self._queue.remove(job)
+                self._global.take(now)
+                for limit in limits:
+                    limit.take(now)
+                if chat_id is not None:
+                    self._busy_chats.add(chat_id)
+                return job, None
+            earliest = delay if earliest is None else min(earliest, delay)
+        return None, earliest
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                job, wait = self._next_ready()
+                if job is None:
+                    self._cond.wait(timeout=wait)
+                    continue
+                queue_wait = time.monotonic() - job.queued_at
+                self.metrics['queue_wait_seconds'] += queue_wait
+                self.metrics['max_queue_wait'] = max(self.metrics['max_queue_wait'], queue_wait)
+                self._running += 1
+                if job.chat_id is None:
+                    self._running_unbound += 1
+            self._workers.submit(self._run, job)
+
+    def _run(self, job: _Job):
+        requeued = False
+        try:
+            with self._cond:
+                calls = self.metrics['calls']
+                calls[job.method] = calls.get(job.method, 0) + 1
+            job.future.set_result(self._post(job.method, job.build_kwargs()))
+        except TelegramRetryAfter as e:
+            job.attempts += 1
+            if job.attempts > MAX_RETRIES or e.retry_after > MAX_RETRY_AFTER:
+                with self._cond:
+                    self.metrics['errors'] += 1
+                job.future.set_exception(requests.exceptions.HTTPError(str(e), response=e.response))
+            else:
+                with self._cond:
+                    self._hold_until[job.chat_id] = time.monotonic() + e.retry_after
+                    self._busy_chats.discard(job.chat_id)
+                    # Обратно в начало: порядок сообщений чата сохраняется
+                    self._queue.appendleft(job)
+                    self._cond.notify_all()
+                requeued = True
+        except Exception as e:
+            with self._cond:
+                self.metrics['errors'] += 1
+            job.future.set_exception(e)
+        finally:
+            with self._cond:
+                self._running -= 1
+                if job.chat_id is None:
+                    self._running_unbound -= 1
+                if not requeued:
+                    self._busy_chats.discard(job.chat_id)
+                self._cond.notify_all()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_telegram_client() -> TelegramClient:
+    """Общий клиент на процесс."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = TelegramClient(TELEGRAM_TOKEN)
+    return _client
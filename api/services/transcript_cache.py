@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""Кэш готовых транскриптов по file_unique_id Telegram.
+
+Пересланное голосовое или повторно отправленный файл имеют тот же
+file_unique_id — такие аудио не распознаём заново. Хранится в SQLite:
+текст и тайминги слов в компактном виде, сжатые zlib, с вытеснением
+давно не использованных записей (LRU).
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+from utils.config import LOCAL_DB_PATH, TRANSCRIPT_CACHE_MAX_ENTRIES
+
+_lock = threading.Lock()
+_initialized = False
+
+
+def _connect() -> sqlite3.Connection:
+    global _initialized
+    conn = sqlite3.connect(LOCAL_DB_PATH, timeout=5)
+    if not _initialized:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS transcript_cache ("
+            " file_unique_id TEXT PRIMARY KEY,"
+            " payload BLOB NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS transcript_cache_lru ON transcript_cache (last_used)")
+        _initialized = True
+    return conn
+
+
+def _pack(transcript_data: dict) -> bytes:
+    # Из слов AssemblyAI нужны только текст и тайминги: [[text, start, end], ...]
+    words = [[w.get('text', ''), w.get('start'), w.get('end')] for w in transcript_data.get('words') or []]
+    payload = {'text': transcript_data.get('text', ''), 'words': words}
+    return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(blob: bytes) -> dict:
+    payload = json.loads(zlib.decompress(blob).decode('utf-8'))
+    return {
+        'status': 'completed',
+        'text': payload['text'],
+        'words': [{'text': t, 'start': s, 'end': e} for t, s, e in payload['words']]
+    }
+
+
+def get_cached_transcript(file_unique_id: str) -> dict:
+    """Возвращает транскрипт из кэша в формате fetch_transcription или None."""
+    if not file_unique_id:
+        return None
+    try:
+        with _lock:
+            conn = _connect()
+            try:
+                row = conn.execute(
+                    "SELECT payload FROM transcript_cache WHERE file_unique_id = ?", (file_unique_id,)
+                ).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    "UPDATE transcript_cache SET last_used = ? WHERE file_unique_id = ?", (time.time(), file_unique_id)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+        print(f"Транскрипт {file_unique_id} взят из кэша.")
+        return _unpack(row[0])
+    except Exception as e:
+        # Кэш — только ускорение: при любой ошибке распознаём как обычно
+        print(f"Ошибка чтения кэша транскриптов: {e}")
+        return None
+
+
+def put_cached_transcript(file_unique_id: str, transcript_data: dict):
+    """Сохраняет готовый транскрипт и вытесняет самые старые записи сверх лимита."""
+    if not file_unique_id or not transcript_data or transcript_data.get('status') != 'completed':
+        return
+    try:
+        blob = _pack(transcript_data)
+        with _lock:
+            conn = _connect()
+            try:
+                conn.execute(
+                    "INSERT OR REPLACE INTO transcript_cache (file_unique_id, payload, last_used) VALUES (?, ?, ?)",
+                    (file_unique_id, blob, time.time())
+                )
+                conn.execute(
+                    "DELETE FROM transcript_cache WHERE file_unique_id NOT IN ("
+                    " SELECT file_unique_id FROM transcript_cache ORDER BY last_used DESC LIMIT ?)",
+                    (TRANSCRIPT_CACHE_MAX_ENTRIES,)
+                )
+                conn.commit()
+            finally:
+                conn.close()
+    except Exception as e:
+        print(f"Ошибка записи в кэш транскриптов: {e}")
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""Общий asyncio-цикл в фоновом потоке и пулы соединений httpx.
+
+Поток, ждущий ответ API через requests, занят целиком. Корутины на общем цикле
+ждут сотнями одновременно, а потоков на это не нужно. Синхронный код запускает
+корутину через submit() (возвращает concurrent.futures.Future).
+"""
+import asyncio
+import threading
+
+import httpx
+
+from utils.config import DEFAULT_TIMEOUT, AIO_MAX_CONNECTIONS
+
+_lock = threading.Lock()
+_loop = None
+_thread = None
+_clients = {}  # base_url -> httpx.AsyncClient (используется только из потока цикла)
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Цикл событий процесса; запускается при первом обращении."""
+    global _loop, _thread
+    if _loop is None:
+        with _lock:
+            if _loop is None:
+                loop = asyncio.new_event_loop()
+                _thread = threading.Thread(target=loop.run_forever, name='aio-loop', daemon=True)
+                _thread.start()
+                _loop = loop
+    return _loop
+
+
+def submit(coro):
+    """Запускает корутину на общем цикле. Returns: concurrent.futures.Future."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def get_client(base_url: str) -> httpx.AsyncClient:
+    """Общий клиент (пул keep-alive соединений) на хост. Вызывать из корутины."""
+    client = _clients.get(base_url)
+    if client is None:
+        client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(DEFAULT_TIMEOUT[1], connect=DEFAULT_TIMEOUT[0]),
+            limits=httpx.Limits(max_connections=AIO_MAX_CONNECTIONS, max_keepalive_connections=AIO_MAX_CONNECTIONS)
+        )
+        _clients[base_url] = client
+    return client
+
+
+async def _close_clients():
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.aclose()
+
+
+def shutdown(timeout: float = 5):
+    """Закрывает соединения и останавливает цикл (при остановке процесса)."""
+    global _loop, _thread
+    with _lock:
+        loop, thread = _loop, _thread
+        _loop = _thread = None
+    if loop is None:
+        return
+    try:
+        asyncio.run_coroutine_threadsafe(_close_clients(), loop).result(timeout)
+    except Exception as e:
+        print(f"Ошибка закрытия async-клиентов: {e}")
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout)
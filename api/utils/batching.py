@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Группировка близких по времени запросов с одинаковым ключом."""
+import threading
+import time
+
+
+class KeyedBatcher:
+    """Собирает элементы с одним ключом, пришедшие в пределах окна.
+
+    Первый вызов submit() для ключа становится «лидером»: ждёт, пока
+    в течение window секунд не перестанут приходить новые элементы
+    (но не дольше max_wait), и получает всю пачку. Остальные вызовы
+    сразу получают None — их элементы обработает лидер.
+
+    Работает в пределах одного процесса: в serverless каждый update приходит
+    в свой инстанс, и каждый вызов просто ждёт окно со своей пачкой из одного
+    элемента. Для группировки между процессами — job_queue.enqueue_grouped_job.
+    """
+
+    def __init__(self, window: float, max_wait: float = None, max_items: int = 20):
+        self.window = window
+        self.max_wait = max_wait if max_wait is not None else window * 4
+        self.max_items = max_items
+        self._lock = threading.Lock()
+        self._full = threading.Condition(self._lock)  # Будит лидера, когда пачка набрана
+        self._pending = {}
+
+    def submit(self, key, item) -> list:
+        """Добавляет элемент в пачку ключа.
+
+        Returns:
+            Список элементов пачки (в порядке поступления) для лидера, иначе None
+        """
+        now = time.monotonic()
+        with self._lock:
+            batch = self._pending.get(key)
+            if batch is not None and len(batch['items']) < self.max_items:
+                batch['items'].append(item)
+                batch['deadline'] = min(now + self.window, batch['started'] + self.max_wait)
+                if len(batch['items']) >= self.max_items:
+                    self._full.notify_all()
+                return None
+            # Новая пачка (или прошлая переполнена — она уйдёт своему лидеру как есть)
+            batch = {'items': [item], 'started': now, 'deadline': now + self.window}
+            self._pending[key] = batch
+
+        with self._lock:
+            while True:
+                remaining = batch['deadline'] - time.monotonic()
+                if remaining <= 0 or len(batch['items']) >= self.max_items:
+                    if self._pending.get(key) is batch:
+                        del self._pending[key]
+                    return list(batch['items'])
+                self._full.wait(min(remaining, self.window))
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""Утилиты для параллельного выполнения I/O-задач."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+def parallel_map(func, items, max_workers: int = 4) -> list:
+    """Применяет func к каждому элементу в пуле потоков.
+
+    Порядок результатов совпадает с порядком items. Исключение из любой
+    задачи пробрасывается вызывающему коду.
+    """
+    items = list(items)
+    if len(items) <= 1:
+        return [func(item) for item in items]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        return list(pool.map(func, items))
+
+
+def run_parallel(*calls) -> list:
+    """Выполняет независимые вызовы без аргументов одновременно.
+
+    Возвращает их результаты в том же порядке; время — как у самого
+    медленного вызова, а не сумма.
+    """
+    return parallel_map(lambda call: call(), calls, max_workers=len(calls) or 1)
+
+
+class TaskGraph:
+    """Граф зависимых задач на ограниченном пуле потоков.
+
+    Задача запускается, как только готовы её зависимости, и получает их
+    результаты позиционными аргументами (deps, затем optional_deps).
+    Если зависимость из deps упала, задача не выполняется и считается
+    упавшей с той же ошибкой; упавшая optional-зависимость передаётся как None.
+
+    run() ждёт только критичные задачи (critical=True) — остальные
+    (индексация и т. п.) продолжают работать в фоне до wait().
+    """
+
+    def __init__(self, max_workers: int = 4):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='task-graph')
+        self._tasks = {}
+        self._pending = set()
+        self._cond = threading.Condition()
+        self._started = False
+        self.results = {}
+        self.errors = {}
+
+    def add(self, name: str, func, deps=(), optional_deps=(), critical: bool = True) -> str:
+        """Добавляет задачу. Зависимости должны быть добавлены раньше (так граф не может зациклиться)."""
+        if self._started:
+            raise RuntimeError("Граф уже запущен")
+        if name in self._tasks:
+            raise ValueError(f"Задача {name} уже есть в графе")
+        for dep in (*deps, *optional_deps):
+            if dep not in self._tasks:
+                raise ValueError(f"Неизвестная зависимость {dep} у задачи {name}")
+        self._tasks[name] = {
+            'func': func,
+            'deps': tuple(deps),
+            'optional_deps': tuple(optional_deps),
+            'critical': critical,
+            'waiting': set(deps) | set(optional_deps)
+        }
+        self._pending.add(name)
+        return name
+
+    def _execute(self, name: str):
+        task = self._tasks[name]
+        failed_dep = next((dep for dep in task['deps'] if dep in self.errors), None)
+        result, error = None, None
+        if failed_dep is not None:
+            error = self.errors[failed_dep]
+        else:
+            args = [self.results[dep] for dep in task['deps']]
+            args += [self.results.get(dep) for dep in task['optional_deps']]
+            try:
+                result = task['func'](*args)
+            except Exception as e:
+                print(f"Задача {name} упала: {e}")
+                error = e
+
+        ready = []
+        with self._cond:
+            if error is None:
+                self.results[name] = result
+            else:
+                self.errors[name] = error
+            self._pending.discard(name)
+            for other_name, other in self._tasks.items():
+                if name in other['waiting']:
+                    other['waiting'].discard(name)
+                    if not other['waiting']:
+                        ready.append(other_name)
+            self._cond.notify_all()
+        for other_name in ready:
+            self._pool.submit(self._execute, other_name)
+
+    def run(self, timeout: float = None) -> dict:
+        """Запускает граф и ждёт критичные задачи.
+
+        Returns:
+            {имя: результат} успешно выполненных задач; ошибки — в self.errors
+        """
+        self._started = True
+        # Корни выбираем до запуска: иначе готовая задача может запустить зависимую, а цикл — ещё раз
+        roots = [name for name, task in self._tasks.items() if not task['waiting']]
+        for name in roots:
+            self._pool.submit(self._execute, name)
+        with self._cond:
+            self._cond.wait_for(
+                lambda: not any(self._tasks[name]['critical'] for name in self._pending), timeout
+            )
+            return dict(self.results)
+
+    def wait(self, timeout: float = None):
+        """Ждёт все задачи, включая фоновые, и освобождает пул."""
+        with self._cond:
+            self._cond.wait_for(lambda: not self._pending, timeout)
+        self._pool.shutdown(wait=False)
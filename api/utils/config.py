@@ -5,6 +5,7 @@ import os
 # --- Константы для надежности ---
 DEFAULT_TIMEOUT = (5, 30)  # (connect_timeout, read_timeout) в секундах
 MAX_POLLING_ATTEMPTS = 60  # Максимум попыток опроса (2 минуты при 2 сек паузе)
+POLLING_MAX_WAIT = MAX_POLLING_ATTEMPTS * 2  # Общий бюджет ожидания опроса, сек (паузы растут от 1 до 6 сек)
 USER_TIMEZONE = os.getenv('USER_TIMEZONE', 'Europe/Kyiv')
 
 # --- Валидация переменных окружения ---
@@ -29,6 +30,9 @@ GOOGLE_CREDENTIALS_JSON = os.getenv('GOOGLE_CREDENTIALS_JSON')
 GOOGLE_CALENDAR_ID = os.getenv('GOOGLE_CALENDAR_ID')
 ALLOWED_TELEGRAM_ID = os.getenv('ALLOWED_TELEGRAM_ID')
 ASSEMBLYAI_API_KEY = os.getenv('ASSEMBLYAI_API_KEY')
+# Если задан — AssemblyAI сам сообщит о готовности на этот URL (…/api/assemblyai-webhook), без опроса
+ASSEMBLYAI_WEBHOOK_URL = os.getenv('ASSEMBLYAI_WEBHOOK_URL')
+ASSEMBLYAI_WEBHOOK_SECRET = os.getenv('ASSEMBLYAI_WEBHOOK_SECRET', '')
 OPENAI_API_KEY = os.getenv('OPENAI_API_KEY')
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY')
 PINECONE_HOST = os.getenv('PINECONE_HOST')
@@ -36,6 +40,88 @@ CLICKUP_API_TOKEN = os.getenv('CLICKUP_API_TOKEN')
 CLICKUP_TEAM_ID = os.getenv('CLICKUP_TEAM_ID', '24387826')
 CLICKUP_USER_ID = os.getenv('CLICKUP_USER_ID', '93710556')
 
+# --- AI (OpenAI) ---
+AI_MAX_PARALLEL = int(os.getenv('AI_MAX_PARALLEL', '4'))  # Максимум параллельных запросов к OpenAI
+AI_MODEL = os.getenv('AI_MODEL', 'gpt-5.4-nano')  # Быстрая модель: короткие заметки, поиск, чистка
+AI_MODEL_STRONG = os.getenv('AI_MODEL_STRONG', 'gpt-5.4-mini')  # Резюме и длинные тексты (см. llm_router.TASK_ROUTES)
+AI_FALLBACK_MODEL = os.getenv('AI_FALLBACK_MODEL', 'gpt-5.4-mini')  # Запасная при таймауте/5xx
+# Общий бюджет одного AI-вызова вместе с hedge и запасной моделью, сек (меньше лимита serverless-функции)
+AI_CALL_DEADLINE = float(os.getenv('AI_CALL_DEADLINE', '50'))
+AI_HEDGING = os.getenv('AI_HEDGING', 'true').lower() == 'true'  # Дублировать запрос после p95 задержки
+TRANSCRIPT_CHUNK_CHARS = int(os.getenv('TRANSCRIPT_CHUNK_CHARS', '6000'))  # Длиннее — режем на части (map-reduce)
+# Один AI-запрос на транскрипт: чистый текст + резюме + заголовок + категория
+TRANSCRIPT_COMBINED = os.getenv('TRANSCRIPT_COMBINED', 'false').lower() == 'true'
+
+# --- Транскрибация (AssemblyAI) ---
+# Как аудио попадает в AssemblyAI:
+#   stream — потоком из Telegram в /v2/upload, без буфера в памяти (по умолчанию)
+#   direct — AssemblyAI сам скачивает файл по URL Telegram (URL содержит токен бота!)
+#   buffer — скачать целиком, затем загрузить (старое поведение)
+ASSEMBLYAI_AUDIO_INGEST = os.getenv('ASSEMBLYAI_AUDIO_INGEST', 'stream').lower()
+# Модели AssemblyAI: быстрая для коротких голосовых, точная для длинных записей
+SPEECH_MODEL_FAST = os.getenv('SPEECH_MODEL_FAST', 'nano')
+SPEECH_MODEL_ACCURATE = os.getenv('SPEECH_MODEL_ACCURATE', 'best')
+# Окно, в котором аудио одного чата в режиме «Поток» собираются в одну пачку, сек
+TRANSCRIPT_BATCH_WINDOW = float(os.getenv('TRANSCRIPT_BATCH_WINDOW', '1.5'))
+
+# --- Telegram ---
+# Сколько держать последний вызов Bot API, чтобы вернуть его в ответе webhook, сек
+WEBHOOK_REPLY_HOLD = float(os.getenv('WEBHOOK_REPLY_HOLD', '0.5'))
+# Сколько ждать отправки очереди чата перед ответом webhook (serverless), сек
+WEBHOOK_DRAIN_TIMEOUT = float(os.getenv('WEBHOOK_DRAIN_TIMEOUT', '5'))
+TRANSCRIPT_FILE_THRESHOLD = int(os.getenv('TRANSCRIPT_FILE_THRESHOLD', '12000'))  # Длиннее — отправляем .txt-файлом, а не сообщениями
+
+# --- Конвейер заметок ---
+PIPELINE_MAX_PARALLEL = int(os.getenv('PIPELINE_MAX_PARALLEL', '4'))  # Параллельных записей (Notion, календарь) на одну заметку
+# Окно, в котором фото одного альбома (media_group_id) собираются в одну заметку, сек.
+# Альбомы собираются ТОЛЬКО при FAST_ACK=true: альбом копится в задаче очереди.
+# На Vercel (без FAST_ACK) фото альбома приходят в разные вызовы функции, часто в разные
+# инстансы без общего /tmp, поэтому каждое фото обрабатывается отдельно: фото с подписью
+# создаёт заметку, остальные добавляются к последней заметке
+ALBUM_BATCH_WINDOW = float(os.getenv('ALBUM_BATCH_WINDOW', '1.0'))
+
+# --- Local storage ---
+# SQLite для локальных кэшей. На Vercel /tmp живёт, пока жив инстанс функции
+LOCAL_DB_PATH = os.getenv('LOCAL_DB_PATH', '/tmp/dany.sqlite3')
+TRANSCRIPT_CACHE_MAX_ENTRIES = int(os.getenv('TRANSCRIPT_CACHE_MAX_ENTRIES', '500'))
+
+# Сколько помнить обработанные доставки webhook (Telegram повторяет update до суток)
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))
+# Сколько доставка считается «в работе»: если процесс упал, повтор пройдёт после этого срока
+IDEMPOTENCY_LEASE = int(os.getenv('IDEMPOTENCY_LEASE', '300'))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', '10000'))
+
+# --- Background jobs ---
+# Быстрый ответ webhook: update кладётся в очередь (SQLite), обработка — в фоновых воркерах.
+# Нужен долгоживущий процесс: в serverless-функции фоновые потоки замораживаются после ответа.
+# Обязателен для сборки альбомов в одну заметку (см. ALBUM_BATCH_WINDOW)
+FAST_ACK = os.getenv('FAST_ACK', 'false').lower() == 'true'
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '2'))  # Сколько задач выполняется одновременно
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', '3'))  # После стольких падений — в dead-letter
+JOB_LEASE_SECONDS = int(os.getenv('JOB_LEASE_SECONDS', '900'))  # Задача «зависла», если не завершилась за это время
+
+# --- Быстрая запись ---
+# Заметка сразу сохраняется в Notion сырым текстом, AI-оформление (заголовок, категория, события) — следом
+FAST_CAPTURE_MODE = os.getenv('FAST_CAPTURE_MODE', 'false').lower() == 'true'
+FAST_CAPTURE_CATEGORY = 'Быстрая заметка'  # Категория до AI-обработки
+FAST_CAPTURE_TITLE_CHARS = 60  # Длина временного заголовка из начала текста
+
+# --- HTTP ---
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', '16'))  # Соединений на хост в общем пуле
+# При холодном старте заранее открывать TLS-соединения к Telegram, Notion и OpenAI (в фоне, параллельно)
+WARMUP_CONNECTIONS = os.getenv('WARMUP_CONNECTIONS', 'true').lower() == 'true'
+
+# --- Server (server.py: все точки входа в одном долгоживущем процессе) ---
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_PORT = int(os.getenv('PORT', '8000'))
+SERVER_MAX_CONCURRENCY = int(os.getenv('SERVER_MAX_CONCURRENCY', '16'))  # Запросов в обработке одновременно
+SERVER_QUEUE_TIMEOUT = float(os.getenv('SERVER_QUEUE_TIMEOUT', '10'))  # Сколько запрос ждёт слот, потом 503
+SERVER_SHUTDOWN_TIMEOUT = float(os.getenv('SERVER_SHUTDOWN_TIMEOUT', '25'))  # Дожидаться работы после SIGTERM, сек
+
+# --- Async (services/aio.py: общий цикл событий в долгоживущем процессе) ---
+AIO_MAX_CONNECTIONS = int(os.getenv('AIO_MAX_CONNECTIONS', '100'))  # Соединений на хост в async-пуле
+AIO_MAX_INFLIGHT_JOBS = int(os.getenv('AIO_MAX_INFLIGHT_JOBS', '200'))  # Async-задач очереди в работе одновременно
+
 # --- Маппинг категорий ---
 CATEGORY_EMOJI_MAP = {
     "Задача": "✅",
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+"""Локальное удаление слов-заполнителей (RU/UK) из транскриптов."""
+import re
+
+# Всегда мусор: междометия-паузы и «ну»-связки
+UNAMBIGUOUS_FILLERS = [
+    "как бы это сказать", "ну вот", "ну типа", "ну короче", "так сказать",
+    "э+", "е{3,}", "а{3,}", "эм+", "хм+",
+]
+
+# Могут быть значимыми словами («вот дом», «это значит», «смотри фильм»,
+# «5 мм», «съел блин», «ну и что?»).
+# Удаляются только когда выделены пунктуацией как вводные.
+AMBIGUOUS_FILLERS = [
+    "в общем", "то есть", "как бы", "типа", "короче", "собственно",
+    "значит", "вот", "слушай", "смотри", "ну", "блин", "блін", "м{2,}",
+    "загалом", "тобто", "як би", "типу", "коротше", "власне",
+    "значить", "ось", "слухай", "дивись", "ніби",
+]
+
+# Доля неразрешённых неоднозначных заполнителей, после которой нужен AI
+AMBIGUITY_THRESHOLD = 0.01
+
+_TIMECODE_RE = re.compile(r'(\[\d{2,}:\d{2}\])')
+_BOUNDARY_BEFORE = re.compile(r'(?:^|[,.!?…:;—–-])\s*$')
+_BOUNDARY_AFTER = re.compile(r'^\s*(?:$|[,.!?…:;—–-])')
+_SENTENCE_START = re.compile(r'(?:^|[.!?…])\s*$')
+
+
+def _compile(words: list) -> re.Pattern:
+    # Длинные фразы первыми, чтобы «ну вот» не разбивалось на «ну» + «вот»
+    ordered = sorted(words, key=len, reverse=True)
+    alternatives = "|".join(w.replace(" ", r"\s+") for w in ordered)
+    return re.compile(rf"(?<![\w-])(?:{alternatives})(?![\w-])", re.IGNORECASE)
+
+
+_UNAMBIGUOUS_RE = _compile(UNAMBIGUOUS_FILLERS)
+_AMBIGUOUS_RE = _compile(AMBIGUOUS_FILLERS)
+_CAPITALIZE_MARK = "\x00"
+
+
+def _strip_segment(segment: str, stats: dict) -> str:
+    """Чистит кусок текста между таймкодами."""
+
+    def remove(match, ambiguous: bool):
+        before = match.string[:match.start()]
+        after = match.string[match.end():]
+        if ambiguous and not (_BOUNDARY_BEFORE.search(before) and _BOUNDARY_AFTER.match(after)):
+            stats['unresolved'] += 1
+            return match.group(0)
+        stats['removed'] += 1
+        # Заполнитель начинал предложение с заглавной — перенесём заглавную на следующее слово
+        if match.group(0)[0].isupper() and _SENTENCE_START.search(before):
+            return _CAPITALIZE_MARK
+        return ""
+
+    text = _UNAMBIGUOUS_RE.sub(lambda m: remove(m, False), segment)
+    text = _AMBIGUOUS_RE.sub(lambda m: remove(m, True), text)
+    return text
+
+
+def _tidy(text: str) -> str:
+    """Убирает пунктуационные хвосты, оставшиеся после удаления слов."""
+    text = re.sub(r'[ \t]*,(?:[ \t]*,)+', ',', text)                       # «, ,» → «,»
+    # Запятая в начале предложения, абзаца или после таймкода [mm:ss]
+    text = re.sub(rf'([.!?…]|^|{_CAPITALIZE_MARK}|\[\d{{2,}}:\d{{2}}\])[ \t]*,[ \t]*', r'\1 ', text,
+                  flags=re.MULTILINE)
+    text = re.sub(r'([ \t]+[—–])(?:[ \t]+[—–])+', r'\1', text)              # «— —» → «—»
+    text = re.sub(r',[ \t]*([.!?…])', r'\1', text)                         # «, .» → «.»
+    text = re.sub(r'[ \t]+([,.!?…])', r'\1', text)
+    text = re.sub(rf'{_CAPITALIZE_MARK}[\s{_CAPITALIZE_MARK}]*(\w)', lambda m: m.group(1).upper(), text)
+    text = text.replace(_CAPITALIZE_MARK, "")
+    text = re.sub(r'[ \t]{2,}', ' ', text)
+    return re.sub(r'^[ \t]+|[ \t]+$', '', text, flags=re.MULTILINE)
+
+
+def strip_fillers(text: str) -> tuple:
+    """Удаляет слова-заполнители без обращения к AI.
+
+    Таймкоды [mm:ss] не трогаются. Неоднозначные слова удаляются, только
+    если они выделены запятыми/границами предложения.
+
+    Returns:
+        (очищенный текст, число неоднозначных слов, оставленных как есть)
+    """
+    stats = {'removed': 0, 'unresolved': 0}
+    pieces = _TIMECODE_RE.split(text)
+    for i, piece in enumerate(pieces):
+        if i % 2 == 0:  # чётные — текст, нечётные — таймкоды
+            pieces[i] = _strip_segment(piece, stats)
+    cleaned = _tidy("".join(pieces))
+    return cleaned, stats['unresolved']
+
+
+def needs_ai_cleanup(text: str, unresolved: int) -> bool:
+    """Эвристика неоднозначности: стоит ли дочищать текст через AI."""
+    if not unresolved:
+        return False
+    words = max(len(text.split()), 1)
+    return unresolved / words > AMBIGUITY_THRESHOLD
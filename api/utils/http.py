@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Общий HTTP-пул для запросов к Notion, OpenAI, AssemblyAI, ClickUp.
+
+requests.post() без сессии каждый раз открывает новое TCP+TLS-соединение;
+общая сессия держит их открытыми между запросами и потоками.
+"""
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from utils.config import HTTP_POOL_SIZE
+from utils.concurrency import parallel_map
+
+# Хосты, к которым бот обращается почти на каждом update
+WARMUP_URLS = (
+    "https://api.notion.com/v1/",
+    "https://api.openai.com/v1/",
+)
+WARMUP_TIMEOUT = 3
+
+
+def _make_session() -> requests.Session:
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount('https://', adapter)
+    return session
+
+
+http_session = _make_session()
+
+
+def _warm(target: tuple):
+    session, url = target
+    try:
+        # Ответ не важен (обычно 401/404) — важно, что соединение осталось в пуле
+        session.head(url, timeout=WARMUP_TIMEOUT)
+    except requests.RequestException as e:
+        print(f"Прогрев {url} не удался: {e}")
+
+
+def warm_connections(extra: list = None):
+    """Открывает соединения к основным API параллельно.
+
+    Args:
+        extra: Дополнительные пары (session, url) — например, сессия клиента Telegram
+    """
+    targets = [(http_session, url) for url in WARMUP_URLS] + list(extra or [])
+    parallel_map(_warm, targets, max_workers=len(targets))
+
+
+def start_connection_warmup(extra: list = None) -> threading.Thread:
+    """Прогрев в фоновом потоке: инициализация модуля не ждёт сети."""
+    thread = threading.Thread(target=warm_connections, args=(extra,), name='http-warmup', daemon=True)
+    thread.start()
+    return thread
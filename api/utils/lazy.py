@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Ленивые прокси: тяжёлый модуль или клиент создаётся при первом обращении.
+
+Холодный старт serverless-функции не должен платить за googleapiclient,
+pinecone и openai, если update их не трогает (нажатие кнопки, команда).
+"""
+import importlib
+import threading
+
+
+class LazyProxy:
+    """Объект, который создаётся factory() при первом доступе к атрибуту."""
+
+    def __init__(self, factory, name: str):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_target', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _resolve(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                target = self._target
+                if target is None:
+                    target = self._factory()
+                    object.__setattr__(self, '_target', target)
+        return target
+
+    def __getattr__(self, attr):
+        return getattr(self._resolve(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._resolve(), attr, value)
+
+    def __repr__(self):
+        state = 'loaded' if self._target is not None else 'not loaded'
+        return f"<lazy {self._name} ({state})>"
+
+
+def lazy_import(module_name: str, on_load=None) -> LazyProxy:
+    """Модуль, импортируемый при первом обращении.
+
+    Args:
+        on_load: Функция on_load(module) — настройка модуля сразу после импорта
+    """
+    def load():
+        module = importlib.import_module(module_name)
+        if on_load:
+            on_load(module)
+        return module
+    return LazyProxy(load, module_name)
+
+
+def lazy_object(factory, name: str = None) -> LazyProxy:
+    """Объект (клиент, индекс), создаваемый factory() при первом обращении."""
+    return LazyProxy(factory, name or getattr(factory, '__name__', 'object'))
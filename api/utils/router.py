@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""Табличная маршрутизация: точные ключи — словарь, префиксы — trie."""
+import importlib
+import threading
+import time
+
+# Границы корзин гистограммы времени обработки, сек (последняя корзина — всё, что дольше)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SLOW_ROUTE_SECONDS = 5.0  # Дольше — пишем в лог
+
+
+class _Route:
+    """Маршрут: обработчик (функция или строка 'модуль:функция') и его статистика."""
+
+    def __init__(self, name: str, target):
+        self.name = name
+        self.target = target
+        self.func = target if callable(target) else None
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+
+    def resolve(self):
+        """Загружает обработчик при первом вызове маршрута."""
+        if self.func is None:
+            module_name, func_name = self.target.split(':')
+            self.func = getattr(importlib.import_module(module_name), func_name)
+        return self.func
+
+
+class Router:
+    """Находит обработчик по ключу (callback_data, текст команды и т. п.).
+
+    Сначала ищется точное совпадение (O(1)), затем самый длинный
+    зарегистрированный префикс — проход по trie за O(длины ключа).
+    Обработчику передаётся остаток ключа после префикса. Модули
+    обработчиков импортируются только при первом обращении к маршруту.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._exact = {}
+        self._trie = {}
+        self._routes = []
+        self._lock = threading.Lock()
+
+    def exact(self, key: str, target):
+        """Регистрирует обработчик для ключа целиком."""
+        route = _Route(f"{self.name}:{key}", target)
+        self._exact[key] = route
+        self._routes.append(route)
+
+    def prefix(self, prefix: str, target):
+        """Регистрирует обработчик для всех ключей, начинающихся с prefix."""
+        route = _Route(f"{self.name}:{prefix}*", target)
+        node = self._trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[None] = route  # None не бывает символом строки — место для маршрута
+        self._routes.append(route)
+
+    def match(self, key: str) -> tuple:
+        """Returns:
+            (маршрут, остаток ключа) или (None, None)
+        """
+        route = self._exact.get(key)
+        if route is not None:
+            return route, ''
+        found, found_at = None, 0
+        node = self._trie
+        for i, char in enumerate(key):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                found, found_at = node[None], i + 1
+        if found is None:
+            return None, None
+        return found, key[found_at:]
+
+    def dispatch(self, key: str, context) -> bool:
+        """Вызывает обработчик ключа: handler(context, arg).
+
+        Returns:
+            True — маршрут найден и обработан; False — такого маршрута нет
+        """
+        route, arg = self.match(key)
+        if route is None:
+            return False
+        started = time.perf_counter()
+        failed = False
+        try:
+            route.resolve()(context, arg)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._record(route, time.perf_counter() - started, failed)
+        return True
+
+    def _record(self, route: _Route, elapsed: float, failed: bool):
+        bucket = len(LATENCY_BUCKETS)
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if elapsed <= bound:
+                bucket = i
+                break
+        with self._lock:
+            route.calls += 1
+            route.errors += int(failed)
+            route.total += elapsed
+            route.max = max(route.max, elapsed)
+            route.buckets[bucket] += 1
+        if elapsed > SLOW_ROUTE_SECONDS:
+            print(f"Медленный маршрут {route.name}: {elapsed:.1f} сек")
+
+    def get_stats(self) -> list:
+        """Статистика вызванных маршрутов, самые затратные (по суммарному времени) первыми.
+
+        Returns:
+            [{'route', 'calls', 'errors', 'avg', 'p95', 'max', 'histogram'}], время в секундах;
+            p95 — верхняя граница корзины гистограммы
+        """
+        with self._lock:
+            routes = [(r.name, r.calls, r.errors, r.total, r.max, list(r.buckets)) for r in self._routes if r.calls]
+        stats = []
+        for name, calls, errors, total, max_elapsed, buckets in routes:
+            stats.append({
+                'route': name,
+                'calls': calls,
+                'errors': errors,
+                'avg': total / calls,
+                'p95': _bucket_percentile(buckets, calls, 0.95, max_elapsed),
+                'max': max_elapsed,
+                'histogram': dict(zip([*LATENCY_BUCKETS, float('inf')], buckets)),
+                'total': total
+            })
+        stats.sort(key=lambda s: s['total'], reverse=True)
+        return stats
+
+
+def _bucket_percentile(buckets: list, calls: int, q: float, max_elapsed: float) -> float:
+    """Оценка перцентиля сверху: граница корзины, в которую он попал."""
+    threshold = q * calls
+    seen = 0
+    for i, count in enumerate(buckets):
+        seen += count
+        if seen >= threshold:
+            return min(LATENCY_BUCKETS[i], max_elapsed) if i < len(LATENCY_BUCKETS) else max_elapsed
+    return max_elapsed
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""Локальный разбор относительного времени (RU/UK) для простых напоминаний."""
+import re
+from datetime import datetime, timedelta
+
+import pytz
+
+from utils.config import USER_TIMEZONE
+
+# Напоминание длиннее — уже заметка, пусть разбирает AI
+MAX_REMINDER_CHARS = 120
+MAX_TITLE_WORDS = 6
+
+_AMOUNT_WORDS = {
+    'одну': 1, 'один': 1, 'одна': 1,
+    'две': 2, 'два': 2, 'дві': 2, 'пару': 2, 'три': 3, 'четыре': 4, 'чотири': 4,
+    'пять': 5, "п'ять": 5, 'десять': 10, 'пятнадцать': 15, "п'ятнадцять": 15,
+    'двадцать': 20, 'двадцять': 20, 'тридцать': 30, 'тридцять': 30, 'сорок': 40,
+}
+
+_UNIT_MINUTES = [
+    (re.compile(r'^(?:мин|хв)'), 1),
+    (re.compile(r'^(?:час|ч$|ч\.|годин)'), 60),
+    (re.compile(r'^(?:ден|дн|день|доб)'), 60 * 24),
+    (re.compile(r'^(?:недел|тижн|тиж)'), 60 * 24 * 7),
+]
+
+_HALF_HOUR_RE = re.compile(r'(?<![\w-])через\s+(?:полчаса|пол\s+часа|півгодини|пів\s+години)(?![\w-])', re.IGNORECASE)
+_RELATIVE_RE = re.compile(
+    r"(?<![\w-])через\s+(?:(?P<amount>\d+|" + "|".join(_AMOUNT_WORDS) + r")\s*)?"
+    r"(?P<unit>минут[уы]?|мин\.?|хвилин[уи]?|хв\.?|час(?:а|ов)?|ч\.?|годин[уи]?|"
+    r"дн(?:я|ей|і|ів)|день|добу|недел[юи]|тижн(?:і|ів)|тиждень)(?![\w-])",
+    re.IGNORECASE
+)
+_DAY_RE = re.compile(r'(?<![\w-])(?P<day>сегодня|сьогодні|завтра|послезавтра|післязавтра)(?![\w-])', re.IGNORECASE)
+_TIME_RE = re.compile(
+    r"(?<![\w-])(?:(?:в|во|о|об|на)\s+)?(?P<hour>\d{1,2}):(?P<minute>\d{2})"
+    r"(?:\s*(?P<period>утра|ранку|дня|вечера|вечора|ночи|ночі))?(?![\w-])"
+    r"|(?<![\w-])(?:в|во|о|об)\s+(?P<hour_only>\d{1,2})(?:\.(?P<minute_only>\d{2}))?"
+    r"(?:\s*(?P<period_only>утра|ранку|дня|вечера|вечора|ночи|ночі))?(?:\s*(?P<hour_unit>час(?:а|ов)?|годин[іиу]?))?(?![\w.:-])",
+    re.IGNORECASE
+)
+_REMINDER_VERB_RE = re.compile(
+    r'(?<![\w-])(?:напомни(?:те)?|напомнить|нагадай(?:те)?|нагадати)(?:\s+(?:мне|мені))?(?![\w-])',
+    re.IGNORECASE
+)
+_DAY_OFFSETS = {'сегодня': 0, 'сьогодні': 0, 'завтра': 1, 'послезавтра': 2, 'післязавтра': 2}
+
+# Признаки даты/времени. Если их нет, AI не нужно искать события
+_TEMPORAL_RE = re.compile(
+    r'\d{1,2}[:.]\d{2}|\d{1,2}[./]\d{1,2}(?:[./]\d{2,4})?|\b\d{1,2}\s*(?:ч|h)\b|'
+    r'(?<![\w-])(?:через|сегодня|сьогодні|завтра|послезавтра|післязавтра|вчера|вчора|'
+    r'утр|ранк|вечер|вечор|ноч|днём|днем|вдень|обед|обід|полдень|полночь|опівдні|опівночі|'
+    r'понедельник|вторник|сред|четверг|пятниц|суббот|воскресень|'
+    r"понеділ|вівтор|серед|четвер|п'ятниц|субот|неділ|выходн|вихідн|"
+    r'январ|феврал|март|апрел|ма[йя]|июн|июл|август|сентябр|октябр|ноябр|декабр|'
+    r'січ|лют|берез|квіт|травн|черв|лип|серп|верес|жовт|листопад|груд|'
+    r'недел|тижн|тиждень|месяц|місяц|минут|хвилин|час[ауо]?в?|годин|дедлайн|до\s+конца)',
+    re.IGNORECASE
+)
+# Английские дата/время («tomorrow at 5pm», «next monday»)
+_TEMPORAL_EN_RE = re.compile(
+    r'\b(?:today|tonight|tomorrow|yesterday|noon|midnight|morning|afternoon|evening|'
+    r'(?:mon|tues|wednes|thurs|fri|satur|sun)day|weekend|next\s+(?:week|month)|'
+    r'january|february|march|april|june|july|august|september|october|november|december|'
+    r'deadline|remind(?:er)?|meeting|call)\b',
+    re.IGNORECASE
+)
+# Слова, намекающие на событие без явного времени («встреча с Олей» → AI решит)
+_EVENT_HINT_RE = re.compile(r'(?<![\w-])(?:напомн|нагада|встреч|зустріч|созвон|дзвін|числ)', re.IGNORECASE)
+
+
+def has_temporal_expression(text: str) -> bool:
+    """Есть ли в тексте хоть что-то похожее на дату, время или напоминание.
+
+    По ответу «нет» AI не ищет события, поэтому проверка склоняется к «да»:
+    любая цифра («до 15-го», «12 числа», «в 5 рядов») отдаёт решение AI.
+    """
+    text = text or ''
+    return bool(
+        re.search(r'\d', text) or _TEMPORAL_RE.search(text)
+        or _TEMPORAL_EN_RE.search(text) or _EVENT_HINT_RE.search(text)
+    )
+
+
+def _is_confident_time(match, has_day: bool) -> bool:
+    """«в 3» — время, только если рядом есть маркер часа или день.
+
+    Без них это может быть количество: «заехать в 3 магазина», «в 2 раза больше».
+    """
+    if match.group('hour') is not None:  # HH:MM
+        return True
+    return bool(has_day or match.group('minute_only') or match.group('period_only') or match.group('hour_unit'))
+
+
+def _relative_delta(match) -> timedelta:
+    amount_raw = (match.group('amount') or '1').lower()
+    amount = int(amount_raw) if amount_raw.isdigit() else _AMOUNT_WORDS.get(amount_raw, 1)
+    unit = match.group('unit').lower()
+    for unit_re, minutes in _UNIT_MINUTES:
+        if unit_re.match(unit):
+            return timedelta(minutes=amount * minutes)
+    return None
+
+
+def _absolute_time(day_match, time_match, now: datetime) -> datetime:
+    hour = time_match.group('hour') or time_match.group('hour_only')
+    minute = time_match.group('minute') or time_match.group('minute_only') or '0'
+    period = (time_match.group('period') or time_match.group('period_only') or '').lower()
+    hour, minute = int(hour), int(minute)
+
+    if period in ('дня', 'вечера', 'вечора') and hour < 12:
+        hour += 12
+    elif period in ('ночи', 'ночі') and hour == 12:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+
+    day_offset = _DAY_OFFSETS[day_match.group('day').lower()] if day_match else 0
+    target = (now + timedelta(days=day_offset)).replace(hour=hour, minute=minute, second=0, microsecond=0)
+    # «сегодня в 3», а 3:00 уже прошло — значит 15:00
+    if day_match and not period and hour < 12 and target <= now:
+        target += timedelta(hours=12)
+    # «в 10» без дня, а 10:00 уже прошло — значит завтра
+    if not day_match and target <= now:
+        target += timedelta(days=1)
+    # Прошедшее время с явным днём — не угадываем, пусть решает AI
+    if target <= now:
+        return None
+    return target
+
+
+def parse_reminder(text: str, now: datetime = None) -> dict:
+    """Пытается разобрать короткое напоминание без AI.
+
+    Понимает «через 15 минут позвонить», «завтра в 10 встреча»,
+    «нагадай о 18:30 забрати посилку». Возвращает результат только при высокой
+    уверенности: одно выражение времени, короткий текст без лишнего контента.
+
+    Returns:
+        dict {'title', 'datetime_iso'} или None — тогда разбирает AI
+    """
+    text = (text or '').strip()
+    if not text or len(text) > MAX_REMINDER_CHARS or '\n' in text or 'http' in text.lower():
+        return None
+
+    if now is None:
+        now = datetime.now(pytz.timezone(USER_TIMEZONE))
+
+    relative = list(_HALF_HOUR_RE.finditer(text)) or list(_RELATIVE_RE.finditer(text))
+    days = list(_DAY_RE.finditer(text))
+    all_times = list(_TIME_RE.finditer(text))
+    times = [match for match in all_times if _is_confident_time(match, bool(days))]
+    if len(times) != len(all_times):
+        return None
+
+    if relative:
+        if len(relative) > 1 or days or times:
+            return None
+        match = relative[0]
+        delta = timedelta(minutes=30) if match.re is _HALF_HOUR_RE else _relative_delta(match)
+        if delta is None:
+            return None
+        target = now + delta
+        spans = [match.span()]
+    else:
+        if len(days) > 1 or len(times) != 1:
+            return None
+        day_match = days[0] if days else None
+        target = _absolute_time(day_match, times[0], now)
+        if target is None:
+            return None
+        spans = [times[0].span()] + ([day_match.span()] if day_match else [])
+
+    # Всё, что осталось после вырезания времени и «напомни», — название события
+    title = text
+    for start, end in sorted(spans, reverse=True):
+        title = title[:start] + ' ' + title[end:]
+    title = _REMINDER_VERB_RE.sub(' ', title)
+    title = re.sub(r'\s+', ' ', title).strip(' ,.;:!—-')
+    if not title or len(title.split()) > MAX_TITLE_WORDS or _TEMPORAL_RE.search(title):
+        return None
+
+    return {
+        'title': title[0].upper() + title[1:],
+        'datetime_iso': target.strftime('%Y-%m-%dT%H:%M:%S')
+    }
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Профиль времени импорта точек входа (холодный старт serverless-функции).
+
+Каждая точка входа импортируется в отдельном процессе с `python -X importtime`,
+как при холодном старте на Vercel. Отчёт: общее время импорта и самые тяжёлые
+модули (по собственному времени и по пакетам верхнего уровня).
+
+Запуск:
+    python bench/import_profile.py [--top N] [--max-ms MS] [модуль ...]
+
+--max-ms — бюджет на точку входа: при превышении скрипт завершается с кодом 1
+(для CI, чтобы регрессии холодного старта были видны сразу).
+Сеть не нужна: недостающие переменные окружения подставляются заглушками,
+прогрев соединений отключается.
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+ENTRY_POINTS = ['bot', 'cron', 'clickup_webhook', 'assemblyai_webhook']
+# Только для импорта: config проверяет наличие, а не правильность
+DUMMY_ENV = {
+    'TELEGRAM_TOKEN': 'x', 'NOTION_TOKEN': 'x', 'NOTION_DATABASE_ID': 'x', 'DEEPSEEK_API_KEY': 'x',
+    'OPENAI_API_KEY': 'x', 'PINECONE_API_KEY': 'x', 'PINECONE_HOST': 'https://index.example',
+}
+
+
+def profile(module: str) -> list:
+    """Returns:
+        [(имя модуля, собственное время мкс, накопленное время мкс)]
+    """
+    env = {**DUMMY_ENV, **os.environ, 'WARMUP_CONNECTIONS': 'false'}
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=API_DIR, env=env, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    if not any(name == module for name, _, _ in rows):
+        print(result.stderr[-2000:], file=sys.stderr)
+        raise RuntimeError(f"Не удалось импортировать {module}")
+    return rows
+
+
+def report(module: str, rows: list, top: int) -> float:
+    total_ms = next(cumulative for name, _, cumulative in rows if name == module) / 1000
+    print(f"\n=== {module}: {total_ms:.0f} мс, модулей: {len(rows)} ===")
+
+    packages = defaultdict(int)
+    for name, self_us, _ in rows:
+        packages[name.split('.')[0]] += self_us
+    print(f"{'пакет':<28} {'мс':>8}")
+    for package, self_us in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]:
+        print(f"{package:<28} {self_us / 1000:>8.1f}")
+
+    print(f"\n{'модуль (собственное время)':<50} {'мс':>8}")
+    for name, self_us, _ in sorted(rows, key=lambda row: row[1], reverse=True)[:top]:
+        print(f"{name[:50]:<50} {self_us / 1000:>8.1f}")
+    return total_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('modules', nargs='*', default=ENTRY_POINTS)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--max-ms', type=float, default=None)
+    args = parser.parse_args()
+
+    over_budget = []
+    for module in args.modules:
+        total_ms = report(module, profile(module), args.top)
+        if args.max_ms is not None and total_ms > args.max_ms:
+            over_budget.append(f"{module}: {total_ms:.0f} мс")
+
+    if over_budget:
+        print(f"\nПревышен бюджет {args.max_ms:.0f} мс: " + ", ".join(over_budget))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Бенчмарк кеша промптов OpenAI для process_with_ai.
+
+Сравнивает два режима на одинаковых заметках:
+  warm — текущая раскладка: неизменный system-префикс, переменная часть в конце;
+  cold — тот же промпт, но с уникальной строкой в начале (как было, когда
+         время и заметка стояли в начале промпта) — кеш префикса не срабатывает.
+
+Запуск (нужен настоящий OPENAI_API_KEY):
+    OPENAI_API_KEY=... python bench/prompt_cache.py [N]
+"""
+import os
+import statistics
+import sys
+import time
+import uuid
+
+# Модули бота импортируются как в Vercel: из папки api
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api'))
+
+from services import ai  # noqa: E402
+
+NOTES = [
+    "Завтра в 15:00 созвон с клиентом по новому лендингу, подготовить макеты",
+    "Идея: сделать серию постов про цветовые палитры для брендов кофеен",
+    "Через 2 часа напомнить отправить счёт за октябрь",
+    "Купить бумагу для принтера, картриджи и флешку на 64 гб",
+    "В пятницу встреча с Олей про редизайн логотипа, взять распечатки",
+]
+
+
+def run(mode: str, rounds: int) -> list:
+    latencies = []
+    for i in range(rounds):
+        note = NOTES[i % len(NOTES)]
+        system_prompt = ai.NOTE_SYSTEM_PROMPT
+        if mode == 'cold':
+            system_prompt = f"[{uuid.uuid4()}]\n" + system_prompt
+        started = time.monotonic()
+        ai._chat_completion(
+            f"bench_{mode}",
+            system_prompt,
+            f"Текущее время пользователя (timezone {ai.USER_TIMEZONE}): 2026-01-01 12:00:00\nЗаметка: --- {note} ---",
+            response_format={"type": "json_object"}
+        )
+        latencies.append(time.monotonic() - started)
+    return latencies
+
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    results = {mode: run(mode, rounds) for mode in ('cold', 'warm')}
+    stats = ai.get_ai_usage_stats()
+
+    print(f"\n{'mode':<6} {'calls':>5} {'hit rate':>9} {'cached %':>9} {'p50, s':>7} {'mean, s':>8}")
+    for mode, latencies in results.items():
+        s = stats.get(f"bench_{mode}", {})
+        print(
+            f"{mode:<6} {len(latencies):>5} {s.get('cache_hit_rate', 0):>9.0%} "
+            f"{s.get('cached_token_ratio', 0):>9.0%} {statistics.median(latencies):>7.2f} "
+            f"{statistics.mean(latencies):>8.2f}"
+        )
+    print("\nOpenAI кеширует префиксы от 1024 токенов, первый warm-запрос всегда промах.")
+
+
+if __name__ == '__main__':
+    main()
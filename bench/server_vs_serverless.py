@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""Сравнение задержки: serverless (холодный процесс на запрос) против server.py.
+
+serverless — каждый запрос обслуживает новый процесс, который импортирует
+точку входа и отвечает на один запрос (худший случай Vercel: холодный старт).
+server — один процесс server.py, запросы идут параллельно в N потоков.
+
+Запросы не ходят во внешние API: update от чужого пользователя (бот только
+разбирает и отбрасывает его) и GET-верификация ClickUp webhook. Так видна
+цена самой платформы — старт, импорты, разбор, маршрутизация.
+
+Запуск:
+    python bench/server_vs_serverless.py [--requests N] [--concurrency C] [--cold N]
+"""
+import argparse
+import itertools
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from import_profile import API_DIR, DUMMY_ENV  # noqa: E402
+
+ROOT_DIR = os.path.dirname(API_DIR)
+_update_ids = itertools.count(int(time.time()))
+
+# Один запрос в отдельном процессе — как вызов холодной serverless-функции
+COLD_SERVE = """
+import sys
+from http.server import HTTPServer
+sys.path.insert(0, '.')
+from {module} import handler
+server = HTTPServer(('127.0.0.1', {port}), handler)
+print('ready', flush=True)
+server.handle_request()
+"""
+
+CASES = {
+    'bot': ('POST', '/', 'bot'),
+    'clickup': ('GET', '/api/clickup-webhook', 'clickup_webhook'),
+}
+
+
+def _env(db_path: str) -> dict:
+    return {**DUMMY_ENV, **os.environ, 'WARMUP_CONNECTIONS': 'false', 'ALLOWED_TELEGRAM_ID': '1',
+            'LOCAL_DB_PATH': db_path, 'PYTHONUNBUFFERED': '1'}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _request(port: int, method: str, path: str):
+    data = None
+    if method == 'POST':
+        # Каждый раз новый update_id — иначе сработает защита от повторной доставки
+        update = {'update_id': next(_update_ids), 'message': {'from': {'id': 2}, 'chat': {'id': 2}, 'text': 'hi'}}
+        data = json.dumps(update).encode()
+    request = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method)
+    with urllib.request.urlopen(request, timeout=30) as response:
+        response.read()
+        return response.status
+
+
+def _percentile(values: list, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+def _print_row(label: str, latencies: list, wall: float = None):
+    extra = f" {len(latencies) / wall:>8.1f} rps" if wall else ""
+    print(f"{label:<28} p50 {_percentile(latencies, 0.5) * 1000:>8.1f} мс"
+          f"  p95 {_percentile(latencies, 0.95) * 1000:>8.1f} мс{extra}")
+
+
+def bench_cold(case: str, count: int, env: dict) -> list:
+    method, path, module = CASES[case]
+    latencies = []
+    for _ in range(count):
+        port = _free_port()
+        started = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, '-c', COLD_SERVE.format(module=module, port=port)],
+                                cwd=API_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        proc.stdout.readline()  # 'ready'
+        _request(port, method, path)
+        latencies.append(time.perf_counter() - started)
+        proc.wait(timeout=30)
+    return latencies
+
+
+def bench_server(port: int, case: str, count: int, concurrency: int) -> tuple:
+    method, path, _ = CASES[case]
+
+    def timed(_):
+        started = time.perf_counter()
+        _request(port, method, path)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(timed, range(count)))
+    return latencies, time.perf_counter() - started
+
+
+def start_server(env: dict) -> tuple:
+    port = _free_port()
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, os.path.join(ROOT_DIR, 'server.py')], cwd=ROOT_DIR,
+                            env=dict(env, PORT=str(port), SERVER_HOST='127.0.0.1'),
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    # Вывод сервера читаем в фоне, чтобы не переполнился pipe
+    ready = threading.Event()
+    log = []
+
+    def pump():
+        for line in proc.stdout:
+            log.append(line)
+            if line.startswith('SERVER: http'):
+                ready.set()
+
+    threading.Thread(target=pump, daemon=True).start()
+    if not ready.wait(30):
+        proc.kill()
+        raise RuntimeError("server.py не запустился:\n" + "".join(log[-20:]))
+    return proc, port, time.perf_counter() - started, log
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=200, help='запросов к server.py на сценарий')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--cold', type=int, default=5, help='холодных запусков на сценарий')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = _env(os.path.join(tmp, 'bench.sqlite3'))
+
+        print(f"=== serverless: новый процесс на запрос, {args.cold} запусков ===")
+        for case in CASES:
+            _print_row(case, bench_cold(case, args.cold, env))
+
+        proc, port, startup, log = start_server(env)
+        print(f"\n=== server.py: старт {startup * 1000:.0f} мс, {args.requests} запросов, "
+              f"{args.concurrency} параллельно ===")
+        try:
+            for case in CASES:
+                bench_server(port, case, args.concurrency, args.concurrency)  # прогрев
+                latencies, wall = bench_server(port, case, args.requests, args.concurrency)
+                _print_row(case, latencies, wall)
+        finally:
+            started = time.perf_counter()
+            proc.send_signal(signal.SIGTERM)
+            proc.wait(timeout=60)
+            print(f"\nОстановка по SIGTERM: {(time.perf_counter() - started) * 1000:.0f} мс, код {proc.returncode}")
+
+
+if __name__ == '__main__':
+    main()
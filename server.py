@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+"""Долгоживущий сервер: все точки входа в одном процессе (альтернатива Vercel).
+
+В serverless-режиме каждая функция стартует холодной: импорты, HTTP-пулы,
+клиент Telegram и кеши создаются заново. Здесь модули импортируются один раз
+при запуске, соединения и кеши общие для всех запросов, фоновые потоки
+(очередь задач, FAST_ACK) живут, пока жив процесс.
+
+Маршруты — как в vercel.json. Обработчики api/*.py используются как есть.
+Одновременно обрабатывается не больше SERVER_MAX_CONCURRENCY запросов;
+остальные ждут слот до SERVER_QUEUE_TIMEOUT секунд и получают 503 —
+Telegram и ClickUp повторят доставку.
+
+SIGTERM/SIGINT: сервер перестаёт принимать соединения, дожидается начатых
+запросов, фоновых задач и отправки сообщений (до SERVER_SHUTDOWN_TIMEOUT).
+
+Запуск:
+    python server.py
+"""
+import importlib
+import os
+import signal
+import sys
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+from utils.config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_MAX_CONCURRENCY,
+    SERVER_QUEUE_TIMEOUT,
+    SERVER_SHUTDOWN_TIMEOUT,
+)
+
+# Путь -> модуль точки входа (как rewrites в vercel.json); остальное — бот
+ROUTES = {
+    '/api/cron': 'cron',
+    '/api/clickup-webhook': 'clickup_webhook',
+    '/api/assemblyai-webhook': 'assemblyai_webhook',
+}
+DEFAULT_ROUTE = 'bot'
+
+
+def _load_handlers() -> dict:
+    """Импортирует все точки входа сразу: первый запрос не платит за холодный старт."""
+    modules = set(ROUTES.values()) | {DEFAULT_ROUTE}
+    return {name: importlib.import_module(name).handler for name in modules}
+
+
+class MountedHandler(BaseHTTPRequestHandler):
+    """Выбирает обработчик точки входа по пути и передаёт ему запрос."""
+
+    protocol_version = 'HTTP/1.0'
+    handlers = {}
+    slots = threading.BoundedSemaphore(SERVER_MAX_CONCURRENCY)
+
+    def _dispatch(self):
+        path = self.path.split('?', 1)[0].rstrip('/')
+        target = self.handlers[ROUTES.get(path, DEFAULT_ROUTE)]
+        method = getattr(target, f'do_{self.command}', None)
+        if method is None:
+            self.send_error(405)
+            return
+        slots = self.slots
+        if not slots.acquire(timeout=SERVER_QUEUE_TIMEOUT):
+            print(f"SERVER: нет свободных слотов, {self.command} {path} -> 503")
+            self.send_response(503)
+            self.send_header('Retry-After', '5')
+            self.end_headers()
+            return
+        try:
+            # Запрос уже разобран — дальше его обрабатывает класс точки входа
+            # со всеми своими методами (_respond и т. п.)
+            self.__class__ = target
+            method(self)
+        finally:
+            slots.release()
+
+    do_GET = _dispatch
+    do_POST = _dispatch
+
+
+class Server(ThreadingHTTPServer):
+    # Не daemon: server_close() дожидается начатых запросов
+    daemon_threads = False
+    block_on_close = True
+
+
+def _shutdown(server: Server):
+    """Порядок: перестать принимать -> доделать запросы -> доделать задачи -> отправить сообщения."""
+    from services.job_queue import stop_job_workers
+    from services.telegram_client import get_telegram_client
+
+    started = time.monotonic()
+    server.shutdown()
+    server.server_close()
+    remaining = lambda: max(0, SERVER_SHUTDOWN_TIMEOUT - (time.monotonic() - started))
+    if not stop_job_workers(timeout=remaining()):
+        print("SERVER: фоновые задачи не завершились — доделаются после перезапуска")
+    if not get_telegram_client().drain(timeout=remaining()):
+        print("SERVER: не все сообщения Telegram отправлены")
+    if 'utils.aio' in sys.modules:
+        sys.modules['utils.aio'].shutdown()
+    print(f"SERVER: остановлен за {time.monotonic() - started:.1f} сек")
+
+
+def main():
+    started = time.monotonic()
+    MountedHandler.handlers = _load_handlers()
+    server = Server((SERVER_HOST, SERVER_PORT), MountedHandler)
+    print(f"SERVER: http://{SERVER_HOST}:{SERVER_PORT}, запуск {time.monotonic() - started:.2f} сек, "
+          f"параллельно до {SERVER_MAX_CONCURRENCY} запросов")
+
+    stopper = []
+
+    def on_signal(signum, frame):
+        # shutdown() ждёт выхода из serve_forever — вызывать его из того же потока нельзя
+        if not stopper:
+            print(f"SERVER: получен сигнал {signum}, останавливаюсь...")
+            stopper.append(threading.Thread(target=_shutdown, args=(server,), name='server-shutdown'))
+            stopper[0].start()
+
+    signal.signal(signal.SIGTERM, on_signal)
+    signal.signal(signal.SIGINT, on_signal)
+    server.serve_forever()
+    if stopper:
+        stopper[0].join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""Тесты импортируют модули так же, как точки входа: папка api в sys.path."""
+import os
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
+
+# Модулям нужны только значения, не настоящие ключи: тесты не ходят в сеть
+for _name in ('TELEGRAM_TOKEN', 'NOTION_TOKEN', 'NOTION_DATABASE_ID', 'DEEPSEEK_API_KEY',
+              'OPENAI_API_KEY', 'PINECONE_API_KEY'):
+    os.environ.setdefault(_name, 'test')
+os.environ.setdefault('PINECONE_HOST', 'https://index.example')
+os.environ.setdefault('WARMUP_CONNECTIONS', 'false')
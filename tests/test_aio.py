@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import httpx
+import pytest
+
+from services import aio
+from utils.aio import submit
+
+
+@pytest.fixture
+def assemblyai(monkeypatch):
+    """Подменяет AssemblyAI ответами из списка statuses (по одному на запрос)."""
+    statuses = []
+    requests = []
+
+    def respond(request):
+        requests.append(request)
+        status = statuses.pop(0)
+        body = {'status': status, 'text': 'готово', 'words': []} if status == 'completed' else {'status': status}
+        return httpx.Response(200, json=body)
+
+    def get_client(base_url):
+        return httpx.AsyncClient(base_url=base_url, transport=httpx.MockTransport(respond))
+
+    monkeypatch.setattr(aio, 'get_client', get_client)
+    return statuses, requests
+
+
+def test_poll_waits_until_completed(assemblyai):
+    statuses, requests = assemblyai
+    statuses.extend(['queued', 'processing', 'completed'])
+    result = submit(aio.poll_transcription('t1', initial_delay=0.01, max_delay=0.02)).result(5)
+    assert result == {'status': 'completed', 'text': 'готово', 'words': []}
+    assert len(requests) == 3
+    assert requests[0].url.path.endswith('/transcript/t1')
+
+
+def test_poll_gives_up_after_budget(assemblyai):
+    statuses, _ = assemblyai
+    statuses.extend(['processing'] * 10)
+    result = submit(aio.poll_transcription('t2', max_wait=0.05, initial_delay=0.02, max_delay=0.02)).result(5)
+    assert result == {'status': 'processing', 'id': 't2'}
+
+
+def test_poll_returns_none_on_error(assemblyai):
+    statuses, _ = assemblyai
+    statuses.append('error')
+    assert submit(aio.poll_transcription('t3')).result(5) is None
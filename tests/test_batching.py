@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+from utils.batching import KeyedBatcher
+
+
+def _submit_all(batcher, calls):
+    """Запускает submit() в потоках с паузами. Returns: результаты в порядке calls."""
+    results = [None] * len(calls)
+
+    def run(i, key, item):
+        results[i] = batcher.submit(key, item)
+
+    threads = []
+    for i, (delay, key, item) in enumerate(calls):
+        time.sleep(delay)
+        thread = threading.Thread(target=run, args=(i, key, item))
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_leader_gets_whole_batch_in_order():
+    batcher = KeyedBatcher(window=0.2)
+    results = _submit_all(batcher, [(0, 'a', 1), (0.02, 'a', 2), (0.02, 'a', 3)])
+    assert results == [[1, 2, 3], None, None]
+
+
+def test_keys_are_batched_separately():
+    batcher = KeyedBatcher(window=0.2)
+    results = _submit_all(batcher, [(0, 'a', 1), (0.02, 'b', 2), (0.02, 'a', 3)])
+    assert results == [[1, 3], [2], None]
+
+
+def test_item_after_window_starts_new_batch():
+    batcher = KeyedBatcher(window=0.05)
+    assert batcher.submit('a', 1) == [1]
+    assert batcher.submit('a', 2) == [2]
+
+
+def test_full_batch_is_released_early():
+    batcher = KeyedBatcher(window=5, max_items=2)
+    started = time.monotonic()
+    results = _submit_all(batcher, [(0, 'a', 1), (0.02, 'a', 2)])
+    assert results == [[1, 2], None]
+    assert time.monotonic() - started < 2
+
+
+def test_max_wait_caps_sliding_window():
+    batcher = KeyedBatcher(window=0.1, max_wait=0.25)
+    started = time.monotonic()
+    results = _submit_all(batcher, [(0, 'a', i) if i == 0 else (0.06, 'a', i) for i in range(8)])
+    assert results[0][0] == 0
+    assert time.monotonic() - started < 0.6
+    # Всё, что не вошло в первую пачку, забрал лидер следующей
+    leaders = [r for r in results if r is not None]
+    assert sorted(item for batch in leaders for item in batch) == list(range(8))
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils.fillers import strip_fillers, needs_ai_cleanup
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Ээ, я пришёл домой.", "Я пришёл домой."),
+    ("Хм, я не знаю.", "Я не знаю."),
+    ("Ну вот, всё готово.", "Всё готово."),
+    ("Ну, я думаю, да.", "Я думаю, да."),
+    ("Короче, это сложно.", "Это сложно."),
+    ("Мм, давай завтра.", "Давай завтра."),
+    ("[00:05] Эм, начнём. [00:10] Ааа, понял.", "[00:05] Начнём. [00:10] Понял."),
+    ("[00:05] ну, ладно", "[00:05] ладно"),
+    ("Это — короче — всё.", "Это — всё."),
+    ("Это – типа – всё.", "Это – всё."),
+])
+def test_fillers_are_removed(text, expected):
+    assert strip_fillers(text)[0] == expected
+
+
+@pytest.mark.parametrize("text", [
+    "Длина 5 мм и ещё 3 мм.",
+    "Я съел блин.",
+    "Сказал: ну и что?",
+    "Вот дом, который построил Джек.",
+    "Смотри фильм вечером.",
+    "Это значит многое.",
+])
+def test_meaningful_words_are_kept(text):
+    assert strip_fillers(text)[0] == text
+
+
+def test_unresolved_ambiguous_words_are_counted():
+    cleaned, unresolved = strip_fillers("Я съел блин и вот так.")
+    assert cleaned == "Я съел блин и вот так."
+    assert unresolved == 2
+    assert needs_ai_cleanup(cleaned, unresolved)
+
+
+def test_clean_text_skips_ai():
+    cleaned, unresolved = strip_fillers("Простой текст без пауз.")
+    assert unresolved == 0
+    assert not needs_ai_cleanup(cleaned, unresolved)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+from services.idempotency import IdempotencyLedger
+
+
+@pytest.fixture(params=[False, True], ids=['memory', 'sqlite'])
+def make_ledger(request, tmp_path):
+    def make(**kwargs):
+        db_path = str(tmp_path / 'ledger.sqlite3') if request.param else None
+        return IdempotencyLedger(kwargs.pop('ttl', 60), 100, db_path, **kwargs)
+    return make
+
+
+def test_completed_delivery_is_duplicate(make_ledger):
+    ledger = make_ledger()
+    assert ledger.claim('tg:1')
+    ledger.complete('tg:1')
+    assert not ledger.claim('tg:1')
+    assert ledger.claim('tg:2')
+
+
+def test_in_progress_delivery_is_duplicate(make_ledger):
+    ledger = make_ledger()
+    assert ledger.claim('tg:1')
+    assert not ledger.claim('tg:1')
+
+
+def test_released_delivery_can_be_retried(make_ledger):
+    ledger = make_ledger()
+    assert ledger.claim('tg:1')
+    ledger.release('tg:1')
+    assert ledger.claim('tg:1')
+
+
+def test_expired_lease_lets_retry_through(make_ledger):
+    ledger = make_ledger(lease=0.05)
+    assert ledger.claim('tg:1')  # Обработчик «упал», не отметив результат
+    time.sleep(0.1)
+    assert ledger.claim('tg:1')
+
+
+def test_sqlite_ledger_is_shared_between_instances(tmp_path):
+    db_path = str(tmp_path / 'ledger.sqlite3')
+    first = IdempotencyLedger(60, 100, db_path)
+    assert first.claim('tg:1')
+    first.complete('tg:1')
+    assert not IdempotencyLedger(60, 100, db_path).claim('tg:1')
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import json
+import time
+
+import pytest
+
+from services import job_queue
+
+
+@pytest.fixture(autouse=True)
+def queue_db(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, 'LOCAL_DB_PATH', str(tmp_path / 'jobs.sqlite3'))
+    monkeypatch.setattr(job_queue, '_initialized', False)
+
+
+def _jobs():
+    conn = job_queue._connect()
+    try:
+        return conn.execute("SELECT id, kind, payload, available_at, created_at FROM jobs ORDER BY id").fetchall()
+    finally:
+        conn.close()
+
+
+def test_grouped_items_share_one_delayed_job():
+    first = job_queue.enqueue_grouped_job('album', 'g1', {'n': 1}, chat_id=7, window=10)
+    second = job_queue.enqueue_grouped_job('album', 'g1', {'n': 2}, chat_id=7, window=10)
+    other = job_queue.enqueue_grouped_job('album', 'g2', {'n': 3}, chat_id=7, window=10)
+    assert first == second != other
+
+    rows = _jobs()
+    assert json.loads(rows[0][2]) == {'group': 'g1', 'items': [{'n': 1}, {'n': 2}]}
+    assert rows[0][3] > time.time() + 5
+    # Отложенную задачу воркер пока не берёт
+    assert job_queue._claim_job() is None
+
+
+def test_group_window_is_capped_by_max_wait():
+    job_queue.enqueue_grouped_job('album', 'g1', 1, chat_id=7, window=10, max_wait=12)
+    time.sleep(0.01)
+    job_queue.enqueue_grouped_job('album', 'g1', 2, chat_id=7, window=10, max_wait=12)
+    _, _, _, available_at, created_at = _jobs()[0]
+    assert available_at == pytest.approx(created_at + 12)
+
+
+def test_started_group_job_is_not_extended():
+    job_queue.enqueue_grouped_job('album', 'g1', 1, chat_id=7, window=0)
+    job_id, kind, payload = job_queue._claim_job()
+    assert (kind, json.loads(payload)['items']) == ('album', [1])
+    assert job_queue.enqueue_grouped_job('album', 'g1', 2, chat_id=7, window=0) != job_id
+
+
+def test_dead_job_calls_on_dead_with_saved_payload(monkeypatch):
+    dead = []
+    monkeypatch.setattr(job_queue, 'JOB_MAX_ATTEMPTS', 1)
+    monkeypatch.setitem(job_queue._dead_handlers, 'note', dead.append)
+    job_queue.enqueue_job('note', {'step': 0}, chat_id=7)
+    job_id, _, _ = job_queue._claim_job()
+    job_queue.save_job_payload(job_id, {'step': 1})
+    job_queue._slots.acquire()  # _job_done освобождает слот, занятый воркером
+    job_queue._job_done(job_id, 'note', error='boom')
+    assert dead == [{'step': 1}]
+
+
+def test_retried_job_gets_saved_payload(monkeypatch):
+    monkeypatch.setattr(job_queue, 'RETRY_DELAYS', [0])
+    job_queue.enqueue_job('note', {'step': 0}, chat_id=7)
+    job_id, _, _ = job_queue._claim_job()
+    job_queue.save_job_payload(job_id, {'step': 1})
+    job_queue._finish_job(job_id, error='boom')
+    assert json.loads(job_queue._claim_job()[2]) == {'step': 1}
+
+
+def test_long_async_job_keeps_its_lease(monkeypatch):
+    monkeypatch.setattr(job_queue, 'JOB_LEASE_SECONDS', 0.3)
+    job_queue.enqueue_job('poll', {}, chat_id=7)
+    job_id, _, _ = job_queue._claim_job()
+    job_queue._slots.acquire()  # _job_done освобождает слот, занятый воркером
+    job_queue._start_async_job(job_id, 'poll', asyncio.sleep(1))
+
+    time.sleep(0.6)
+    assert job_queue._claim_job() is None  # Аренда продлена — задачу не вернули в очередь
+    deadline = time.time() + 3
+    while job_queue._async_jobs and time.time() < deadline:
+        time.sleep(0.05)
+    conn = job_queue._connect()
+    try:
+        assert conn.execute("SELECT status, attempts FROM jobs WHERE id = ?", (job_id,)).fetchone() == ('done', 1)
+    finally:
+        conn.close()
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+import requests
+
+from services import llm_router
+from utils.config import AI_MODEL, AI_MODEL_STRONG
+
+
+def test_short_note_uses_fast_model():
+    assert llm_router.select_route('note', 300)['model'] == AI_MODEL
+
+
+def test_long_note_and_summaries_use_strong_model():
+    assert llm_router.select_route('note', 10000)['model'] == AI_MODEL_STRONG
+    assert llm_router.select_route('summary', 100)['model'] == AI_MODEL_STRONG
+
+
+def test_fallback_differs_from_primary():
+    for task, chars in (('note', 100), ('summary', 100), ('transcript_combined', 20000)):
+        route = llm_router.select_route(task, chars)
+        assert route['fallback_model'] != route['model']
+
+
+def test_timeout_never_exceeds_deadline():
+    for task in list(llm_router.TASK_ROUTES) + ['unknown']:
+        route = llm_router.select_route(task, 10 ** 6)
+        assert route['timeout'][1] <= route['deadline']
+
+
+def test_hedged_call_respects_overall_deadline(monkeypatch):
+    monkeypatch.setattr(llm_router, 'AI_CALL_DEADLINE', 0.5)
+    monkeypatch.setattr(llm_router, 'MIN_HEDGE_DELAY', 0.1)
+    release = threading.Event()
+
+    def send(model, timeout):
+        release.wait(5)  # Зависший upstream
+        return model
+
+    started = time.monotonic()
+    with pytest.raises(requests.exceptions.Timeout):
+        llm_router.hedged_call('test_deadline', 100, send)
+    release.set()
+    assert time.monotonic() - started < 1.5
+
+
+def test_fallback_after_retryable_error():
+    calls = []
+
+    def send(model, timeout):
+        calls.append(model)
+        if model == AI_MODEL:
+            raise requests.exceptions.ConnectionError("down")
+        return model
+
+    assert llm_router.hedged_call('search', 100, send) == llm_router.select_route('search', 100)['fallback_model']
+    assert calls[0] == AI_MODEL
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+import json
+
+import pytest
+
+from services.notion import _json_rich_text
+
+
+def test_long_json_survives_round_trip():
+    context = {'chat_id': 1, 'text': 'слово ' * 1000, 'photos': ['https://example.com/x'] * 50}
+    parts = _json_rich_text(context)
+    assert len(parts) > 1
+    assert all(len(part['text']['content']) <= 2000 for part in parts)
+    assert json.loads("".join(part['text']['content'] for part in parts)) == context
+
+
+def test_oversized_json_fails_loudly():
+    with pytest.raises(ValueError):
+        _json_rich_text({'text': 'x' * 250000})
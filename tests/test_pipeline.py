@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from services import pipeline
+
+EVENT = {'title': 'Встреча', 'datetime_iso': '2026-03-11T10:00:00'}
+
+
+class _Progress:
+    """Запоминает итог вместо правки сообщения в Telegram."""
+    finished = []
+
+    def __init__(self, chat_id, message_id=None):
+        pass
+
+    def update(self, text):
+        pass
+
+    def finish(self, text, **kwargs):
+        _Progress.finished.append(text)
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    calls = []
+    _Progress.finished = []
+    monkeypatch.setattr(pipeline, 'ProgressReporter', _Progress)
+    monkeypatch.setattr(pipeline, 'parse_reminder', lambda text: None)
+    monkeypatch.setattr(pipeline, 'send_telegram_message', lambda *a, **k: calls.append(('telegram', a[1])))
+    monkeypatch.setattr(pipeline, 'log_last_action', lambda **k: calls.append(('log', k)))
+    monkeypatch.setattr(pipeline, 'index_notion_page', lambda *a: None)
+    monkeypatch.setattr(pipeline, 'create_google_calendar_event',
+                        lambda title, *a: calls.append(('event', title)) or {'id': 'gcal-1'})
+    return calls
+
+
+def test_note_events_are_not_created_when_page_fails(monkeypatch, calls):
+    def fail(*args, **kwargs):
+        raise RuntimeError("Notion недоступен")
+
+    monkeypatch.setattr(pipeline, 'process_with_ai', lambda text: {
+        'main_title': 'Заметка', 'category': 'Задача', 'formatted_body': text, 'events': [EVENT]
+    })
+    monkeypatch.setattr(pipeline, 'create_notion_page', fail)
+    pipeline.process_note_text(1, "встреча завтра в 10")
+
+    assert not [c for c in calls if c[0] in ('event', 'log')]
+    assert 'Ошибка при создании заметки' in _Progress.finished[-1]
+
+
+def test_note_events_follow_created_page(monkeypatch, calls):
+    monkeypatch.setattr(pipeline, 'process_with_ai', lambda text: {
+        'main_title': 'Заметка', 'category': 'Задача', 'formatted_body': text, 'events': [EVENT]
+    })
+    monkeypatch.setattr(pipeline, 'create_notion_page', lambda *a, **k: 'page-1')
+    pipeline.process_note_text(1, "встреча завтра в 10", is_text_message=False)
+
+    assert ('event', 'Встреча') in calls
+    assert [c[1] for c in calls if c[0] == 'log'] == [{'notion_page_id': 'page-1'}, {'gcal_event_id': 'gcal-1'}]
+
+
+def test_reminder_keeps_note_when_no_event_created(monkeypatch, calls):
+    deleted = []
+
+    def fail(*args):
+        raise RuntimeError("календарь недоступен")
+
+    monkeypatch.setattr(pipeline, 'process_with_ai', lambda text: {
+        'main_title': 'Встреча', 'formatted_body': text, 'is_reminder_only': True, 'events': [EVENT]
+    })
+    monkeypatch.setattr(pipeline, 'create_google_calendar_event', fail)
+    monkeypatch.setattr(pipeline, 'delete_notion_page', deleted.append)
+    pipeline.enrich_note(1, 'page-1', "встреча завтра в 10", status_message_id=5)
+
+    assert deleted == []
+    assert 'заметка осталась в Notion' in _Progress.finished[-1]
+
+
+def test_reminder_deletes_note_after_event_created(monkeypatch, calls):
+    deleted = []
+    monkeypatch.setattr(pipeline, 'process_with_ai', lambda text: {
+        'main_title': 'Встреча', 'formatted_body': text, 'is_reminder_only': True, 'events': [EVENT]
+    })
+    monkeypatch.setattr(pipeline, 'delete_notion_page', deleted.append)
+    pipeline.enrich_note(1, 'page-1', "встреча завтра в 10", status_message_id=5)
+
+    assert deleted == ['page-1']
+    assert 'Напоминание создано' in _Progress.finished[-1]
+
+
+def test_retry_reuses_ai_answer_and_created_events(monkeypatch, calls):
+    def no_ai(text):
+        raise AssertionError("повтор не должен звать AI")
+
+    monkeypatch.setattr(pipeline, 'process_with_ai', no_ai)
+    monkeypatch.setattr(pipeline, 'update_note_properties', lambda *a: None)
+    monkeypatch.setattr(pipeline, 'replace_page_content', lambda *a, **k: None)
+    ai_data = {'main_title': 'Заметка', 'category': 'Задача', 'formatted_body': 'текст', 'events': [EVENT]}
+    pipeline.enrich_note(1, 'page-1', "текст", ai_data=ai_data, created_events={'0': {'id': 'gcal-1', 'html_link': None}})
+
+    assert not [c for c in calls if c[0] in ('event', 'log')]
+    assert 'Добавлено в календарь' in _Progress.finished[-1]
+
+
+def test_enrich_note_saves_progress_into_job(monkeypatch, calls):
+    saved = []
+    monkeypatch.setattr(pipeline, 'current_job_id', lambda: 42)
+    monkeypatch.setattr(pipeline, 'save_job_payload', lambda job_id, payload: saved.append((job_id, dict(payload))))
+    monkeypatch.setattr(pipeline, 'process_with_ai', lambda text: {
+        'main_title': 'Встреча', 'formatted_body': text, 'is_reminder_only': True, 'events': [EVENT]
+    })
+    monkeypatch.setattr(pipeline, 'delete_notion_page', lambda page_id: None)
+    pipeline.enrich_note(1, 'page-1', "встреча завтра в 10")
+
+    assert saved[0][1]['ai_data']['main_title'] == 'Встреча'
+    assert saved[-1][1]['created_events'] == {'0': {'id': 'gcal-1'}}
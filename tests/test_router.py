@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from utils.router import Router
+
+
+def _recording_router():
+    calls = []
+    router = Router('test')
+    for key in ('menu', 'menu_notes'):
+        router.exact(key, lambda ctx, arg, key=key: calls.append(('exact', key, arg)))
+    for prefix in ('note_', 'note_del_'):
+        router.prefix(prefix, lambda ctx, arg, prefix=prefix: calls.append(('prefix', prefix, arg)))
+    return router, calls
+
+
+def test_exact_match_wins_over_prefix():
+    router, calls = _recording_router()
+    router.prefix('menu', lambda ctx, arg: calls.append(('prefix', 'menu', arg)))
+    assert router.dispatch('menu', None)
+    assert calls == [('exact', 'menu', '')]
+
+
+def test_longest_prefix_wins_and_gets_remainder():
+    router, calls = _recording_router()
+    assert router.dispatch('note_del_abc', None)
+    assert router.dispatch('note_abc', None)
+    assert calls == [('prefix', 'note_del_', 'abc'), ('prefix', 'note_', 'abc')]
+
+
+def test_prefix_matches_key_equal_to_prefix():
+    router, calls = _recording_router()
+    assert router.dispatch('note_', None)
+    assert calls == [('prefix', 'note_', '')]
+
+
+@pytest.mark.parametrize('key', ['', 'men', 'menu_', 'not', 'other'])
+def test_unknown_key_is_not_dispatched(key):
+    router, calls = _recording_router()
+    assert router.match(key) == (None, None)
+    assert not router.dispatch(key, None)
+    assert calls == []
+
+
+def test_lazy_target_is_resolved_on_first_call():
+    router = Router('test')
+    router.exact('join', 'os.path:join')
+    route, arg = router.match('join')
+    assert route.func is None
+    assert route.resolve()('a', 'b') == 'a/b'
+
+
+def test_stats_count_calls_and_errors():
+    router = Router('test')
+
+    def fail(ctx, arg):
+        raise RuntimeError(arg)
+
+    router.exact('ok', lambda ctx, arg: None)
+    router.prefix('fail_', fail)
+    router.dispatch('ok', None)
+    with pytest.raises(RuntimeError):
+        router.dispatch('fail_x', None)
+    stats = {s['route']: s for s in router.get_stats()}
+    assert (stats['test:ok']['calls'], stats['test:ok']['errors']) == (1, 0)
+    assert (stats['test:fail_*']['calls'], stats['test:fail_*']['errors']) == (1, 1)
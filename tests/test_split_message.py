@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+import re
+
+import pytest
+
+from services.telegram import split_message
+
+
+def _words(text: str) -> list:
+    return re.sub(r'</?b>|[*`]', ' ', text).split()
+
+
+def test_short_text_is_one_message():
+    assert split_message("Короткий текст.", limit=100) == ["Короткий текст."]
+
+
+def test_chunks_fit_limit_and_keep_all_words():
+    text = " ".join(f"слово{i}." for i in range(300))
+    chunks = split_message(text, limit=200)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 200 for chunk in chunks)
+    assert _words(" ".join(chunks)) == _words(text)
+
+
+def test_paragraph_break_is_preferred():
+    first = "Первый абзац. " * 5
+    text = first.strip() + "\n\n" + "Второй абзац без точек " * 10
+    chunks = split_message(text, limit=len(first) + 40)
+    assert chunks[0] == first.strip()
+
+
+@pytest.mark.parametrize('marker', ['*', '_', '`', '```'])
+def test_markdown_entity_is_reopened_in_next_chunk(marker):
+    text = "Начало " + marker + " ".join(["жирный"] * 60) + marker + " конец"
+    chunks = split_message(text, limit=120)
+    assert len(chunks) > 2
+    for chunk in chunks:
+        assert len(chunk) <= 120
+        # Каждый кусок сам по себе с закрытой разметкой
+        assert chunk.count(marker) % 2 == 0
+    assert all(chunk.startswith(marker) for chunk in chunks[1:])
+
+
+def test_html_tags_are_closed_and_reopened():
+    text = "<b>" + " ".join(["слово"] * 200) + "</b> хвост"
+    chunks = split_message(text, limit=300, use_html=True)
+    assert len(chunks) > 2
+    for chunk in chunks[:-1]:
+        assert len(chunk) <= 300
+        assert chunk.startswith("<b>") and chunk.endswith("</b>")
+    assert chunks[-1].endswith("хвост")
+
+
+def test_html_is_not_cut_inside_tag_or_entity():
+    text = ("x" * 95 + " &amp; <a href=\"https://example.com\">ссылка</a> ") * 10
+    for chunk in split_message(text, limit=120, use_html=True):
+        assert chunk.count('<') == chunk.count('>')
+        assert not re.search(r'&[a-z]*$', chunk)
+        assert not re.match(r'^[a-z]*;', chunk)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from services.ai import _split_transcript
+
+
+def test_short_text_is_one_chunk():
+    assert _split_transcript("Коротко.", max_chars=100) == (["Коротко."], "\n\n")
+
+
+def test_paragraphs_are_packed_up_to_limit():
+    text = "\n\n".join(f"[00:0{i}] Абзац {i}." for i in range(6))
+    chunks, separator = _split_transcript(text, max_chars=40)
+    assert separator == "\n\n"
+    assert all(len(chunk) <= 40 for chunk in chunks)
+    assert separator.join(chunks) == text
+
+
+def test_single_paragraph_is_split_by_sentences():
+    text = " ".join(f"Предложение {i}." for i in range(20))
+    chunks, separator = _split_transcript(text, max_chars=50)
+    assert separator == " "
+    assert all(len(chunk) <= 50 for chunk in chunks)
+    assert separator.join(chunks) == text
+
+
+def test_oversized_paragraph_among_others_is_split():
+    long_paragraph = " ".join(f"Предложение номер {i}." for i in range(30))
+    text = f"[00:00] Начало.\n\n{long_paragraph}\n\n[01:00] Конец."
+    chunks, _ = _split_transcript(text, max_chars=100)
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert chunks[0].startswith("[00:00] Начало.")
+    assert chunks[-1].endswith("[01:00] Конец.")
@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from utils.concurrency import TaskGraph
+
+
+def test_dependencies_run_first_and_pass_results():
+    order = []
+    graph = TaskGraph(max_workers=4)
+
+    def step(name, value):
+        def run(*args):
+            order.append(name)
+            return (value, args)
+        return run
+
+    graph.add('a', step('a', 1))
+    graph.add('b', step('b', 2))
+    graph.add('c', step('c', 3), deps=['a', 'b'])
+    graph.add('d', step('d', 4), deps=['c'])
+    results = graph.run(timeout=5)
+    graph.wait(5)
+
+    assert order.index('c') > max(order.index('a'), order.index('b'))
+    assert order.index('d') > order.index('c')
+    assert results['c'] == (3, ((1, ()), (2, ())))
+    assert results['d'][1] == (results['c'],)
+
+
+def test_failed_dependency_propagates_error_without_running():
+    ran = []
+    graph = TaskGraph()
+    error = RuntimeError("сломалось")
+
+    def fail():
+        raise error
+
+    graph.add('a', fail)
+    graph.add('b', lambda a: ran.append('b'), deps=['a'])
+    graph.add('c', lambda b: ran.append('c'), deps=['b'])
+    results = graph.run(timeout=5)
+    graph.wait(5)
+
+    assert results == {}
+    assert ran == []
+    assert graph.errors == {'a': error, 'b': error, 'c': error}
+
+
+def test_failed_optional_dependency_is_passed_as_none():
+    graph = TaskGraph()
+    graph.add('main', lambda: 'текст')
+    graph.add('extra', lambda: 1 / 0)
+    graph.add('save', lambda main, extra: (main, extra), deps=['main'], optional_deps=['extra'])
+    results = graph.run(timeout=5)
+    graph.wait(5)
+
+    assert results['save'] == ('текст', None)
+    assert isinstance(graph.errors['extra'], ZeroDivisionError)
+
+
+def test_run_waits_only_for_critical_tasks():
+    release = threading.Event()
+    graph = TaskGraph()
+    graph.add('note', lambda: 'id')
+    graph.add('index', lambda note: release.wait(5) and 'indexed', deps=['note'], critical=False)
+
+    started = time.monotonic()
+    results = graph.run(timeout=5)
+    assert time.monotonic() - started < 1
+    assert results == {'note': 'id'}
+
+    release.set()
+    graph.wait(5)
+    assert graph.results['index'] == 'indexed'
+
+
+def test_add_validates_graph():
+    graph = TaskGraph()
+    graph.add('a', lambda: None)
+    with pytest.raises(ValueError):
+        graph.add('a', lambda: None)
+    with pytest.raises(ValueError):
+        graph.add('b', lambda x: None, deps=['missing'])
+    graph.run(timeout=5)
+    with pytest.raises(RuntimeError):
+        graph.add('c', lambda: None)
+    graph.wait(5)
@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+import threading
+import time
+
+import pytest
+
+from services.telegram_client import TelegramClient
+
+
+@pytest.fixture
+def client():
+    client = TelegramClient('test', pool_size=4)
+    client.sent = []
+    client.gates = {}
+
+    def post(method, kwargs):
+        payload = kwargs['json']
+        gate = client.gates.get(payload.get('chat_id'))
+        if gate is not None:
+            gate.wait(5)
+        else:
+            time.sleep(0.05)
+        client.sent.append((method, payload))
+        return {'ok': True, 'result': {}}
+
+    client._post = post
+    return client
+
+
+def test_webhook_reply_waits_for_queued_calls_of_the_chat(client):
+    client.begin_webhook_reply()
+    client.submit('editMessageText', {'chat_id': 1, 'text': 'progress'}, chat_id=1)
+    client.submit('answerCallbackQuery', {'callback_query_id': 'q'})
+    client.call('sendMessage', {'chat_id': 1, 'text': 'final'}, chat_id=1, holdable=True)
+
+    reply = client.end_webhook_reply(chat_id=1)
+
+    assert reply == {'chat_id': 1, 'text': 'final', 'method': 'sendMessage'}
+    assert sorted(method for method, _ in client.sent) == ['answerCallbackQuery', 'editMessageText']
+
+
+def test_drain_of_one_chat_does_not_wait_for_others(client):
+    client.gates[2] = threading.Event()
+    client.submit('sendMessage', {'chat_id': 2, 'text': 'slow'}, chat_id=2)
+    client.submit('sendMessage', {'chat_id': 1, 'text': 'fast'}, chat_id=1)
+
+    assert client.drain(timeout=2, chat_id=1)
+    assert not client.drain(timeout=0.1)
+
+    client.gates[2].set()
+    assert client.drain(timeout=2)
+    assert len(client.sent) == 2
+
+
+def test_progress_finish_is_not_held_behind_queued_edits(client, monkeypatch):
+    from services import telegram_client
+    from services.progress import ProgressReporter
+    monkeypatch.setattr(telegram_client, '_client', client)
+
+    client.begin_webhook_reply()
+    reporter = ProgressReporter(1, message_id=10, min_interval=0)
+    reporter.update('step')
+    reporter.finish('done')
+
+    assert client.end_webhook_reply(chat_id=1) is None
+    assert [payload['text'] for _, payload in client.sent] == ['step', 'done']
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+
+import pytest
+import pytz
+
+from utils.timeparse import parse_reminder, has_temporal_expression
+
+NOW = pytz.timezone('Europe/Kiev').localize(datetime(2026, 3, 10, 12, 0))
+
+
+@pytest.mark.parametrize("text, title, when", [
+    ("через 15 минут позвонить маме", "Позвонить маме", "2026-03-10T12:15:00"),
+    ("напомни через полчаса выключить духовку", "Выключить духовку", "2026-03-10T12:30:00"),
+    ("через 2 часа забрать посылку", "Забрать посылку", "2026-03-10T14:00:00"),
+    ("завтра в 10 встреча", "Встреча", "2026-03-11T10:00:00"),
+    ("нагадай о 18:30 забрати посилку", "Забрати посилку", "2026-03-10T18:30:00"),
+    ("позвонить маме в 5 вечера", "Позвонить маме", "2026-03-10T17:00:00"),
+    ("в 9 часов зарядка", "Зарядка", "2026-03-11T09:00:00"),
+    ("в 9.30 созвон с командой", "Созвон с командой", "2026-03-11T09:30:00"),
+    ("сегодня в 3 забрать ребёнка", "Забрать ребёнка", "2026-03-10T15:00:00"),
+    ("сегодня в 11 позвонить маме", "Позвонить маме", "2026-03-10T23:00:00"),
+    ("сегодня в 18:00 ужин", "Ужин", "2026-03-10T18:00:00"),
+    ("сегодня в 11:30 позвонить", "Позвонить", "2026-03-10T23:30:00"),
+])
+def test_parses_confident_reminders(text, title, when):
+    assert parse_reminder(text, now=NOW) == {'title': title, 'datetime_iso': when}
+
+
+@pytest.mark.parametrize("text", [
+    "заехать в 3 магазина",
+    "в 2 раза больше",
+    "купить 2 билета в 5 рядов",
+    "позвонить маме в 5",
+    "через 15 минут и через час",
+    "завтра в 10 встреча с Олей по поводу нового проекта и ещё обсудить бюджет",
+    "в пятницу в 10 встреча",
+    "сегодня в 12 ночи позвонить",
+    "сегодня в 9 утра позвонить",
+    "",
+])
+def test_leaves_ambiguous_text_to_ai(text):
+    assert parse_reminder(text, now=NOW) is None
+
+
+@pytest.mark.parametrize("text", [
+    "позвонить маме в 5",
+    "встреча с Олей",
+    "завтра купить хлеб",
+    "дедлайн 15.04",
+    "созвон в 14:00",
+    "оплатить аренду до 15-го",
+    "платёж 12 числа",
+    "аренду 1-го",
+    "tomorrow at 5pm call John",
+    "dentist next Monday",
+])
+def test_temporal_expression_found(text):
+    assert has_temporal_expression(text)
+
+
+@pytest.mark.parametrize("text", ["купить молоко", "идея для статьи про котов", "money for Simon", ""])
+def test_no_temporal_expression(text):
+    assert not has_temporal_expression(text)
+
+
+@pytest.mark.parametrize("text", [
+    "через 15 минут позвонить маме", "завтра в 10 встреча", "позвонить маме в 5 вечера", "в 9 часов зарядка",
+])
+def test_parsed_reminders_are_temporal(text):
+    # AI-ветка и локальный разбор не должны расходиться
+    assert parse_reminder(text, now=NOW) is not None
+    assert has_temporal_expression(text)